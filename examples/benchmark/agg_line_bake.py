@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+# -----------------------------------------------------------------------------
+# vispy: testskip
+"""
+Measure the time needed to bake a 1M-vertex line for the agg method: full
+bake, re-bake in a preallocated buffer, color update and tail update
+(streaming data).
+"""
+import time
+
+import numpy as np
+
+from vispy.visuals.line.line import _AggLineVisual
+
+n = 1000000
+pos = np.cumsum(np.random.randn(n, 2), axis=0).astype(np.float32)
+color = np.array([1., 0., 0., 1.])
+colors = np.random.rand(n, 4).astype(np.float32)
+
+
+def measure(name, func, repeat=5):
+    times = []
+    for _ in range(repeat):
+        t0 = time.time()
+        func()
+        times.append(time.time() - t0)
+    print('%-20s %8.1f ms' % (name, 1000 * min(times)))
+
+
+V, _ = _AggLineVisual._agg_bake(pos, color)
+seg = _AggLineVisual._segment_indices(n)
+tail = np.concatenate([pos, pos[-1000:] + 1])
+
+measure('full bake', lambda: _AggLineVisual._agg_bake(pos, color))
+measure('bake (reuse)', lambda: _AggLineVisual._agg_bake(pos, color, out=V))
+measure('color update', lambda: _AggLineVisual._set_color(V, colors, seg))
+measure('append 1000', lambda: _AggLineVisual._agg_bake_tail(V, tail, color,
+                                                             n))
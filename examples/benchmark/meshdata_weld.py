@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+# -----------------------------------------------------------------------------
+# vispy: testskip
+"""
+Measure the time needed to weld the vertices of a mesh given as separate
+triangles (as loaded from STL files for instance), and to compute the
+vertex to face adjacency and the vertex normals.
+"""
+import time
+
+from vispy.geometry import MeshData, create_sphere
+
+mesh = create_sphere(1000, 1000)
+triangles = mesh.get_vertices()[mesh.get_faces()]
+print('%d triangles' % len(triangles))
+
+t0 = time.time()
+mesh = MeshData(vertices=triangles)
+mesh.get_vertices()
+t1 = time.time()
+mesh.get_vertex_faces(csr=True)
+t2 = time.time()
+mesh.get_vertex_normals()
+t3 = time.time()
+print('weld                 %8.1f ms' % (1000 * (t1 - t0)))
+print('vertex faces         %8.1f ms' % (1000 * (t2 - t1)))
+print('vertex normals       %8.1f ms' % (1000 * (t3 - t2)))
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+# -----------------------------------------------------------------------------
+# vispy: testskip
+"""
+Measure PNG encoding and decoding of a 1280x720 screenshot-like image:
+encoding with the various filters and zlib strategies, and decoding with
+NumPy compared to the bundled pure-Python decoder.
+"""
+import time
+
+import numpy as np
+
+from vispy.io.image import _make_png, _decode_png, _read_png_reader
+
+h, w = 720, 1280
+yy, xx = np.mgrid[:h, :w]
+im = np.empty((h, w, 4), np.ubyte)
+im[..., 0] = 255 * xx // w
+im[..., 1] = 255 * yy // h
+im[..., 2] = 128
+im[..., 3] = 255
+im[(xx - w // 2) ** 2 + (yy - h // 2) ** 2 < 200 ** 2] = (255, 255, 255, 255)
+
+
+def measure(name, func, repeat=3):
+    times = []
+    for _ in range(repeat):
+        t0 = time.time()
+        out = func()
+        times.append(time.time() - t0)
+    print('%-32s %8.1f ms %s' % (name, 1000 * min(times), out))
+
+
+for filter_type in (0, 'up', 'paeth', 'adaptive'):
+    for strategy in ('default', 'rle'):
+        measure('encode %s %s' % (filter_type, strategy),
+                lambda: '%d bytes' % len(_make_png(im, 6, filter_type,
+                                                   strategy)))
+
+for filter_type in (0, 'up', 'adaptive'):
+    png = _make_png(im, filter_type=filter_type).tobytes()
+    measure('decode %s' % filter_type, lambda: _decode_png(png).shape)
+    measure('decode %s (pure Python)' % filter_type,
+            lambda: _read_png_reader(png).shape, repeat=1)
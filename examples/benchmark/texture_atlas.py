@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+# -----------------------------------------------------------------------------
+# vispy: testskip
+"""
+Measure the throughput and the packing efficiency of TextureAtlas: packing
+glyph-like and icon-like rectangles, and allocating and releasing regions
+at random (as a cache of sprites would do).
+
+The efficiency is the area of the allocated regions divided by the area
+below the highest allocated row. The "old" rows use the previous packer,
+which scans the skyline in Python for every region.
+"""
+import time
+
+import numpy as np
+
+from vispy.gloo import TextureAtlas
+
+rng = np.random.RandomState(0)
+
+
+class OldAtlas(object):
+    """The Skyline Bottom-Left packer of the previous TextureAtlas"""
+
+    def __init__(self, shape, dtype=None, format=None):
+        self.shape = shape
+        self._atlas_nodes = [(0, 0, shape[1])]
+
+    def get_free_region(self, width, height):
+        best_height = best_width = np.inf
+        best_index = -1
+        for i, node in enumerate(self._atlas_nodes):
+            y = self._fit(i, width, height)
+            if y >= 0 and (y + height < best_height or
+                           (y + height == best_height and
+                            node[2] < best_width)):
+                best_height, best_width = y + height, node[2]
+                best_index = i
+                region = node[0], y, width, height
+        if best_index == -1:
+            return None
+        nodes = self._atlas_nodes
+        nodes.insert(best_index, (region[0], region[1] + height, width))
+        i = best_index + 1
+        while i < len(nodes):
+            x, y, w = nodes[i]
+            shrink = nodes[i - 1][0] + nodes[i - 1][2] - x
+            if shrink <= 0:
+                break
+            if w - shrink > 0:
+                nodes[i] = x + shrink, y, w - shrink
+                break
+            del nodes[i]
+        i = 0
+        while i < len(nodes) - 1:
+            if nodes[i][1] == nodes[i + 1][1]:
+                nodes[i] = (nodes[i][0], nodes[i][1],
+                            nodes[i][2] + nodes[i + 1][2])
+                del nodes[i + 1]
+            else:
+                i += 1
+        return region
+
+    def _fit(self, index, width, height):
+        x, y = self._atlas_nodes[index][:2]
+        if x + width > self.shape[1]:
+            return -1
+        width_left = width
+        i = index
+        while width_left > 0:
+            y = max(y, self._atlas_nodes[i][1])
+            if y + height > self.shape[0]:
+                return -1
+            width_left -= self._atlas_nodes[i][2]
+            i += 1
+        return y
+
+
+def pack(name, sizes, shape=(4096, 4096), cls=TextureAtlas):
+    atlas = cls(shape, np.uint8, 'luminance')
+    area = top = 0
+    t0 = time.time()
+    for w, h in sizes.tolist():
+        x, y, w, h = atlas.get_free_region(w, h)
+        area += w * h
+        top = max(top, y + h)
+    dt = time.time() - t0
+    print('%-28s %6d regions %8.0f regions/s  efficiency %3.0f %%'
+          % (name, len(sizes), len(sizes) / dt,
+             100. * area / (top * atlas.shape[1])))
+
+
+def churn(name, n, shape=(1024, 1024)):
+    atlas = TextureAtlas(shape, np.uint8, 'luminance')
+    regions = []
+    failed = 0
+    t0 = time.time()
+    for _ in range(n):
+        if len(regions) > 500:
+            atlas.release_region(regions.pop(rng.randint(len(regions))))
+        region = atlas.get_free_region(*rng.randint(8, 40, 2))
+        if region is None:
+            failed += 1
+        else:
+            regions.append(region)
+    dt = time.time() - t0
+    print('%-28s %6d regions %8.0f regions/s  failed %d'
+          % (name, n, n / dt, failed))
+
+
+pack('glyphs (8-40 px)', rng.randint(8, 40, (10000, 2)))
+pack('narrow glyphs (2-12 px)',
+     np.column_stack([rng.randint(2, 12, 20000), rng.randint(2, 40, 20000)]))
+pack('icons (16-64 px)', rng.randint(16, 64, (3000, 2)))
+pack('icons (32 px)', np.full((10000, 2), 32))
+churn('allocate and release', 20000)
+pack('old: glyphs (8-40 px)', rng.randint(8, 40, (2000, 2)), cls=OldAtlas)
+pack('old: icons (32 px)', np.full((10000, 2), 32), cls=OldAtlas)
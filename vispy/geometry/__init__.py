@@ -11,13 +11,16 @@ from __future__ import division
 __all__ = ['MeshData', 'PolygonData', 'Rect', 'Triangulation', 'triangulate',
            'create_arrow', 'create_box', 'create_cone', 'create_cube',
            'create_cylinder', 'create_grid_mesh', 'create_plane',
-           'create_sphere', 'resize']
+           'create_sphere', 'resize', 'simplify_path',
+           'triangulate_polygons']
 
 from .polygon import PolygonData  # noqa
 from .meshdata import MeshData  # noqa
 from .rect import Rect  # noqa
-from .triangulation import Triangulation, triangulate  # noqa
+from .triangulation import (Triangulation, triangulate,  # noqa
+                            triangulate_polygons)  # noqa
 from .torusknot import TorusKnot  # noqa
+from .simplify import simplify_path  # noqa
 from .calculations import (_calculate_normals, _fast_cross_3d,  # noqa
                            resize)  # noqa
 from .generation import (create_arrow, create_box, create_cone,  # noqa
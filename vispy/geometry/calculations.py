@@ -50,10 +50,33 @@ def _fast_cross_3d(x, y):
         return np.cross(x, y)
 
 
-def _calculate_normals(rr, tris):
-    """Efficiently compute vertex normals for triangulated surface"""
+def _calculate_normals(rr, tris, weighting=None):
+    """Efficiently compute vertex normals for triangulated surface
+
+    Parameters
+    ----------
+    rr : array
+        Vertices (N, 3).
+    tris : array
+        Faces (M, 3), as indices into the vertices.
+    weighting : str | None
+        How the normals of the faces using a vertex are combined. If None,
+        each face contributes its unit normal. If 'area', normals are
+        weighted by the area of the faces, and if 'angle', by the angle of
+        the faces at the vertex.
+
+    Returns
+    -------
+    nn : array
+        The unit normal (N, 3) of each vertex. Vertices not used by any
+        face (or only by degenerate faces) have a null normal.
+    """
+    if weighting not in (None, 'area', 'angle'):
+        raise ValueError('weighting must be None, "area" or "angle", not %r'
+                         % (weighting,))
     # ensure highest precision for our summation/vectorization "trick"
     rr = rr.astype(np.float64)
+    tris = np.asarray(tris).astype(np.intp)
     # first, compute triangle normals
     r1 = rr[tris[:, 0], :]
     r2 = rr[tris[:, 1], :]
@@ -62,21 +85,32 @@ def _calculate_normals(rr, tris):
 
     #   Triangle normals and areas
     size = np.sqrt(np.sum(tri_nn * tri_nn, axis=1))
-    size[size == 0] = 1.0  # prevent ugly divide-by-zero
-    tri_nn /= size[:, np.newaxis]
+    if weighting != 'area':
+        size[size == 0] = 1.0  # prevent ugly divide-by-zero
+        tri_nn /= size[:, np.newaxis]
 
     npts = len(rr)
-
-    # the following code replaces this, but is faster (vectorized):
+    weights = np.ones(tris.shape)
+    if weighting == 'angle':
+        # the norm of the cross product of the edges of a face at any of
+        # its vertices is the (doubled) area of the face
+        corners = (r1, r2, r3)
+        for k in range(3):
+            a = corners[(k + 1) % 3] - corners[k]
+            b = corners[(k + 2) % 3] - corners[k]
+            weights[:, k] = np.arctan2(size, np.sum(a * b, axis=1))
+
+    # the following code replaces this, but is faster (vectorized) and
+    # handles faces using the same vertex several times:
     #
     # for p, verts in enumerate(tris):
     #     nn[verts, :] += tri_nn[p, :]
     #
-    nn = np.zeros((npts, 3))
-    for verts in tris.T:  # note this only loops 3x (number of verts per tri)
-        for idx in range(3):  # x, y, z
-            nn[:, idx] += np.bincount(verts.astype(np.int32),
-                                      tri_nn[:, idx], minlength=npts)
+    verts = tris.ravel()
+    nn = np.empty((npts, 3))
+    for idx in range(3):  # x, y, z
+        nn[:, idx] = np.bincount(verts, (weights * tri_nn[:, idx:idx + 1]
+                                         ).ravel(), minlength=npts)
     size = np.sqrt(np.sum(nn * nn, axis=1))
     size[size == 0] = 1.0  # prevent ugly divide-by-zero
     nn /= size[:, np.newaxis]
@@ -1,19 +1,34 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 
 _data_cache = None
 
+# Default number of grid cells processed at once (see isosurface)
+_chunk_cells = 2 ** 22
+
 
-def isosurface(data, level):
+def isosurface(data, level, chunk_size=None, n_threads=None):
     """
     Generate isosurface from volumetric data using marching cubes algorithm.
     See Paul Bourke, "Polygonising a Scalar Field"  
     (http://paulbourke.net/geometry/polygonise/)
     
-    *data*   3D numpy array of scalar values
-    *level*  The level at which to generate an isosurface
+    *data*        3D numpy array of scalar values
+    *level*       The level at which to generate an isosurface
+    *chunk_size*  Number of grid cells along the first axis processed at
+                  once. The volume is split into slabs of this thickness so
+                  that the temporary arrays are proportional to the size of
+                  a slab rather than to the size of the volume. By default,
+                  slabs of about 4 million cells are used.
+    *n_threads*   Number of threads processing slabs in parallel (NumPy
+                  releases the GIL in most of the work). Defaults to the
+                  number of CPUs.
     
     Returns an array of vertex coordinates (Nv, 3) and an array of 
-    per-face vertex indexes (Nf, 3)    
+    per-face vertex indexes (Nf, 3). The result does not depend on
+    *chunk_size* and *n_threads*.
     """
     # For improvement, see:
     # 
@@ -22,119 +37,367 @@ def isosurface(data, level):
     # Thomas Lewiner, Helio Lopes, Antonio Wilson Vieira and Geovan Tavares.
     # Journal of Graphics Tools 8(2): pp. 1-15 (december 2003)
 
-    (face_shift_tables, edge_shifts, 
-     edge_table, n_table_faces) = _get_data_cache()
-    
-    ## mark everything below the isosurface level
-    mask = data < level
-
-    # Because we make use of the strides data attribute below, we have to make 
-    # sure that the data is contiguous (which it won't be if the user did 
-    # data.transpose() for example). Note that this doesn't copy the data if it 
-    # is already contiguous.
-    data = np.ascontiguousarray(data)
-
-    ### make eight sub-fields and compute indexes for grid cells
-    index = np.zeros([x-1 for x in data.shape], dtype=np.ubyte)
-    fields = np.empty((2, 2, 2), dtype=object)
+    data = np.asarray(data)
+    if data.ndim != 3:
+        raise ValueError('data must be a 3D array')
+    if min(data.shape) < 2:
+        return np.zeros((0, 3), np.float32), np.zeros((0, 3), np.uint32)
+
+    # Tables are built here rather than concurrently in the threads
+    _get_data_cache()
+
+    n_cells = data.shape[0] - 1
+    if chunk_size is None:
+        chunk_size = _chunk_cells // ((data.shape[1] - 1) *
+                                      (data.shape[2] - 1))
+    chunk_size = max(int(chunk_size), 1)
+    bounds = [(x0, min(x0 + chunk_size, n_cells))
+              for x0 in range(0, n_cells, chunk_size)]
+
+    def extract(bound):
+        return _extract_slab(data, level, bound[0], bound[1])
+
+    if n_threads is None:
+        n_threads = os.cpu_count() or 1
+    n_threads = min(int(n_threads), len(bounds))
+    if n_threads > 1:
+        with ThreadPoolExecutor(n_threads) as pool:
+            slabs = list(pool.map(extract, bounds))
+    else:
+        slabs = [extract(bound) for bound in bounds]
+    return _stitch_slabs(slabs)
+
+
+def _extract_slab(data, level, x0, x1):
+    """
+    Generate the part of the isosurface lying in the grid cells x0 to x1
+    (excluded) along the first axis.
+
+    Returns the vertices owned by the slab (the ones on the grid planes x0
+    to x1, excluded, or to the end of the volume for the last slab), and
+    the faces of each group of cells having 1 to 5 faces. Faces are
+    indexes local to the slab: the vertices on plane x1 are numbered after
+    the owned ones, in the same order as they are numbered in the next
+    slab.
+    """
+    ## planes of grid points used by the cells, plus one for the cut edges 
+    ## of the last plane along the first axis
+    n_planes = x1 - x0 + 1
+    last = x1 + 1 == data.shape[0]
+    mask = data[x0:x1 + 2] < level
+    index = _cell_index(mask[:n_planes])
+    cut_edges = _cut_edges(mask, n_planes)
+    del mask
+
+    owned = cut_edges if last else cut_edges[:-1]
+    vertexes = _edge_vertexes(data, level, np.nonzero(owned), (x0, 0, 0))
+
+    ## re-use the cut_edges array as a lookup table for vertex IDs
+    cut_edges = np.cumsum(cut_edges, dtype=np.uint32).reshape(
+        cut_edges.shape)
+    cut_edges -= 1
+    return vertexes, _cell_faces(index, cut_edges)
+
+
+def _cell_index(mask):
+    """
+    Compute the marching cubes index of the grid cells, given the mask of
+    the grid points below the level.
+    """
+    index = np.zeros([x - 1 for x in mask.shape], dtype=np.ubyte)
     slices = [slice(0, -1), slice(1, None)]
     for i in [0, 1]:
         for j in [0, 1]:
             for k in [0, 1]:
-                fields[i, j, k] = mask[slices[i], slices[j], slices[k]]
+                field = mask[slices[i], slices[j], slices[k]]
                 # this is just to match Bourk's vertex numbering scheme:
                 vertIndex = i - 2*j*i + 3*j + 4*k
-                index += (fields[i, j, k] * 2**vertIndex).astype(np.ubyte)
-    
-    ### Generate table of edges that have been cut
-    cut_edges = np.zeros([x+1 for x in index.shape]+[3], dtype=np.uint32)
-    edges = edge_table[index]
-    for i, shift in enumerate(edge_shifts[:12]):        
-        slices = [slice(shift[j], cut_edges.shape[j]+(shift[j]-1)) 
-                  for j in range(3)]
-        cut_edges[slices[0], slices[1], slices[2], shift[3]] += edges & 2**i
-    
-    # for each cut edge, interpolate to see where exactly the edge is cut and 
-    # generate vertex positions
-    m = cut_edges > 0
-    vertex_inds = np.argwhere(m)  # argwhere is slow!
-    vertexes = vertex_inds[:, :3].astype(np.float32).copy()
-    dataFlat = data.reshape(data.shape[0]*data.shape[1]*data.shape[2])
-    
-    ## re-use the cut_edges array as a lookup table for vertex IDs
-    cut_edges[vertex_inds[:, 0], 
-              vertex_inds[:, 1], 
-              vertex_inds[:, 2], 
-              vertex_inds[:, 3]] = np.arange(vertex_inds.shape[0])
-    
+                index |= field.astype(np.ubyte) << vertIndex
+    return index
+
+
+def _cut_edges(mask, n_planes):
+    """
+    Compute the cut edges of the first n_planes planes of grid points of
+    mask, as an array of shape (n_planes, Y, Z, 3). An edge is cut when its
+    ends are on either side of the level (this is what the edge table
+    encodes for the edges of each cell). The edges along the first axis of
+    the last plane are only known if mask has one more plane.
+    """
+    cut_edges = np.zeros((n_planes,) + mask.shape[1:] + (3,), dtype=bool)
+    np.not_equal(mask[1:n_planes + 1], mask[:len(mask) - 1][:n_planes],
+                 out=cut_edges[:len(mask) - 1, :, :, 0])
+    np.not_equal(mask[:n_planes, 1:], mask[:n_planes, :-1],
+                 out=cut_edges[:, :-1, :, 1])
+    np.not_equal(mask[:n_planes, :, 1:], mask[:n_planes, :, :-1],
+                 out=cut_edges[:, :, :-1, 2])
+    return cut_edges
+
+
+def _edge_vertexes(data, level, vertex_inds, offset):
+    """
+    Interpolate to see where exactly the edges (x, y, z, axis) are cut, the
+    grid point coordinates being relative to offset, and generate vertex
+    positions.
+    """
+    vertexes = np.empty((len(vertex_inds[0]), 3), dtype=np.float32)
     for i in [0, 1, 2]:
-        vim = vertex_inds[:, 3] == i
-        vi = vertex_inds[vim, :3]
-        vi_flat = (vi * (np.array(data.strides[:3]) // 
-                         data.itemsize)[np.newaxis, :]).sum(axis=1)
-        v1 = dataFlat[vi_flat]
-        v2 = dataFlat[vi_flat + data.strides[i]//data.itemsize]
+        vertexes[:, i] = vertex_inds[i]
+        vertexes[:, i] += offset[i]
+    for i in [0, 1, 2]:
+        vim = vertex_inds[3] == i
+        vi = [vertex_inds[j][vim] + offset[j] for j in range(3)]
+        v1 = data[vi[0], vi[1], vi[2]]
+        vi[i] += 1
+        v2 = data[vi[0], vi[1], vi[2]]
         vertexes[vim, i] += (level-v1) / (v2-v1)
-    
-    ### compute the set of vertex indexes for each face. 
-    
-    ## This works, but runs a bit slower.
-    ## all cells with at least one face:
-    #cells = np.argwhere((index != 0) & (index != 255))  
-    #cellInds = index[cells[:, 0], cells[:, 1], cells[:, 2]]
-    #verts = faceTable[cellInds]
-    #mask = verts[..., 0, 0] != 9
-    ## we now have indexes into cut_edges:
-    #verts[...,:3] += cells[:, np.newaxis, np.newaxis,:]
-    #verts = verts[mask]
-    ## and these are the vertex indexes we want:
-    #faces = cut_edges[verts[..., 0], verts[..., 1], verts[..., 2], 
-    #                  verts[..., 3]]  
-    
+    return vertexes
+
+
+def _cell_faces(index, vertex_ids):
+    """
+    Compute the set of vertex indexes for each face, given the index of the
+    grid cells and the vertex ID of each cut edge (x, y, z, axis). Returns
+    the faces of the cells having 1 to 5 faces (at index 1 to 5 of the
+    list).
+    """
+    (face_shift_tables, edge_shifts, 
+     edge_table, n_table_faces) = _get_data_cache()
+
     # To allow this to be vectorized efficiently, we count the number of faces 
     # in each grid cell and handle each group of cells with the same number 
     # together.
-    
-    # determine how many faces to assign to each grid cell
     n_faces = n_table_faces[index]
-    tot_faces = n_faces.sum()
-    faces = np.empty((tot_faces, 3), dtype=np.uint32)
-    ptr = 0
-    
-    ## this helps speed up an indexing operation later on
-    cs = np.array(cut_edges.strides)//cut_edges.itemsize
-    cut_edges = cut_edges.flatten()
+    cells = np.nonzero(n_faces)
+    n_faces = n_faces[cells]
+    index = index[cells]
+    cells = np.stack(cells, axis=-1)
+    faces = [None]
+    for i in range(1, 6):
+        sel = n_faces == i
+        verts = face_shift_tables[i][index[sel]].astype(np.intp)
+        # we now have indexes into vertex_ids:
+        verts[..., :3] += cells[sel, np.newaxis, np.newaxis, :]
+        verts = verts.reshape((verts.shape[0]*i,)+verts.shape[2:])
+        faces.append(vertex_ids[verts[..., 0], verts[..., 1], verts[..., 2],
+                                verts[..., 3]])
+    return faces
 
-    ## this, strangely, does not seem to help.
-    #ins = np.array(index.strides)/index.itemsize
-    #index = index.flatten()
 
+def _stitch_slabs(slabs):
+    """
+    Merge the vertices and faces of slabs generated by _extract_slab. Faces
+    are ordered by number of faces per cell, and then by cell.
+    """
+    offsets = np.cumsum([0] + [len(v) for v, f in slabs])
+    vertexes = np.concatenate([v for v, f in slabs])
+    faces = np.empty((sum(len(f) for v, f in slabs for f in f[1:]), 3),
+                     dtype=np.uint32)
+    ptr = 0
     for i in range(1, 6):
-        # expensive:
-        # all cells which require i faces  (argwhere is expensive)
-        cells = np.argwhere(n_faces == i)  
-        if cells.shape[0] == 0:
-            continue
-        # index values of cells to process for this round:
-        cellInds = index[cells[:, 0], cells[:, 1], cells[:, 2]]
-        
-        # expensive:
-        verts = face_shift_tables[i][cellInds]
-        # we now have indexes into cut_edges:
-        verts[..., :3] += (cells[:, np.newaxis,
-                                 np.newaxis, :]).astype(np.uint16)
-        verts = verts.reshape((verts.shape[0]*i,)+verts.shape[2:])
-        
-        # expensive:
-        verts = (verts * cs[np.newaxis, np.newaxis, :]).sum(axis=2)
-        vert_inds = cut_edges[verts]
-        nv = vert_inds.shape[0]
-        faces[ptr:ptr+nv] = vert_inds  # .reshape((nv, 3))
-        ptr += nv
-        
+        for (v, f), offset in zip(slabs, offsets):
+            nv = len(f[i])
+            faces[ptr:ptr+nv] = f[i]
+            faces[ptr:ptr+nv] += int(offset)
+            ptr += nv
     return vertexes, faces
 
 
+def _extract_block(data, level, lo, hi):
+    """
+    Generate the part of the isosurface lying in the grid cells lo to hi
+    (excluded) along each axis.
+
+    Returns the keys of the cut edges, which identify them in the whole
+    volume, the corresponding vertices and the faces, whose indexes are
+    local to the block.
+    """
+    mask = data[lo[0]:hi[0] + 1, lo[1]:hi[1] + 1, lo[2]:hi[2] + 1] < level
+    index = _cell_index(mask)
+    cut_edges = _cut_edges(mask, len(mask))
+    del mask
+
+    vertex_inds = np.nonzero(cut_edges)
+    vertexes = _edge_vertexes(data, level, vertex_inds, lo)
+    keys = np.ravel_multi_index(
+        [vertex_inds[i] + lo[i] for i in range(3)] + [vertex_inds[3]],
+        data.shape + (3,))
+
+    cut_edges = np.cumsum(cut_edges, dtype=np.uint32).reshape(
+        cut_edges.shape)
+    cut_edges -= 1
+    faces = np.concatenate(_cell_faces(index, cut_edges)[1:])
+    return keys, vertexes, faces
+
+
+def _stitch_blocks(blocks):
+    """
+    Merge the vertices and faces of blocks generated by _extract_block.
+    Vertices shared by neighbouring blocks are merged, and ordered as they
+    are by isosurface().
+    """
+    if len(blocks) == 0:
+        return np.zeros((0, 3), np.float32), np.zeros((0, 3), np.uint32)
+    offsets = np.cumsum([0] + [len(k) for k, v, f in blocks])
+    keys = np.concatenate([k for k, v, f in blocks])
+    vertexes = np.concatenate([v for k, v, f in blocks])
+    faces = np.concatenate([f.astype(np.intp) + offset
+                            for (k, v, f), offset in zip(blocks, offsets)])
+    keys, first, inverse = np.unique(keys, return_index=True,
+                                     return_inverse=True)
+    return vertexes[first], inverse[faces].astype(np.uint32)
+
+
+def _block_reduce(ufunc, data, size):
+    """
+    Reduce data over blocks of size**3 grid cells. The grid points shared
+    by two blocks are taken into account in both.
+    """
+    for axis in range(3):
+        starts = np.arange(0, data.shape[axis] - 1, size)
+        reduced = ufunc.reduceat(data, starts, axis=axis)
+        # the last plane of each block is the first of the next block
+        head = [slice(None)] * 3
+        head[axis] = slice(0, len(starts) - 1)
+        head = tuple(head)
+        ufunc(reduced[head], np.take(data, starts[1:], axis=axis),
+              out=reduced[head])
+        data = reduced
+    return data
+
+
+class IncrementalIsosurface(object):
+    """Isosurface extraction limited to the parts of a volume that changed
+
+    The volume is divided in blocks of grid cells, and the minimum and
+    maximum of the data are computed for each block. Extraction then only
+    processes the blocks straddling the level, and the geometry of each
+    block is kept until the level or the data of the block changes, so
+    that partial updates of the data only re-extract the affected blocks.
+
+    Parameters
+    ----------
+    data : ndarray
+        3D array of scalar values. It is not copied until the first partial
+        update, so that partial updates leave the original array unchanged.
+    block_size : int
+        Number of grid cells of a block along each axis.
+    n_threads : int | None
+        Number of threads extracting blocks in parallel. Defaults to the
+        number of CPUs.
+    """
+
+    def __init__(self, data, block_size=16, n_threads=None):
+        data = np.asarray(data)
+        if data.ndim != 3:
+            raise ValueError('data must be a 3D array')
+        self._data = data
+        self._copied = False
+        self._block_size = int(block_size)
+        self._n_threads = n_threads
+        self._level = None
+        self._blocks = {}
+        if min(data.shape) < 2:
+            self._min = self._max = np.zeros((0, 0, 0), data.dtype)
+        else:
+            self._min = _block_reduce(np.minimum, data, self._block_size)
+            self._max = _block_reduce(np.maximum, data, self._block_size)
+
+    @property
+    def data(self):
+        """The 3D array of scalar values"""
+        return self._data
+
+    def set_data(self, data, offset=(0, 0, 0)):
+        """Update a part of the volume
+
+        The volume is copied on the first update.
+
+        Parameters
+        ----------
+        data : ndarray
+            3D array of the new values.
+        offset : tuple
+            Position of data in the volume.
+        """
+        data = np.asarray(data)
+        offset = tuple(int(o) for o in offset)
+        if data.ndim != 3 or len(offset) != 3:
+            raise ValueError('data and offset must be 3D')
+        stop = tuple(o + s for o, s in zip(offset, data.shape))
+        if min(offset) < 0 or any(s > n for s, n in
+                                  zip(stop, self._data.shape)):
+            raise ValueError('data of shape %s at offset %s does not fit '
+                             'in volume of shape %s'
+                             % (data.shape, offset, self._data.shape))
+        if not self._copied:
+            self._data = self._data.copy()
+            self._copied = True
+        self._data[tuple(slice(o, s) for o, s in zip(offset, stop))] = data
+        if data.size == 0 or self._min.size == 0:
+            return
+
+        # Blocks whose grid points (including their last plane) changed
+        size = self._block_size
+        lo = [max((o - 1) // size, 0) for o in offset]
+        hi = [min((s - 1) // size + 1, n)
+              for s, n in zip(stop, self._min.shape)]
+        blocks = tuple(slice(a, b) for a, b in zip(lo, hi))
+        points = tuple(slice(a * size, min(b * size, n - 1) + 1)
+                       for a, b, n in zip(lo, hi, self._data.shape))
+        self._min[blocks] = _block_reduce(np.minimum, self._data[points],
+                                          size)
+        self._max[blocks] = _block_reduce(np.maximum, self._data[points],
+                                          size)
+        for block in list(self._blocks):
+            if all(a <= b < c for a, b, c in zip(lo, block, hi)):
+                del self._blocks[block]
+
+    def extract(self, level):
+        """Generate the isosurface
+
+        Parameters
+        ----------
+        level : float
+            The level at which to generate the isosurface.
+
+        Returns
+        -------
+        vertices : ndarray
+            Vertex coordinates (Nv, 3), ordered as by isosurface().
+        faces : ndarray
+            Per-face vertex indexes (Nf, 3).
+        """
+        if level != self._level:
+            self._level = level
+            self._blocks = {}
+
+        # Tables are built here rather than concurrently in the threads
+        _get_data_cache()
+
+        size = self._block_size
+        active = np.argwhere((self._min < level) & (self._max >= level))
+        todo = [tuple(b) for b in active if tuple(b) not in self._blocks]
+
+        def extract(block):
+            lo = tuple(b * size for b in block)
+            hi = tuple(min(b + size, n - 1)
+                       for b, n in zip(lo, self._data.shape))
+            return _extract_block(self._data, level, lo, hi)
+
+        n_threads = self._n_threads
+        if n_threads is None:
+            n_threads = os.cpu_count() or 1
+        n_threads = min(int(n_threads), len(todo))
+        if n_threads > 1:
+            with ThreadPoolExecutor(n_threads) as pool:
+                results = list(pool.map(extract, todo))
+        else:
+            results = [extract(block) for block in todo]
+        self._blocks.update(zip(todo, results))
+        return _stitch_blocks([self._blocks[tuple(b)] for b in active])
+
+
 def _get_data_cache():
     # Precompute lookup tables on the first run
     
@@ -4,7 +4,7 @@
 
 import numpy as np
 
-from ..ext.six.moves import xrange
+from .calculations import _calculate_normals
 
 
 def _fix_colors(colors):
@@ -21,6 +21,42 @@ def _fix_colors(colors):
     return colors
 
 
+def _weld_vertices(vertices):
+    """Merge nearly identical vertices (difference < 1e-14)
+
+    Parameters
+    ----------
+    vertices : ndarray, shape (Nv, D)
+        Vertex coordinates.
+
+    Returns
+    -------
+    first : ndarray
+        The index of the first occurrence of each unique vertex, in
+        increasing order.
+    index : ndarray
+        Array (Nv,) of uint32 giving the unique vertex of each vertex, unique
+        vertices being numbered in order of first occurrence.
+    """
+    # quantize to ensure nearly-identical points will be merged, in double
+    # precision (adding 0 turns -0. into 0.)
+    quantized = np.round(vertices.astype(np.float64) * 1e14) + 0.
+    order = np.lexsort(quantized.T[::-1])
+    quantized = quantized[order]
+    new = np.empty(len(order), dtype=bool)
+    new[:1] = True
+    np.any(quantized[1:] != quantized[:-1], axis=1, out=new[1:])
+    del quantized
+
+    group = np.cumsum(new) - 1
+    first = order[new]
+    rank = np.empty(len(first), dtype=np.uint32)
+    rank[np.argsort(first, kind='stable')] = np.arange(len(first))
+    index = np.empty(len(order), dtype=np.uint32)
+    index[order] = rank[group]
+    return np.sort(first), index
+
+
 class MeshData(object):
     """
     Class for storing and operating on 3D mesh data.
@@ -329,21 +365,10 @@ class MeshData(object):
             The normals.
         """
         if self._vertex_normals is None:
-            faceNorms = self.get_face_normals()
-            vertFaces = self.get_vertex_faces()
-            self._vertex_normals = np.empty(self._vertices.shape,
-                                            dtype=np.float32)
-            for vindex in xrange(self._vertices.shape[0]):
-                faces = vertFaces[vindex]
-                if len(faces) == 0:
-                    self._vertex_normals[vindex] = (0, 0, 0)
-                    continue
-                norms = faceNorms[faces]  # get all face normals
-                norm = norms.sum(axis=0)  # sum normals
-                renorm = (norm**2).sum()**0.5
-                if renorm > 0:
-                    norm /= renorm
-                self._vertex_normals[vindex] = norm
+            # each face contributes its normal weighted by its area
+            norms = _calculate_normals(self.get_vertices(), self.get_faces(),
+                                       weighting='area')
+            self._vertex_normals = norms.astype(np.float32)
 
         if indexed is None:
             return self._vertex_normals
@@ -546,40 +571,41 @@ class MeshData(object):
 
         # I think generally this should be discouraged..
         faces = self._vertices_indexed_by_faces
-        verts = {}  # used to remember the index of each vertex position
-        self._faces = np.empty(faces.shape[:2], dtype=np.uint32)
-        self._vertices = []
-        self._vertex_faces = []
+        verts = faces.reshape(-1, faces.shape[-1])
+        first, index = _weld_vertices(verts)
+        self._faces = index.reshape(faces.shape[:2])
+        self._vertices = np.array(verts[first], dtype=np.float32)
+        self._vertex_faces = None
         self._face_normals = None
         self._vertex_normals = None
-        for i in xrange(faces.shape[0]):
-            face = faces[i]
-            for j in range(face.shape[0]):
-                pt = face[j]
-                # quantize to ensure nearly-identical points will be merged
-                pt2 = tuple([round(x*1e14) for x in pt])
-                index = verts.get(pt2, None)
-                if index is None:
-                    self._vertices.append(pt)
-                    self._vertex_faces.append([])
-                    index = len(self._vertices)-1
-                    verts[pt2] = index
-                # track which vertices belong to which faces
-                self._vertex_faces[index].append(i)
-                self._faces[i, j] = index
-        self._vertices = np.array(self._vertices, dtype=np.float32)
-
-    def get_vertex_faces(self):
+
+    def get_vertex_faces(self, csr=False):
         """
         List mapping each vertex index to a list of face indices that use it.
+
+        Parameters
+        ----------
+        csr : bool
+            If True, return the mapping in compressed sparse row format:
+            the faces using vertex i are ``indices[indptr[i]:indptr[i+1]]``.
+
+        Returns
+        -------
+        vertex_faces : list | tuple
+            The list of lists of face indices, or the arrays
+            ``(indptr, indices)`` if csr is True.
         """
         if self._vertex_faces is None:
-            self._vertex_faces = [[] for i in xrange(len(self.get_vertices()))]
-            for i in xrange(self._faces.shape[0]):
-                face = self._faces[i]
-                for ind in face:
-                    self._vertex_faces[ind].append(i)
-        return self._vertex_faces
+            faces = self.get_faces().ravel().astype(np.intp)
+            counts = np.bincount(faces, minlength=len(self.get_vertices()))
+            indptr = np.zeros(len(counts) + 1, dtype=np.intp)
+            np.cumsum(counts, out=indptr[1:])
+            indices = np.argsort(faces, kind='stable') // 3
+            self._vertex_faces = indptr, indices
+        if csr:
+            return self._vertex_faces
+        indptr, indices = self._vertex_faces
+        return [f.tolist() for f in np.split(indices, indptr[1:-1])]
 
     def _compute_edges(self, indexed=None):
         if indexed is None:
@@ -6,6 +6,8 @@
 
 import numpy as np
 
+from .calculations import _calculate_normals
+
 
 def compact(vertices, indices, tolerance=1e-3):
     """ Compact vertices and indices within given tolerance """
@@ -38,18 +40,16 @@ def compact(vertices, indices, tolerance=1e-3):
     U, RI = np.unique(V_, return_inverse=True)
 
     # Translate indices from original vertices into the reduced set (U)
-    indices = indices.ravel()
-    I_ = indices.copy().ravel()
-    for i in range(len(indices)):
-        I_[i] = RI[indices[i]]
-    I_ = I_.reshape(len(indices)//3, 3)
+    indices = np.asarray(indices)
+    I_ = RI[indices.ravel()].astype(indices.dtype)
+    I_ = I_.reshape(len(I_)//3, 3)
 
     # Return reduced vertices set, transalted indices and mapping that allows
     # to go from U to V
     return U.view(np.float32).reshape(len(U), 3), I_, RI
 
 
-def normals(vertices, indices):
+def normals(vertices, indices, weighting=None):
     """
     Compute normals over a triangulated surface
 
@@ -61,22 +61,15 @@ def normals(vertices, indices):
 
     indices : ndarray (p,3)
         triangles indices
+
+    weighting : str | None
+        If None, each triangle contributes its unit normal to the normals of
+        its vertices. Use 'area' or 'angle' to weight them by the area of
+        the triangles or by their angle at the vertices.
     """
 
     # Compact similar vertices
     vertices, indices, mapping = compact(vertices, indices)
 
-    T = vertices[indices]
-    N = np.cross(T[:, 1] - T[:, 0], T[:, 2]-T[:, 0])
-    L = np.sqrt(np.sum(N * N, axis=1))
-    L[L == 0] = 1.0  # prevent divide-by-zero
-    N /= L[:, np.newaxis]
-    normals = np.zeros_like(vertices)
-    normals[indices[:, 0]] += N
-    normals[indices[:, 1]] += N
-    normals[indices[:, 2]] += N
-    L = np.sqrt(np.sum(normals*normals, axis=1))
-    L[L == 0] = 1.0
-    normals /= L[:, np.newaxis]
-
-    return normals[mapping]
+    normals = _calculate_normals(vertices, indices, weighting)
+    return normals[mapping].astype(vertices.dtype)
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+
+"""Polyline simplification
+
+The Ramer-Douglas-Peucker algorithm is evaluated breadth-first: at each pass
+all pending segments of the path are processed at once with NumPy, so the
+number of Python iterations is the depth of the subdivision tree rather than
+the number of vertices.
+"""
+
+from __future__ import division
+
+import numpy as np
+
+
+def _segment_distance2(p, a, b):
+    """Squared distance from points p to the segments (a, b), row by row"""
+    ab = b - a
+    ap = p - a
+    norm = np.einsum('ij,ij->i', ab, ab)
+    t = np.einsum('ij,ij->i', ap, ab)
+    nz = norm > 0
+    t[nz] /= norm[nz]
+    t[~nz] = 0.
+    np.clip(t, 0., 1., out=t)
+    ap -= t[:, np.newaxis] * ab
+    return np.einsum('ij,ij->i', ap, ap)
+
+
+def path_significance(pos, closed=False, tolerance=0.):
+    """Compute the Douglas-Peucker significance of each vertex of a path
+
+    The significance of a vertex is the largest tolerance for which the
+    vertex survives Douglas-Peucker simplification. Since the algorithm
+    always splits at the same vertices whatever the tolerance, the
+    simplifications obtained for increasing tolerances are nested, and
+    ``path_significance(pos) > tolerance`` is the mask of vertices kept by
+    ``simplify_path(pos, tolerance)``. Computing the significance once is
+    thus enough to extract any level of detail.
+
+    Parameters
+    ----------
+    pos : array, shape (N, 2) or (N, 3)
+        The path vertices.
+    closed : bool
+        If True, the path is a closed loop. The vertex farthest from the
+        first vertex is then given infinite significance so that a
+        simplified loop never degenerates to a single segment.
+    tolerance : float
+        Segments whose vertices are all within this distance are not
+        subdivided any further. Their interior vertices are given a
+        significance of zero. Use a non-zero value to speed up the
+        computation when small tolerances are never queried.
+
+    Returns
+    -------
+    significance : array, shape (N,)
+        The significance of each vertex. End points have infinite
+        significance.
+    """
+    pos = np.asarray(pos, dtype=np.float64)
+    if pos.ndim != 2 or pos.shape[1] not in (2, 3):
+        raise ValueError('pos must be an array of shape (N, 2) or (N, 3)')
+    n = len(pos)
+    sig = np.zeros(n)
+    if n == 0:
+        return sig
+    sig[0] = sig[-1] = np.inf
+    if n < 3:
+        return sig
+
+    starts = np.array([0])
+    stops = np.array([n - 1])
+    caps = np.array([np.inf])
+    if closed:
+        d = pos[1:-1] - pos[0]
+        mid = 1 + np.argmax(np.einsum('ij,ij->i', d, d))
+        sig[mid] = np.inf
+        starts = np.array([0, mid])
+        stops = np.array([mid, n - 1])
+        caps = np.array([np.inf, np.inf])
+
+    while len(starts):
+        lengths = stops - starts - 1
+        sel = lengths > 0
+        starts, stops, caps, lengths = (starts[sel], stops[sel], caps[sel],
+                                        lengths[sel])
+        if len(starts) == 0:
+            break
+
+        # Flatten the interior vertices of all segments
+        offsets = np.cumsum(lengths) - lengths
+        seg = np.repeat(np.arange(len(starts)), lengths)
+        idx = (np.arange(lengths.sum()) - offsets[seg] + starts[seg] + 1)
+        d = _segment_distance2(pos[idx], pos[starts[seg]], pos[stops[seg]])
+
+        # Farthest vertex of each segment (first one on ties)
+        dmax = np.maximum.reduceat(d, offsets)
+        far = np.flatnonzero(d == dmax[seg])
+        first = np.flatnonzero(np.diff(seg[far], prepend=-1))
+        mid = idx[far[first]]
+        dmax = np.sqrt(dmax)
+
+        split = dmax > tolerance
+        mid, dmax, caps = mid[split], dmax[split], caps[split]
+        caps = np.minimum(caps, dmax)
+        sig[mid] = caps
+        starts, stops = (np.concatenate([starts[split], mid]),
+                         np.concatenate([mid, stops[split]]))
+        caps = np.concatenate([caps, caps])
+    return sig
+
+
+def simplify_path(pos, tolerance, closed=False):
+    """Simplify a path using the Ramer-Douglas-Peucker algorithm
+
+    Parameters
+    ----------
+    pos : array, shape (N, 2) or (N, 3)
+        The path vertices.
+    tolerance : float
+        Maximum distance between the original path and the simplified one.
+    closed : bool
+        If True, the path is a closed loop (see `path_significance`).
+
+    Returns
+    -------
+    keep : array of bool, shape (N,)
+        Mask of the vertices to keep. End points are always kept.
+    """
+    return path_significance(pos, closed, tolerance) > tolerance
@@ -2,10 +2,12 @@
 # Copyright (c) Vispy Development Team. All Rights Reserved.
 # Distributed under the (new) BSD License. See LICENSE.txt for more info.
 import numpy as np
-from numpy.testing import assert_allclose
+from numpy.testing import assert_allclose, assert_array_equal
 
 from vispy.testing import assert_raises
-from vispy.geometry import resize
+from vispy.geometry import resize, create_sphere
+from vispy.geometry.calculations import _calculate_normals
+from vispy.geometry.normals import normals, compact
 
 
 def test_resize():
@@ -22,3 +24,50 @@ def test_resize():
         # this won't actually be that close for bilinear interp
         assert_allclose(data, resize(resize(data, 2 * shape[:2], kind=kind),
                                      shape[:2], kind=kind), atol=tol, rtol=tol)
+
+
+def test_normals():
+    """Test vertex normals"""
+    # two triangles of different areas and angles sharing vertex 0
+    rr = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 3], [-1, 0, 0]],
+                  dtype=np.float32)
+    tris = np.array([[0, 1, 2], [0, 4, 3]])
+    z, y = np.array([0, 0, 1.]), np.array([0, 1., 0])
+    n = _calculate_normals(rr, tris)
+    assert_allclose(n[0], (z + y) / np.sqrt(2), atol=1e-7)
+    assert_allclose(n[1], z)
+    assert_allclose(n[3], y)
+    n = _calculate_normals(rr, tris, weighting='area')
+    assert_allclose(n[0], (z + 3 * y) / np.sqrt(10), atol=1e-7)
+    n = _calculate_normals(rr, tris, weighting='angle')
+    assert_allclose(n[0], (z + y) / np.sqrt(2), atol=1e-7)
+    tris = np.array([[0, 1, 2], [0, 3, 1], [1, 2, 0]])
+    n = _calculate_normals(rr, tris, weighting='angle')
+    ref = 2 * z * np.pi / 2 + y * np.pi / 2
+    assert_allclose(n[0], ref / np.sqrt((ref ** 2).sum()), atol=1e-7)
+    assert_raises(ValueError, _calculate_normals, rr, tris, 'foo')
+
+    # repeated indices are all accounted for
+    n = _calculate_normals(rr, [[0, 1, 2], [0, 1, 2], [0, 4, 3]])
+    ref = 2 * z + y
+    assert_allclose(n[0], ref / np.sqrt(5), atol=1e-7)
+    # unused vertices have null normals
+    n = _calculate_normals(rr, [[0, 1, 2]])
+    assert_allclose(n[3:], 0)
+
+    # the normals of a sphere are close to the vertices
+    mesh = create_sphere(20, 20)
+    rr, tris = mesh.get_vertices(), mesh.get_faces()
+    for weighting in (None, 'area', 'angle'):
+        n = normals(rr, tris, weighting)
+        assert n.dtype == np.float32
+        assert_allclose(n, rr, atol=0.05)
+    assert_allclose(mesh.get_vertex_normals(), rr, atol=0.05)
+
+    # duplicated vertices are merged
+    rr2 = np.concatenate([rr, rr])
+    tris2 = np.concatenate([tris, tris + len(rr)])
+    vertices, indices, mapping = compact(rr2, tris2)
+    assert len(vertices) == len(rr)
+    assert_array_equal(mapping[tris2], indices)
+    assert indices.dtype == tris2.dtype
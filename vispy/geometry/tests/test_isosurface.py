@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+import numpy as np
+from numpy.testing import assert_array_equal, assert_allclose
+
+from vispy.geometry.isosurface import isosurface, IncrementalIsosurface
+from vispy.testing import assert_raises, run_tests_if_main
+
+
+def test_isosurface():
+    """Test isosurface extraction"""
+    x = np.linspace(-1, 1, 30)
+    data = x[:, None, None] ** 2 + x[None, :, None] ** 2 + \
+        x[None, None, :] ** 2
+    vertices, faces = isosurface(data, 0.5)
+    assert vertices.dtype == np.float32
+    assert faces.dtype == np.uint32
+    assert faces.max() == len(vertices) - 1
+
+    # vertices lie on the sphere (up to the linear interpolation)
+    radius = np.sqrt((((vertices / 29.) * 2 - 1) ** 2).sum(axis=1))
+    assert_allclose(radius, np.sqrt(0.5), atol=2e-3)
+
+    # the surface is closed: each edge is shared by two faces
+    edges = np.sort(faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+    _, counts = np.unique(edges, axis=0, return_counts=True)
+    assert (counts == 2).all()
+
+    # chunks and threads do not change the result
+    data = np.random.RandomState(0).rand(17, 9, 13).astype(np.float32)
+    vertices, faces = isosurface(data, 0.3, chunk_size=16, n_threads=1)
+    for chunk_size in (1, 2, 5):
+        for n_threads in (1, 3):
+            v, f = isosurface(data, 0.3, chunk_size, n_threads)
+            assert_array_equal(v, vertices)
+            assert_array_equal(f, faces)
+
+    vertices, faces = isosurface(np.zeros((1, 5, 5)), 0.5)
+    assert vertices.shape == faces.shape == (0, 3)
+    assert_raises(ValueError, isosurface, np.zeros((5, 5)), 0.5)
+
+
+def _sorted_faces(faces):
+    """Faces in a canonical order, keeping their orientation"""
+    faces = faces.astype(np.int64)
+    first = np.argmin(faces, axis=1)
+    faces = np.stack([faces[np.arange(len(faces)), (first + k) % 3]
+                      for k in range(3)], axis=1)
+    return faces[np.lexsort(faces.T[::-1])]
+
+
+def test_incremental_isosurface():
+    """Test incremental isosurface extraction"""
+    rng = np.random.RandomState(0)
+    data = rng.rand(33, 20, 17).astype(np.float32)
+    iso = IncrementalIsosurface(data, block_size=8, n_threads=2)
+    assert iso.data is data  # not copied until a partial update
+    for level in (0.3, 0.7):
+        vertices, faces = iso.extract(level)
+        ref_vertices, ref_faces = isosurface(data, level)
+        assert_array_equal(vertices, ref_vertices)
+        assert_array_equal(_sorted_faces(faces), _sorted_faces(ref_faces))
+
+    # only the blocks straddling the level are extracted
+    data[:] = 0
+    data[:12, :12, :12] = 1
+    iso = IncrementalIsosurface(data, block_size=8)
+    iso.extract(0.5)
+    assert sorted(iso._blocks) == [(0, 0, 1), (0, 1, 0), (0, 1, 1),
+                                   (1, 0, 0), (1, 0, 1), (1, 1, 0),
+                                   (1, 1, 1)]
+
+    # partial updates only re-extract the affected blocks
+    cached = dict(iso._blocks)
+    iso.set_data(np.ones((4, 4, 4)), (14, 2, 2))
+    assert iso.data[15, 3, 3] == 1
+    assert data[15, 3, 3] == 0  # the original array is left unchanged
+    data = iso.data
+    assert (1, 0, 0) not in iso._blocks and (0, 0, 1) in iso._blocks
+    vertices, faces = iso.extract(0.5)
+    assert iso._blocks[0, 0, 1] is cached[0, 0, 1]
+    assert (2, 0, 0) in iso._blocks
+    ref_vertices, ref_faces = isosurface(data, 0.5)
+    assert_array_equal(vertices, ref_vertices)
+    assert_array_equal(_sorted_faces(faces), _sorted_faces(ref_faces))
+    iso.set_data(np.ones((1, 1, 1)), (0, 0, 0))
+    assert iso.data is data  # only copied once
+
+    assert_raises(ValueError, iso.set_data, np.ones((4, 4, 4)), (31, 0, 0))
+
+    # read-only arrays can be updated
+    data = np.zeros((10, 10, 10))
+    data.flags.writeable = False
+    iso = IncrementalIsosurface(data)
+    iso.set_data(np.ones((2, 2, 2)), (4, 4, 4))
+    assert iso.data[5, 5, 5] == 1 and data[5, 5, 5] == 0
+
+
+run_tests_if_main()
@@ -31,4 +31,31 @@ def test_meshdata():
     assert_array_equal(square_edges, mesh.get_edges())
 
 
+def test_meshdata_indexed_by_faces():
+    """Test welding of vertices indexed by faces"""
+    square_vertices = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0]],
+                               dtype=np.float32)
+    square_faces = np.array([[0, 1, 2], [0, 2, 3]], dtype=np.uint32)
+    tris = square_vertices[square_faces]
+    # nearly identical vertices are merged
+    tris[1, 0, 0] = -1e-16
+    mesh = MeshData(vertices=tris)
+    assert_array_equal(square_vertices, mesh.get_vertices())
+    assert_array_equal(square_faces, mesh.get_faces())
+    assert mesh.get_faces().dtype == np.uint32
+
+    assert mesh.get_vertex_faces() == [[0, 1], [0], [0, 1], [1]]
+    indptr, indices = mesh.get_vertex_faces(csr=True)
+    assert_array_equal(indptr, [0, 2, 3, 5, 6])
+    assert_array_equal(indices, [0, 1, 0, 0, 1, 1])
+
+    # distinct float32 vertices one ulp apart are not merged
+    tris = np.full((2, 3, 3), 3, np.float32)
+    tris[1, 0, 0] = np.nextafter(np.float32(3), np.float32(4))
+    tris[:, 1, 1] = tris[:, 2, 2] = 4
+    mesh = MeshData(vertices=tris)
+    assert len(mesh.get_vertices()) == 4
+    assert_array_equal(mesh.get_faces(), [[0, 1, 2], [3, 1, 2]])
+
+
 run_tests_if_main()
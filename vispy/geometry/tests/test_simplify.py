@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from vispy.testing import assert_raises
+from vispy.geometry import simplify_path
+from vispy.geometry.simplify import path_significance
+
+
+def _recursive_dp(pos, tolerance):
+    """Reference (depth-first) Douglas-Peucker implementation"""
+    keep = np.zeros(len(pos), bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(pos) - 1)]
+    while stack:
+        start, stop = stack.pop()
+        if stop - start < 2:
+            continue
+        a, b = pos[start], pos[stop]
+        ab = b - a
+        dists = []
+        for p in pos[start + 1:stop]:
+            t = np.dot(p - a, ab) / np.dot(ab, ab) if ab.any() else 0.
+            t = min(max(t, 0.), 1.)
+            dists.append(np.linalg.norm(p - a - t * ab))
+        i = int(np.argmax(dists))
+        if dists[i] > tolerance:
+            keep[start + 1 + i] = True
+            stack.extend([(start, start + 1 + i), (start + 1 + i, stop)])
+    return keep
+
+
+def test_simplify_path():
+    """Test vectorized Douglas-Peucker simplification"""
+    rng = np.random.RandomState(0)
+    for n in (2, 3, 10, 200):
+        for dim in (2, 3):
+            pos = np.cumsum(rng.randn(n, dim), axis=0)
+            for tol in (0., 0.5, 2., 10.):
+                assert_array_equal(simplify_path(pos, tol),
+                                   _recursive_dp(pos, tol))
+
+    # straight line reduces to its end points
+    pos = np.c_[np.arange(10.), np.zeros(10)]
+    assert_array_equal(np.flatnonzero(simplify_path(pos, 0.1)), [0, 9])
+
+    # closed paths keep at least three vertices
+    theta = np.linspace(0, 2 * np.pi, 50, endpoint=False)
+    pos = np.c_[np.cos(theta), np.sin(theta)]
+    assert simplify_path(pos, 10., closed=True).sum() == 3
+    assert_raises(ValueError, simplify_path, np.zeros((4, 4)), 1.)
+
+
+def test_path_significance():
+    """Test that significance encodes nested simplifications"""
+    pos = np.cumsum(np.random.RandomState(1).randn(500, 2), axis=0)
+    sig = path_significance(pos)
+    assert np.isinf(sig[[0, -1]]).all()
+    for tol in (0.1, 1., 5.):
+        assert_array_equal(sig > tol, _recursive_dp(pos, tol))
+    # early stopping only affects vertices below the tolerance
+    assert_array_equal(path_significance(pos, tolerance=1.) > 1., sig > 1.)
@@ -4,8 +4,9 @@ from unittest import SkipTest
 import numpy as np
 from numpy.testing import assert_array_almost_equal
 
-from vispy.testing import run_tests_if_main
-from vispy.geometry.triangulation import Triangulation as T
+from vispy.testing import run_tests_if_main, assert_raises
+from vispy.geometry.triangulation import (Triangulation as T, _Front,
+                                          triangulate, triangulate_polygons)
 
 
 def assert_array_eq(a, b):
@@ -157,6 +158,37 @@ def test_edge_intersections():
         assert len(cuts) == 0
 
 
+def test_edge_pairs():
+    # candidate pairs must include all pairs of edges that intersect
+    np.random.seed(0)
+    pts = np.cumsum(np.random.normal(size=(200, 2)), axis=0)
+    edges = np.c_[np.arange(200), (np.arange(200) + 1) % 200]
+    t = T(pts, edges)
+    segs = t.pts[t.edges]
+    lo = segs.min(axis=1)
+    hi = segs.max(axis=1)
+    overlap = np.all((lo[:, None] <= hi[None, :]) &
+                     (lo[None, :] <= hi[:, None]), axis=2)
+    expect = np.argwhere(np.triu(overlap, 1))
+
+    first, second = t._edge_pairs(segs)
+    pairs = set(zip(first.tolist(), second.tolist()))
+    assert pairs.issuperset(map(tuple, expect.tolist()))
+    assert np.all(first < second)
+    assert np.all(np.diff(first * len(segs) + second) > 0)
+
+    # generating the pairs in chunks does not change them
+    cuts = t._find_edge_intersections()
+    t._pair_chunk = 7
+    first2, second2 = t._edge_pairs(segs)
+    assert np.array_equal(first, first2)
+    assert np.array_equal(second, second2)
+    cuts2 = t._find_edge_intersections()
+    assert list(cuts) == list(cuts2)
+    for k, v in cuts.items():
+        assert [c[0] for c in v] == [c[0] for c in cuts2[k]]
+
+
 def test_merge_duplicate_points():
     global t
     pts = np.array([
@@ -196,6 +228,35 @@ def test_merge_duplicate_points():
     assert np.allclose(t.pts, pts)
     assert np.all(t.edges == edges)
 
+    # points repeated more than twice
+    pts = np.array([[0, 0], [1, 1], [0, 0], [2, 0], [0, 0], [1, 1]])
+    edges = np.array([[0, 1], [1, 2], [2, 3], [3, 4], [4, 5]])
+    t = T(pts, edges)
+    t._merge_duplicate_points()
+    assert np.allclose(t.pts, [[0, 0], [1, 1], [2, 0]])
+    assert np.all(t.edges == [[0, 1], [1, 0], [0, 2], [2, 0], [0, 1]])
+
+
+def test_front():
+    x = [0., 10., 5., 2., 7., 2., 8.]
+    front = _Front(x, [0, 2, 1])
+    front._load = 1  # small blocks
+    assert front.find(4.) == 0
+    assert front.find(5.) == 2
+    front.insert(0, 3)
+    front.insert(2, 4)
+    front.insert(4, 6)
+    assert list(front) == [0, 3, 2, 4, 6, 1]
+    assert len(front) == 6
+    assert [front.find(v) for v in (1., 2., 6., 9.)] == [0, 3, 2, 6]
+    front.replace(3, 5)
+    front.remove(4)
+    front.remove(0)
+    assert list(front) == [5, 2, 6, 1]
+    assert front.prev[2] == 5 and front.next[2] == 6
+    assert 0 not in front.next and 5 not in front.prev
+    assert [front.find(v) for v in (2., 6., 9.)] == [5, 2, 6]
+
 
 def test_initialize():
     # check points are correctly sorted
@@ -315,6 +376,64 @@ def test_random():
     #t.triangulate()
 
 
+def test_large_polygon():
+    # star-shaped polygon with many vertices
+    N = 1000
+    np.random.seed(0)
+    theta = np.linspace(0, 2 * np.pi, N, endpoint=False)
+    r = 1 + 0.2 * np.sin(7 * theta) + 0.02 * np.random.rand(N)
+    pts = np.array([r * np.cos(theta), r * np.sin(theta)]).T
+    edges = np.array([np.arange(N), (np.arange(N) + 1) % N]).T
+
+    t = T(pts, edges)
+    t.triangulate()
+    assert len(t.tris) == N - 2
+    a, b, c = (t.pts[t.tris[:, i]] for i in range(3))
+    area = np.abs(np.cross(b - a, c - a)).sum() / 2
+    x, y = pts.astype(np.float32).T
+    expected = np.abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+    assert_array_almost_equal(area, expected / 2, 4)
+
+
+def test_triangulate_polygons():
+    np.random.seed(0)
+    polygons = []
+    for i in range(20):
+        n = np.random.randint(3, 12)
+        theta = np.sort(np.random.uniform(0, 2 * np.pi, n))
+        r = np.random.uniform(0.5, 1, n)
+        polygons.append(np.c_[r * np.cos(theta) + 3 * i, r * np.sin(theta),
+                              np.full(n, i)])
+    polygons.insert(5, np.zeros((0, 3)))  # empty polygons are kept
+    vertices = np.concatenate(polygons)
+    offsets = np.r_[0, np.cumsum([len(p) for p in polygons])]
+
+    for executor in (None, 'thread'):
+        vert, tris, vert_off, tri_off = triangulate_polygons(
+            vertices, offsets, n_workers=2, executor=executor)
+        assert vert.dtype == np.float32 and vert.shape[1] == 3
+        assert tris.dtype == np.uint32 and tris.shape[1] == 3
+        assert len(vert_off) == len(tri_off) == len(polygons) + 1
+        assert vert_off[-1] == len(vert) and tri_off[-1] == len(tris)
+        for i, poly in enumerate(polygons):
+            pv = vert[vert_off[i]:vert_off[i + 1]]
+            pt = tris[tri_off[i]:tri_off[i + 1]]
+            if len(poly) == 0:
+                assert len(pv) == len(pt) == 0
+                continue
+            ev, et = triangulate(poly)
+            assert_array_almost_equal(pv, ev, 4)
+            assert np.all(pt - vert_off[i] == et.reshape(-1, 3))
+
+    vert, tris, vert_off, tri_off = triangulate_polygons(np.zeros((0, 2)),
+                                                         [0])
+    assert vert.shape == (0, 2) and tris.shape == (0, 3)
+    assert list(vert_off) == list(tri_off) == [0]
+    assert_raises(ValueError, triangulate_polygons, vertices, offsets[:-1])
+    assert_raises(ValueError, triangulate_polygons, vertices, offsets,
+                  executor='gpu')
+
+
 def test_orthogonal():
     # make lines that are entirely vertical / horizontal
     np.random.seed(1)
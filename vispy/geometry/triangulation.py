@@ -2,12 +2,123 @@
 
 from __future__ import division, print_function
 
+from bisect import bisect_left, bisect_right
+from concurrent.futures import Executor, ProcessPoolExecutor, \
+    ThreadPoolExecutor
 from itertools import permutations
+import math
+import os
 import numpy as np
 
 from collections import OrderedDict
 
 
+class _Front(object):
+    """Advancing front of the sweep
+
+    The front is a polyline whose vertexes have strictly increasing x
+    coordinates. Vertexes are linked to their neighbors (`prev` and `next`
+    map a vertex to its neighbors), and their x coordinates are kept sorted
+    in blocks of bounded size so that the front is searched by bisection and
+    vertexes are inserted or removed in O(log n) steps.
+
+    Parameters
+    ----------
+    x : list
+        The x coordinate of each point.
+    vertexes : list
+        The initial vertexes of the front, from left to right.
+    """
+    _load = 512  # blocks are split beyond twice this size
+
+    def __init__(self, x, vertexes):
+        self.x = x
+        self.prev = dict(zip(vertexes[1:], vertexes[:-1]))
+        self.next = dict(zip(vertexes[:-1], vertexes[1:]))
+        self.first = vertexes[0]
+        self._keys = [[x[v] for v in vertexes]]
+        self._vertexes = [list(vertexes)]
+        self._mins = [self._keys[0][0]]
+        self._len = len(vertexes)
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        v = self.first
+        while v is not None:
+            yield v
+            v = self.next.get(v)
+
+    def _locate(self, x, find=bisect_right):
+        """Return the block containing x and the position of x in it"""
+        b = max(bisect_right(self._mins, x) - 1, 0)
+        return b, find(self._keys[b], x)
+
+    def find(self, x):
+        """Return the rightmost vertex whose x coordinate is <= x"""
+        b, p = self._locate(x)
+        return self._vertexes[b][max(p - 1, 0)]
+
+    def insert(self, a, v):
+        """Insert vertex v after vertex a"""
+        b, p = self._locate(self.x[v])
+        keys, vertexes = self._keys[b], self._vertexes[b]
+        keys.insert(p, self.x[v])
+        vertexes.insert(p, v)
+        if p == 0:
+            self._mins[b] = keys[0]
+        if len(keys) > 2 * self._load:
+            self._keys[b:b + 1] = keys[:self._load], keys[self._load:]
+            self._vertexes[b:b + 1] = (vertexes[:self._load],
+                                       vertexes[self._load:])
+            self._mins.insert(b + 1, keys[self._load])
+        self._len += 1
+
+        n = self.next.get(a)
+        self.next[a] = v
+        self.prev[v] = a
+        if n is not None:
+            self.next[v] = n
+            self.prev[n] = v
+
+    def replace(self, a, v):
+        """Replace vertex a by vertex v, which has the same x coordinate"""
+        b, p = self._locate(self.x[a], bisect_left)
+        self._vertexes[b][p] = v
+        for links, other in ((self.prev, self.next), (self.next, self.prev)):
+            n = links.pop(a, None)
+            if n is not None:
+                links[v] = n
+                other[n] = v
+        if self.first == a:
+            self.first = v
+
+    def remove(self, v):
+        """Remove vertex v"""
+        b, p = self._locate(self.x[v], bisect_left)
+        keys, vertexes = self._keys[b], self._vertexes[b]
+        del keys[p], vertexes[p]
+        if not keys and len(self._keys) > 1:
+            del self._keys[b], self._vertexes[b], self._mins[b]
+        elif p == 0 and keys:
+            self._mins[b] = keys[0]
+        self._len -= 1
+
+        pv, nv = self.prev.pop(v, None), self.next.pop(v, None)
+        if pv is None:
+            self.first = nv
+        elif nv is None:
+            del self.next[pv]
+        else:
+            self.next[pv] = nv
+        if nv is not None:
+            if pv is None:
+                del self.prev[nv]
+            else:
+                self.prev[nv] = pv
+
+
 class Triangulation(object):
     """Constrained delaunay triangulation
 
@@ -26,6 +137,11 @@ class Triangulation(object):
       triangulation, but adding legalisation would produce fewer thin
       triangles.
     * The pts and edges arrays may be modified.
+    * The front is searched by bisection and triangles are indexed by edge
+      and by vertex, so that the sweep takes O(n log n) time for typical
+      polygons.
+    * Intersections between edges are only computed for the pairs of edges
+      whose bounding boxes overlap, found with a sweep along one axis.
 
     References
     ----------
@@ -34,6 +150,9 @@ class Triangulation(object):
 
 
     """
+    # maximum number of candidate pairs of edges generated at once
+    _pair_chunk = 1 << 20
+
     def __init__(self, pts, edges):
         self.pts = pts[:, :2].astype(np.float32)
         self.edges = edges
@@ -46,6 +165,9 @@ class Triangulation(object):
         self._front = None
         self.tris = OrderedDict()
         self._edges_lookup = {}
+        self._vertex_tris = {}
+        self._constraints = None
+        self._coords = self.pts.tolist()
 
     def _normalize(self):
         # Clean up data   (not discussed in original publication)
@@ -97,10 +219,18 @@ class Triangulation(object):
         # find topmost point in each edge
         self._tops = self.edges.max(axis=1)
         self._bottoms = self.edges.min(axis=1)
+        # bottom points of the edges ending at each top point
+        self._edges_at = {}
+        for top, bottom in zip(self._tops.tolist(), self._bottoms.tolist()):
+            self._edges_at.setdefault(top, []).append(bottom)
+        self._constraints = None
+
+        # point coordinates as Python floats, faster for scalar arithmetic
+        self._coords = self.pts.tolist()
 
         # inintialize sweep front
-        # values in this list are indexes into self.pts
-        self._front = [0, 2, 1]
+        # values in this front are indexes into self.pts
+        self._front = _Front(self.pts[:, 0].tolist(), [0, 2, 1])
 
         # empty triangle list.
         # This will contain [(a, b, c), ...] where a,b,c are indexes into
@@ -113,79 +243,63 @@ class Triangulation(object):
         # stored as (a, b): c and (b, a): d
         self._edges_lookup = {}
 
+        # For each point, the triangles using it (in insertion order)
+        self._vertex_tris = {}
+
     def triangulate(self):
         """Do the triangulation."""
         self._initialize()
 
-        pts = self.pts
         front = self._front
+        x = front.x
 
         # Begin sweep (sec. 3.4)
-        for i in range(3, pts.shape[0]):
-            pi = pts[i]
-
+        for i in range(3, len(x)):
             # First, triangulate from front to new point
             # This applies to both "point events" (3.4.1)
             # and "edge events" (3.4.2).
 
-            # get index along front that intersects pts[i]
-            idx = 0
-            while pts[front[idx+1], 0] <= pi[0]:
-                idx += 1
-            pl = pts[front[idx]]
+            # get the front edge (pl, pr) that intersects pts[i]
+            pl = front.find(x[i])
+            pr = front.next[pl]
 
             # "(i) middle case"
-            if pi[0] > pl[0]:
+            if x[i] > x[pl]:
                 # Add a single triangle connecting pi,pl,pr
-                self._add_tri(front[idx], front[idx+1], i)
-                front.insert(idx+1, i)
+                self._add_tri(pl, pr, i)
+                front.insert(pl, i)
             # "(ii) left case"
             else:
                 # Add triangles connecting pi,pl,ps and pi,pl,pr
-                self._add_tri(front[idx], front[idx+1], i)
-                self._add_tri(front[idx-1], front[idx], i)
-                front[idx] = i
+                self._add_tri(pl, pr, i)
+                self._add_tri(front.prev[pl], pl, i)
+                front.replace(pl, i)
 
             # Continue adding triangles to smooth out front
             # (heuristics shown in figs. 9, 10)
-            for direction in -1, 1:
+            for neighbor in front.prev, front.next:
                 while True:
                     # Find point connected to pi
-                    ind0 = front.index(i)
-                    ind1 = ind0 + direction
-                    ind2 = ind1 + direction
-                    if ind2 < 0 or ind2 >= len(front):
+                    p1 = neighbor.get(i)
+                    p2 = neighbor.get(p1)
+                    if p2 is None:
                         break
 
-                    # measure angle made with front
-                    p1 = pts[front[ind1]]
-                    p2 = pts[front[ind2]]
-                    err = np.geterr()
-                    np.seterr(invalid='ignore')
-                    try:
-                        angle = np.arccos(self._cosine(pi, p1, p2))
-                    finally:
-                        np.seterr(**err)
-
                     # if angle is < pi/2, make new triangle
-                    if angle > np.pi/2. or np.isnan(angle):
+                    if not self._angle(i, p1, p2) <= np.pi/2.:
                         break
 
-                    assert (i != front[ind1] and
-                            front[ind1] != front[ind2] and
-                            front[ind2] != i)
-                    self._add_tri(i, front[ind1], front[ind2])
-                    front.pop(ind1)
+                    assert i != p1 and p1 != p2 and p2 != i
+                    self._add_tri(i, p1, p2)
+                    front.remove(p1)
 
             # "edge event" (sec. 3.4.2)
             # remove any triangles cut by completed edges and re-fill
             # the holes.
-            if i in self._tops:
-                for j in self._bottoms[self._tops == i]:
-                    # Make sure edge (j, i) is present in mesh
-                    # because edge event may have created a new front list
-                    self._edge_event(i, j)
-                    front = self._front
+            for j in self._edges_at.get(i, ()):
+                # Make sure edge (j, i) is present in mesh
+                # because edge event may have created a new front list
+                self._edge_event(i, j)
 
         self._finalize()
 
@@ -195,19 +309,19 @@ class Triangulation(object):
         # Finalize (sec. 3.5)
 
         # (i) Add bordering triangles to fill hull
-        front = list(OrderedDict.fromkeys(self._front))
-
-        idx = len(front) - 2
-        k = 1
-        while k < idx-1:
-            # if edges lie in counterclockwise direction, then signed area
-            # is positive
-            if self._iscounterclockwise(front[k], front[k+1], front[k+2]):
-                self._add_tri(front[k], front[k+1], front[k+2])
-                front.pop(k+1)
-                idx -= 1
-                continue
-            k += 1
+        # Walk along the front with (a, b, c) consecutive points, the last
+        # point of the front excluded
+        front = list(self._front)
+        if len(front) > 3:
+            a, b = front[1:3]
+            for c in front[3:-1]:
+                # if edges lie in counterclockwise direction, then signed area
+                # is positive
+                if self._iscounterclockwise(a, b, c):
+                    self._add_tri(a, b, c)
+                else:
+                    a = b
+                b = c
 
         # (ii) Remove all triangles not inside the hull
         #      (not described in article)
@@ -253,8 +367,6 @@ class Triangulation(object):
         This works by removing intersected triangles and filling holes up to
         the cutting edge.
         """
-        front_index = self._front.index(i)
-
         front = self._front
 
         # First just see whether this edge is already present
@@ -278,16 +390,20 @@ class Triangulation(object):
 
         # Keep track of which section of the front must be replaced
         # and with what it should be replaced
-        front_holes = []  # contains indexes for sections of front to remove
+        front_holes = []  # contains points of the front to remove
 
         next_tri = None   # next triangle to cut (already set if in mode 1)
         last_edge = None  # or last triangle edge crossed (if in mode 1)
 
         # Which direction to traverse front
-        front_dir = 1 if self.pts[j][0] > self.pts[i][0] else -1
+        front_dir = 1 if self._coords[j][0] > self._coords[i][0] else -1
+        front_step = front.next if front_dir == 1 else front.prev
+
+        # Current point of the front
+        front_point = i
 
         # Initialize search state
-        if self._edge_below_front((i, j), front_index):
+        if self._edge_below_front((i, j), front_point):
             mode = 1  # follow triangles
             tri = self._find_cut_triangle((i, j))
             last_edge = self._edge_opposite_point(tri, i)
@@ -337,41 +453,40 @@ class Triangulation(object):
 
                     # If we crossed the front, go to mode 2
                     x = self._edge_in_front(last_edge)
-                    if x >= 0:  # crossing over front
+                    if x is not None:  # crossing over front
                         mode = 2
                         next_tri = None
 
                         # where did we cross the front?
                         # nearest to new point
-                        front_index = x + (1 if front_dir == -1 else 0)
+                        front_point = x if front_dir == 1 else front.next[x]
 
                         # Select the correct polygon to be lower_polygon
                         # (because mode 2 requires this).
                         # We know that last_edge is in the front, and
-                        # front[front_index] is the point _above_ the front.
+                        # front_point is the point _above_ the front.
                         # So if this point is currently the last element in
                         # lower_polygon, then the polys must be swapped.
-                        if lower_polygon[-1] == front[front_index]:
+                        if lower_polygon[-1] == front_point:
                             tmp = lower_polygon, upper_polygon
                             upper_polygon, lower_polygon = tmp
                         else:
-                            assert upper_polygon[-1] == front[front_index]
+                            assert upper_polygon[-1] == front_point
 
                     else:
                         assert next_tri is not None
 
             else:  # mode == 2
                 # At each iteration, we require:
-                #   * front_index is the starting index of the edge _preceding_
+                #   * front_point is the starting point of the edge _preceding_
                 #     the edge that will be handled in this iteration
                 #   * lower_polygon is the polygon to which points should be
                 #     added while traversing the front
 
-                front_index += front_dir
-                next_edge = (front[front_index], front[front_index+front_dir])
+                front_point = front_step[front_point]
+                next_edge = (front_point, front_step.get(front_point))
 
-                assert front_index >= 0
-                if front[front_index] == j:
+                if front_point == j:
                     # found endpoint!
                     lower_polygon.append(j)
                     upper_polygon.append(j)
@@ -380,10 +495,10 @@ class Triangulation(object):
                 # Add point to lower_polygon.
                 # The conditional is because there are cases where the
                 # point was already added if we just crossed from mode 1.
-                if lower_polygon[-1] != front[front_index]:
-                    lower_polygon.append(front[front_index])
+                if lower_polygon[-1] != front_point:
+                    lower_polygon.append(front_point)
 
-                front_holes.append(front_index)
+                front_holes.append(front_point)
 
                 if self._edges_intersect((i, j), next_edge):
                     # crossing over front into triangle
@@ -395,7 +510,7 @@ class Triangulation(object):
                     # triangle.
                     next_tri = self._tri_from_edge(last_edge)
 
-                    upper_polygon.append(front[front_index+front_dir])
+                    upper_polygon.append(next_edge[1])
 
         # (iii) triangluate empty areas
 
@@ -410,9 +525,8 @@ class Triangulation(object):
 
         # update front by removing points in the holes (places where front
         # passes below the cut edge)
-        front_holes.sort(reverse=True)
-        for i in front_holes:
-            front.pop(i)
+        for k in OrderedDict.fromkeys(front_holes):
+            front.remove(k)
 
     def _find_cut_triangle(self, edge):
         """
@@ -422,9 +536,8 @@ class Triangulation(object):
         Return None if no triangle is found.
         """
         edges = []  # opposite edge for each triangle attached to edge[0]
-        for tri in self.tris:
-            if edge[0] in tri:
-                edges.append(self._edge_opposite_point(tri, edge[0]))
+        for tri in self._vertex_tris.get(edge[0], ()):
+            edges.append(self._edge_opposite_point(tri, edge[0]))
 
         for oedge in edges:
             o1 = self._orientation(edge, oedge[0])
@@ -435,15 +548,17 @@ class Triangulation(object):
         return None
 
     def _edge_in_front(self, edge):
-        """Return the index where *edge* appears in the current front.
+        """Return the first (leftmost) point of *edge* if it is an edge of
+        the current front.
 
-        If the edge is not in the front, return -1
+        If the edge is not in the front, return None
         """
-        e = (list(edge), list(edge)[::-1])
-        for i in range(len(self._front)-1):
-            if self._front[i:i+2] in e:
-                return i
-        return -1
+        a, b = edge
+        if self._front.next.get(a) == b:
+            return a
+        if self._front.next.get(b) == a:
+            return b
+        return None
 
     def _edge_opposite_point(self, tri, i):
         """Given a triangle, return the edge that is opposite point i.
@@ -500,21 +615,21 @@ class Triangulation(object):
             edges.remove(tuple(edge[::-1]))
         return edges
 
-    def _edge_below_front(self, edge, front_index):
+    def _edge_below_front(self, edge, point):
         """Return True if *edge* is below the current front.
 
-        One of the points in *edge* must be _on_ the front, at *front_index*.
+        One of the points in *edge* must be _on_ the front: *point*.
         """
-        f0 = self._front[front_index-1]
-        f1 = self._front[front_index+1]
+        f0 = self._front.prev[point]
+        f1 = self._front.next[point]
         return (self._orientation(edge, f0) > 0 and
                 self._orientation(edge, f1) < 0)
 
     def _is_constraining_edge(self, edge):
-        mask1 = self.edges == edge[0]
-        mask2 = self.edges == edge[1]
-        return (np.any(mask1[:, 0] & mask2[:, 1]) or
-                np.any(mask2[:, 0] & mask1[:, 1]))
+        if self._constraints is None:
+            edges = [tuple(e) for e in self.edges.tolist()]
+            self._constraints = set(edges + [e[::-1] for e in edges])
+        return tuple(edge) in self._constraints
 
     def _intersected_edge(self, edges, cut_edge):
         """ Given a list of *edges*, return the first that is intersected by
@@ -530,38 +645,45 @@ class Triangulation(object):
         """
         edges = self.pts[self.edges]
         cuts = {}  # { edge: [(intercept, point), ...], ... }
-        for i in range(edges.shape[0]-1):
-            # intersection of edge i onto all others
-            int1 = self._intersect_edge_arrays(edges[i:i+1], edges[i+1:])
-            # intersection of all edges onto edge i
-            int2 = self._intersect_edge_arrays(edges[i+1:], edges[i:i+1])
-
-            # select for pairs that intersect
-            err = np.geterr()
-            np.seterr(divide='ignore', invalid='ignore')
-            try:
-                mask1 = (int1 >= 0) & (int1 <= 1)
-                mask2 = (int2 >= 0) & (int2 <= 1)
-                mask3 = mask1 & mask2  # all intersections
-            finally:
-                np.seterr(**err)
-
-            # compute points of intersection
-            inds = np.argwhere(mask3)[:, 0]
-            if len(inds) == 0:
-                continue
-            h = int2[inds][:, np.newaxis]
-            pts = (edges[i, 0][np.newaxis, :] * (1.0 - h) +
-                   edges[i, 1][np.newaxis, :] * h)
-
-            # record for all edges the location of cut points
-            edge_cuts = cuts.setdefault(i, [])
-            for j, ind in enumerate(inds):
-                if 0 < int2[ind] < 1:
-                    edge_cuts.append((int2[ind], pts[j]))
-                if 0 < int1[ind] < 1:
-                    other_cuts = cuts.setdefault(ind+i+1, [])
-                    other_cuts.append((int1[ind], pts[j]))
+
+        # only test pairs of edges whose bounding boxes overlap
+        first, second = self._edge_pairs(edges)
+
+        # intersection of the first edge onto the second one
+        int1 = self._intersect_edge_arrays(edges[first], edges[second])
+        # intersection of the second edge onto the first one
+        int2 = self._intersect_edge_arrays(edges[second], edges[first])
+
+        # select for pairs that intersect
+        err = np.geterr()
+        np.seterr(divide='ignore', invalid='ignore')
+        try:
+            mask1 = (int1 >= 0) & (int1 <= 1)
+            mask2 = (int2 >= 0) & (int2 <= 1)
+            mask3 = mask1 & mask2  # all intersections
+        finally:
+            np.seterr(**err)
+        first = first[mask3]
+        second = second[mask3]
+        int1 = int1[mask3]
+        int2 = int2[mask3]
+
+        # compute points of intersection
+        h = int2[:, np.newaxis]
+        pts = (edges[first, 0] * (1.0 - h) + edges[first, 1] * h)
+
+        # record for all edges the location of cut points, in the order of
+        # the pairs (the order of the points added by the split)
+        last = None
+        for j, (i, k) in enumerate(zip(first.tolist(), second.tolist())):
+            if i != last:
+                edge_cuts = cuts.setdefault(i, [])
+                last = i
+            if 0 < int2[j] < 1:
+                edge_cuts.append((int2[j], pts[j]))
+            if 0 < int1[j] < 1:
+                other_cuts = cuts.setdefault(k, [])
+                other_cuts.append((int1[j], pts[j]))
 
         # sort all cut lists by intercept, remove duplicates
         for k, v in cuts.items():
@@ -571,6 +693,63 @@ class Triangulation(object):
                     v.pop(i+1)
         return cuts
 
+    def _edge_pairs(self, edges):
+        """Return the pairs of edges (i, j), i < j, whose bounding boxes
+        overlap, sorted by i then j.
+
+        The boxes are sorted along the axis where they overlap the least and
+        swept, so that only the pairs overlapping along that axis are
+        generated, in chunks of at most _pair_chunk pairs.
+        """
+        n = edges.shape[0]
+        lo = edges.min(axis=1).astype(np.float64)
+        hi = edges.max(axis=1).astype(np.float64)
+        # margin for the rounding errors of the intercepts
+        if n > 0:
+            pad = 1e-5 * np.abs(edges).max()
+            lo -= pad
+            hi += pad
+
+        best = None
+        for axis in (0, 1):
+            order = np.argsort(lo[:, axis], kind='mergesort')
+            start = lo[order, axis]
+            # edges overlapping each one along the axis, after it in order
+            count = (np.searchsorted(start, hi[order, axis], 'right') -
+                     np.arange(n) - 1)
+            if best is None or count.sum() < best[0].sum():
+                best = count, order, 1 - axis
+        count, order, axis = best
+
+        first = []
+        second = []
+        offset = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(count, out=offset[1:])
+        s0 = 0
+        while s0 < n:
+            s1 = np.searchsorted(offset, offset[s0] + self._pair_chunk,
+                                 'right') - 1
+            s1 = max(s1, s0 + 1)
+            c = count[s0:s1]
+            a = np.repeat(np.arange(s0, s1), c)
+            b = a + 1 + np.arange(len(a)) - np.repeat(offset[s0:s1] -
+                                                      offset[s0], c)
+            a = order[a]
+            b = order[b]
+            # overlap along the other axis
+            mask = ((lo[a, axis] <= hi[b, axis]) &
+                    (lo[b, axis] <= hi[a, axis]))
+            first.append(np.minimum(a[mask], b[mask]))
+            second.append(np.maximum(a[mask], b[mask]))
+            s0 = s1
+
+        if not first:
+            return np.zeros((2, 0), dtype=np.intp)
+        first = np.concatenate(first)
+        second = np.concatenate(second)
+        order = np.lexsort((second, first))
+        return first[order], second[order]
+
     def _split_intersecting_edges(self):
         # we can do all intersections at once, but this has excessive memory
         # overhead.
@@ -610,34 +789,23 @@ class Triangulation(object):
             self.edges = np.append(self.edges, add_edges, axis=0)
 
     def _merge_duplicate_points(self):
-        # generate a list of all pairs (i,j) of identical points
-        dups = []
-        for i in range(self.pts.shape[0]-1):
-            test_pt = self.pts[i:i+1]
-            comp_pts = self.pts[i+1:]
-            eq = test_pt == comp_pts
-            eq = eq[:, 0] & eq[:, 1]
-            for j in np.argwhere(eq)[:, 0]:
-                dups.append((i, i+1+j))
-
-        dups_arr = np.array(dups)
-        # remove duplicate points
-        pt_mask = np.ones(self.pts.shape[0], dtype=bool)
-        for i, inds in enumerate(dups_arr):
-            # remove j from points
-            # (note we pull the index from the original dups instead of
-            # dups_arr because the indexes in pt_mask do not change)
-            pt_mask[dups[i][1]] = False
-
-            i, j = inds
-
-            # rewrite edges to use i instead of j
-            self.edges[self.edges == j] = i
-
-            # decrement all point indexes > j
-            self.edges[self.edges > j] -= 1
-            dups_arr[dups_arr > j] -= 1
-
+        # sort points to bring identical points together; the sort is stable
+        # so the first of identical points has the lowest index
+        order = np.lexsort((self.pts[:, 1], self.pts[:, 0]))
+        spts = self.pts[order]
+        dup = np.zeros(len(order), dtype=bool)
+        dup[1:] = np.all(spts[1:] == spts[:-1], axis=1)
+
+        # replace each point by the first identical one
+        first = order[np.maximum.accumulate(np.where(dup, 0,
+                                                     np.arange(len(dup))))]
+        same = np.empty_like(order)
+        same[order] = first
+
+        # remove duplicate points, renumber edges
+        pt_mask = same == np.arange(len(same))
+        new_index = np.cumsum(pt_mask) - 1
+        self.edges = new_index[same[self.edges]]
         self.pts = self.pts[pt_mask]
 
         # remove zero-length edges
@@ -664,36 +832,41 @@ class Triangulation(object):
         ac = c - a
         return a + ((ab*ac).sum() / (ac*ac).sum()) * ac
 
-    def _cosine(self, A, B, C):
-        # Cosine of angle ABC
-        a = ((C - B)**2).sum()
-        b = ((C - A)**2).sum()
-        c = ((B - A)**2).sum()
-        d = (a + c - b) / ((4 * a * c)**0.5)
-        return d
+    def _angle(self, a, b, c):
+        # Angle ABC, NaN if degenerate
+        (ax, ay), (bx, by), (cx, cy) = (self._coords[a], self._coords[b],
+                                        self._coords[c])
+        a = (cx - bx)**2 + (cy - by)**2
+        b = (cx - ax)**2 + (cy - ay)**2
+        c = (bx - ax)**2 + (by - ay)**2
+        d = (4 * a * c)**0.5
+        if d == 0:
+            return np.nan
+        d = (a + c - b) / d
+        return math.acos(d) if -1 <= d <= 1 else np.nan
 
     def _iscounterclockwise(self, a, b, c):
         # Check if the points lie in counter-clockwise order or not
-        A = self.pts[a]
-        B = self.pts[b]
-        C = self.pts[c]
-        return np.cross(B-A, C-B) > 0
+        (ax, ay), (bx, by), (cx, cy) = (self._coords[a], self._coords[b],
+                                        self._coords[c])
+        return (bx - ax) * (cy - by) - (by - ay) * (cx - bx) > 0
 
     def _edges_intersect(self, edge1, edge2):
         """
         Return 1 if edges intersect completely (endpoints excluded)
         """
-        h12 = self._intersect_edge_arrays(self.pts[np.array(edge1)],
-                                          self.pts[np.array(edge2)])
-        h21 = self._intersect_edge_arrays(self.pts[np.array(edge2)],
-                                          self.pts[np.array(edge1)])
-        err = np.geterr()
-        np.seterr(divide='ignore', invalid='ignore')
-        try:
-            out = (0 < h12 < 1) and (0 < h21 < 1)
-        finally:
-            np.seterr(**err)
-        return out
+        return (0 < self._intercept(edge1, edge2) < 1 and
+                0 < self._intercept(edge2, edge1) < 1)
+
+    def _intercept(self, edge1, edge2):
+        # Scalar version of _intersect_edge_arrays, NaN for parallel edges
+        (ax, ay), (bx, by) = self._coords[edge1[0]], self._coords[edge1[1]]
+        (cx, cy), (dx, dy) = self._coords[edge2[0]], self._coords[edge2[1]]
+        px, py = -(by - ay), bx - ax  # vector perpendicular to edge1
+        f = (dx - cx) * px + (dy - cy) * py
+        if f == 0:
+            return np.nan
+        return ((ax - cx) * px + (ay - cy) * py) / f
 
     def _intersect_edge_arrays(self, lines1, lines2):
         """Return the intercepts of all lines defined in *lines1* as they
@@ -740,9 +913,10 @@ class Triangulation(object):
         """ Returns +1 if edge[0]->point is clockwise from edge[0]->edge[1],
         -1 if counterclockwise, and 0 if parallel.
         """
-        v1 = self.pts[point] - self.pts[edge[0]]
-        v2 = self.pts[edge[1]] - self.pts[edge[0]]
-        c = np.cross(v1, v2)  # positive if v1 is CW from v2
+        (px, py), (ax, ay), (bx, by) = (self._coords[point],
+                                        self._coords[edge[0]],
+                                        self._coords[edge[1]])
+        c = (px - ax) * (by - ay) - (py - ay) * (bx - ax)  # positive if CW
         return 1 if c > 0 else (-1 if c < 0 else 0)
 
     def _add_tri(self, a, b, c):
@@ -750,10 +924,10 @@ class Triangulation(object):
         assert a != b and b != c and c != a
 
         # ignore flat tris
-        pa = self.pts[a]
-        pb = self.pts[b]
-        pc = self.pts[c]
-        if np.all(pa == pb) or np.all(pb == pc) or np.all(pc == pa):
+        pa = self._coords[a]
+        pb = self._coords[b]
+        pc = self._coords[c]
+        if pa == pb or pb == pc or pc == pa:
             return
 
         # check this tri is unique
@@ -781,12 +955,16 @@ class Triangulation(object):
         tri = (a, b, c)
 
         self.tris[tri] = None
+        for i in tri:
+            self._vertex_tris.setdefault(i, {})[tri] = None
 
     def _remove_tri(self, a, b, c):
         for k in permutations((a, b, c)):
             if k in self.tris:
                 break
         del self.tris[k]
+        for i in k:
+            del self._vertex_tris[i][k]
         (a, b, c) = k
 
         if self._edges_lookup.get((a, b), -1) == c:
@@ -822,6 +1000,21 @@ def _triangulate_cpp(vertices_2d, segments):
     return vertices_2d, triangles
 
 
+def _triangulate_ring(vertices_2d):
+    """Triangulate a closed polygon with the available implementation"""
+    n = len(vertices_2d)
+    segments = np.repeat(np.arange(n + 1), 2)[1:-1]
+    segments[-2:] = n - 1, 0
+
+    try:
+        import triangle  # noqa: F401
+    except (ImportError, AssertionError):
+        return _triangulate_python(vertices_2d, segments)
+    else:
+        segments_2d = segments.reshape((-1, 2))
+        return _triangulate_cpp(vertices_2d, segments_2d)
+
+
 def triangulate(vertices):
     """Triangulate a set of vertices
 
@@ -837,22 +1030,133 @@ def triangulate(vertices):
     tringles : array-like
         The triangles.
     """
-    n = len(vertices)
     vertices = np.asarray(vertices)
     zmean = vertices[:, 2].mean()
-    vertices_2d = vertices[:, :2]
-    segments = np.repeat(np.arange(n + 1), 2)[1:-1]
-    segments[-2:] = n - 1, 0
-
-    try:
-        import triangle  # noqa: F401
-    except (ImportError, AssertionError):
-        vertices_2d, triangles = _triangulate_python(vertices_2d, segments)
-    else:
-        segments_2d = segments.reshape((-1, 2))
-        vertices_2d, triangles = _triangulate_cpp(vertices_2d, segments_2d)
+    vertices_2d, triangles = _triangulate_ring(vertices[:, :2])
 
     vertices = np.empty((len(vertices_2d), 3))
     vertices[:, :2] = vertices_2d
     vertices[:, 2] = zmean
     return vertices, triangles
+
+
+def _triangulate_batch(vertices, offsets):
+    """Triangulate consecutive polygons (run by the workers)
+
+    Returns the vertices and triangles of all polygons, the triangles
+    indexing the vertices of their own polygon, and the number of vertices
+    and triangles of each polygon.
+    """
+    out_vertices = []
+    out_triangles = []
+    counts = np.zeros((len(offsets) - 1, 2), dtype=np.int64)
+    for i in range(len(offsets) - 1):
+        poly = vertices[offsets[i]:offsets[i + 1]]
+        if len(poly) < 3:
+            vertices_2d = poly[:, :2]
+            triangles = np.zeros((0, 3), dtype=np.uint32)
+        else:
+            vertices_2d, triangles = _triangulate_ring(poly[:, :2])
+        poly_vertices = np.empty((len(vertices_2d), vertices.shape[1]),
+                                 dtype=np.float32)
+        poly_vertices[:, :2] = vertices_2d
+        if vertices.shape[1] == 3:
+            poly_vertices[:, 2] = poly[:, 2].mean() if len(poly) else 0
+        out_vertices.append(poly_vertices)
+        out_triangles.append(np.asarray(triangles, dtype=np.uint32)
+                             .reshape(-1, 3))
+        counts[i] = len(poly_vertices), len(out_triangles[-1])
+    if not out_vertices:
+        return (np.zeros((0, vertices.shape[1]), dtype=np.float32),
+                np.zeros((0, 3), dtype=np.uint32), counts)
+    return (np.concatenate(out_vertices), np.concatenate(out_triangles),
+            counts)
+
+
+def triangulate_polygons(vertices, offsets, n_workers=None,
+                         executor='process', batches_per_worker=4):
+    """Triangulate many polygons at once, in parallel
+
+    Parameters
+    ----------
+    vertices : array-like
+        The (N, 2) or (N, 3) vertices of all polygons, one after the other.
+        Each polygon is closed (its last vertex is connected to the first
+        one). With 3 columns, the z coordinate of the vertices of each
+        polygon is set to its mean, as in `triangulate`.
+    offsets : array-like
+        The P + 1 indices of the first vertex of each polygon in
+        `vertices`, followed by N, so that polygon ``i`` is
+        ``vertices[offsets[i]:offsets[i + 1]]``.
+    n_workers : int | None
+        The number of workers. Defaults to the number of CPUs.
+    executor : str | Executor | None
+        'process' (default) or 'thread', an existing
+        ``concurrent.futures.Executor`` (which is not shut down), or None to
+        triangulate the polygons in the calling thread. Processes are
+        needed to run the pure Python triangulation in parallel.
+    batches_per_worker : int
+        The polygons are split into batches of about the same number of
+        vertices, sent to the workers as single tasks.
+
+    Returns
+    -------
+    vertices : array
+        The (M, 2) or (M, 3) float32 vertices of all polygons, which may
+        include vertices added at self-intersections.
+    triangles : array
+        The (T, 3) uint32 triangles, indexing the returned vertices.
+    vertex_offsets : array
+        The P + 1 offsets of the vertices of each polygon.
+    triangle_offsets : array
+        The P + 1 offsets of the triangles of each polygon.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    if vertices.ndim != 2 or vertices.shape[1] not in (2, 3):
+        raise ValueError('vertices must be an array of shape (N, 2) or '
+                         '(N, 3), got %s' % (vertices.shape,))
+    if (offsets.ndim != 1 or len(offsets) == 0 or offsets[0] != 0 or
+            offsets[-1] != len(vertices) or np.any(np.diff(offsets) < 0)):
+        raise ValueError('offsets must be increasing from 0 to the number '
+                         'of vertices')
+    n_polygons = len(offsets) - 1
+    n_workers = n_workers or os.cpu_count() or 1
+
+    # split the polygons into batches of about the same number of vertices
+    n_batches = max(min(n_workers * batches_per_worker, n_polygons), 1)
+    bounds = np.searchsorted(offsets, np.linspace(0, len(vertices),
+                                                  n_batches + 1)[1:-1])
+    bounds = np.unique(np.r_[0, bounds, n_polygons])
+    batches = [(vertices[offsets[a]:offsets[b]], offsets[a:b + 1] - offsets[a])
+               for a, b in zip(bounds[:-1], bounds[1:])]
+    batches = batches or [(vertices, offsets)]
+
+    own_executor = not isinstance(executor, Executor)
+    if own_executor and executor not in ('process', 'thread', None):
+        raise ValueError('executor must be "process", "thread", None or an '
+                         'Executor, got %r' % (executor,))
+    if executor is None or (own_executor and n_workers == 1):
+        results = [_triangulate_batch(*batch) for batch in batches]
+    else:
+        if executor == 'thread':
+            executor = ThreadPoolExecutor(n_workers)
+        elif executor == 'process':
+            executor = ProcessPoolExecutor(n_workers)
+        try:
+            results = list(executor.map(_triangulate_batch, *zip(*batches)))
+        finally:
+            if own_executor:
+                executor.shutdown()
+
+    # concatenate the batches, triangles index the vertices of all polygons
+    counts = np.concatenate([r[2] for r in results])
+    vertex_offsets = np.zeros(n_polygons + 1, dtype=np.int64)
+    triangle_offsets = np.zeros(n_polygons + 1, dtype=np.int64)
+    np.cumsum(counts[:, 0], out=vertex_offsets[1:])
+    np.cumsum(counts[:, 1], out=triangle_offsets[1:])
+    out_vertices = np.concatenate([r[0] for r in results])
+    triangles = np.concatenate([r[1] for r in results])
+    triangles += np.repeat(vertex_offsets[:-1],
+                           counts[:, 1]).astype(np.uint32)[:, np.newaxis]
+    return out_vertices, triangles, vertex_offsets, triangle_offsets
@@ -577,6 +577,67 @@ class TextureAtlasTest(unittest.TestCase):
         
         reg = T.get_free_region(129, 129)
         assert reg is None
+
+    def test_atlas_growth(self):
+        T = TextureAtlas((32, 32), np.uint8, 'luminance', max_size=64)
+        assert T.shape == (32, 32, 1)
+        regions = []
+        for i in range(16):
+            x, y, w, h = T.get_free_region(16, 16)
+            T[y:y + h, x:x + w] = np.full((h, w, 1), i + 1, np.uint8)
+            regions.append((x, y, w, h))
+        assert T.shape == (64, 64, 1)
+        assert T.get_free_region(16, 16) is None
+        # regions do not overlap and their data is kept
+        for i, (x, y, w, h) in enumerate(regions):
+            assert np.all(T._copy[y:y + h, x:x + w] == i + 1)
+        assert len(set(regions)) == 16
+
+        # without max_size, the atlas does not grow
+        T = TextureAtlas((32, 32), np.uint8, 'luminance')
+        assert T.get_free_region(32, 32) is not None
+        assert T.get_free_region(1, 1) is None
+
+    def test_atlas_packing(self):
+        T = TextureAtlas((32, 32), np.uint8, 'luminance')
+        # skyline bottom-left: lowest top, then leftmost
+        assert T.get_free_region(16, 8) == (0, 0, 16, 8)
+        assert T.get_free_region(8, 16) == (16, 0, 8, 16)
+        assert T.get_free_region(16, 4) == (0, 8, 16, 4)
+        assert T.get_free_region(8, 8) == (24, 0, 8, 8)
+        assert T.get_free_region(9, 1) == (0, 12, 9, 1)
+
+    def test_release_region(self):
+        T = TextureAtlas((32, 32), np.uint8, 'luminance')
+        regions = [T.get_free_region(16, 16) for _ in range(4)]
+        assert T.get_free_region(1, 1) is None
+        # released regions are reused, and split
+        T.release_region(regions[1])
+        assert T.get_free_region(8, 8) == (16, 0, 8, 8)
+        assert T.get_free_region(16, 8) == (16, 8, 16, 8)
+        assert T.get_free_region(8, 8) == (24, 0, 8, 8)
+        assert T.get_free_region(1, 1) is None
+        T.release_region(regions[3])
+        assert T.get_free_region(17, 1) is None
+        assert T.get_free_region(16, 16) == regions[3]
+
+        # allocated regions never overlap
+        rng = np.random.RandomState(0)
+        T = TextureAtlas((64, 64), np.uint8, 'luminance')
+        used = np.zeros((64, 64), int)
+        regions = []
+        for _ in range(500):
+            if regions and rng.rand() < 0.4:
+                x, y, w, h = regions.pop(rng.randint(len(regions)))
+                T.release_region((x, y, w, h))
+                used[y:y + h, x:x + w] -= 1
+            else:
+                region = T.get_free_region(*rng.randint(1, 12, 2))
+                if region is not None:
+                    x, y, w, h = region
+                    used[y:y + h, x:x + w] += 1
+                    regions.append(region)
+            assert used.max() <= 1
     
     
 # --------------------------------------------------------- Texture formats ---
@@ -886,11 +886,17 @@ class TextureEmulated3D(Texture2D):
 class TextureAtlas(Texture2D):
     """Group multiple small data regions into a larger texture.
 
-    The algorithm is based on the article by Jukka Jylänki : "A Thousand Ways
+    The algorithm is based on the article by Jukka Jylänki : "A Thousand Ways
     to Pack the Bin - A Practical Approach to Two-Dimensional Rectangle Bin
     Packing", February 27, 2010. More precisely, this is an implementation of
     the Skyline Bottom-Left algorithm based on C++ sources provided by Jukka
-    Jylänki at: http://clb.demon.fi/files/RectangleBinPack/.
+    Jylänki at: http://clb.demon.fi/files/RectangleBinPack/.
+
+    While the skyline has a few nodes, it is stored in a list and scanned
+    with a plain loop. Beyond that, it is stored in an array, and the height
+    of the skyline under a region is computed for all the candidate
+    positions at once with a sparse table of range maxima. Released regions
+    are kept in free lists bucketed by height and reused first.
 
     Parameters
     ----------
@@ -898,6 +904,15 @@ class TextureAtlas(Texture2D):
         Texture shape (optional).
     dtype : numpy.dtype object
         Texture starting data type (default: float32)
+    format : str
+        The format of the texture, 'rgb' (default) or a single-channel
+        format such as 'luminance'.
+    max_size : int | None
+        If not None, the atlas grows when it is full, doubling its smaller
+        dimension up to `max_size`. A copy of the data is kept on the CPU
+        to upload it again, so the atlas must only be written with
+        `set_data` (or item assignment). Regions keep their position in
+        texels, not in normalized texture coordinates.
 
     Notes
     -----
@@ -905,19 +920,60 @@ class TextureAtlas(Texture2D):
     An example of simple access:
 
         >>> atlas = TextureAtlas()
-        >>> bounds = atlas.get_free_region(20, 30)
-        >>> atlas.set_region(bounds, np.random.rand(20, 30).T)
+        >>> x, y, w, h = atlas.get_free_region(20, 30)
+        >>> atlas[y:y + h, x:x + w] = np.random.rand(30, 20, 3)
 
     """
-    def __init__(self, shape=(1024, 1024), dtype=np.float32):
+    def __init__(self, shape=(1024, 1024), dtype=np.float32, format='rgb',
+                 max_size=None):
         shape = np.array(shape, int)
         assert shape.ndim == 1 and shape.size == 2
-        shape = tuple(2 ** (np.log2(shape) + 0.5).astype(int)) + (3,)
-        self._atlas_nodes = [(0, 0, shape[1])]
+        shape = (tuple(2 ** (np.log2(shape) + 0.5).astype(int)) +
+                 (self._inv_formats[format],))
+        # skyline nodes (x, y, width), sorted by x and covering the width,
+        # in a list below _SMALL_SKYLINE nodes and in an array above
+        self._atlas_nodes = [[0, 0, shape[1]]]
+        # released regions, by bit length of their height
+        self._free_regions = {}
         data = np.zeros(shape, dtype)
-        super(TextureAtlas, self).__init__(data, interpolation='linear',
+        self._max_size = max_size
+        self._copy = data if max_size is not None else None
+        super(TextureAtlas, self).__init__(data, format=format,
+                                           interpolation='linear',
                                            wrapping='clamp_to_edge')
 
+    def _set_data(self, data, offset=None, copy=False):
+        if self._copy is not None:
+            data = self._normalize_shape(np.asarray(data))
+            if offset is None:
+                self._copy = data.astype(self._copy.dtype)
+            else:
+                index = tuple(slice(o, o + n)
+                              for o, n in zip(offset, data.shape[:-1]))
+                self._copy[index] = data
+        return super(TextureAtlas, self)._set_data(data, offset, copy)
+
+    def _grow(self):
+        """Double the smaller dimension of the atlas, False if it cannot"""
+        if self._copy is None:
+            return False
+        height, width = self._shape[:2]
+        axis = 0 if height <= width else 1
+        if self._shape[axis] * 2 > self._max_size:
+            return False
+        shape = list(self._shape)
+        shape[axis] *= 2
+        data = np.zeros(shape, self._copy.dtype)
+        data[:height, :width] = self._copy
+        if axis == 1:
+            if isinstance(self._atlas_nodes, list):
+                self._atlas_nodes.append([width, 0, width])
+            else:
+                self._atlas_nodes = np.concatenate((self._atlas_nodes,
+                                                    [[width, 0, width]]))
+        self.set_data(data)
+        return True
+
     def get_free_region(self, width, height):
         """Get a free region of given size and allocate it
 
@@ -934,66 +990,179 @@ class TextureAtlas(Texture2D):
             A newly allocated region as (x, y, w, h) or None
             (if failed).
         """
-        best_height = best_width = np.inf
-        best_index = -1
-        for i in range(len(self._atlas_nodes)):
-            y = self._fit(i, width, height)
-            if y >= 0:
-                node = self._atlas_nodes[i]
-                if (y+height < best_height or
-                        (y+height == best_height and node[2] < best_width)):
-                    best_height = y+height
-                    best_index = i
-                    best_width = node[2]
-                    region = node[0], y, width, height
-        if best_index == -1:
+        if self._free_regions:
+            region = self._reuse_region(width, height)
+            if region is not None:
+                return region
+        while True:
+            found = self._find_region(width, height)
+            if found is not None or not self._grow():
+                break
+        if found is None:
             return None
+        best_index, region = found
+        self._add_node(best_index, region)
+        return region
 
-        node = region[0], region[1] + height, width
-        self._atlas_nodes.insert(best_index, node)
-        i = best_index+1
-        while i < len(self._atlas_nodes):
-            node = self._atlas_nodes[i]
-            prev_node = self._atlas_nodes[i-1]
-            if node[0] < prev_node[0]+prev_node[2]:
-                shrink = prev_node[0]+prev_node[2] - node[0]
-                x, y, w = self._atlas_nodes[i]
-                self._atlas_nodes[i] = x+shrink, y, w-shrink
-                if self._atlas_nodes[i][2] <= 0:
-                    del self._atlas_nodes[i]
-                    i -= 1
-                else:
-                    break
-            else:
+    def _find_region(self, width, height):
+        """Find the best node for a region, None if it does not fit"""
+        if isinstance(self._atlas_nodes, list):
+            return self._find_region_small(width, height)
+        x, y, w = self._atlas_nodes.T
+        # the region at node i spans the nodes i to stop - 1
+        start = np.arange(len(x))
+        stop = np.maximum(np.searchsorted(x, x + width), start + 1)
+        top = _range_max(y, start, stop) + height
+        fit = (x + width <= self._shape[1]) & (top <= self._shape[0])
+        if not fit.any():
+            return None
+        # lowest top, then narrowest node, then first node
+        fit &= top == top[fit].min()
+        fit &= w == w[fit].min()
+        best_index = int(np.flatnonzero(fit)[0])
+        region = (int(x[best_index]), int(top[best_index] - height),
+                  width, height)
+        return best_index, region
+
+    def _find_region_small(self, width, height):
+        """Same as `_find_region`, with a loop (faster for a few nodes)"""
+        nodes = self._atlas_nodes
+        n = len(nodes)
+        max_height, max_width = self._shape[:2]
+        best_index = -1
+        best_top = max_height + 1
+        best_width = 0
+        for i in range(n):
+            x, top, w = nodes[i]
+            right = x + width
+            if right > max_width:
                 break
-            i += 1
-
-        # Merge nodes
-        i = 0
-        while i < len(self._atlas_nodes)-1:
-            node = self._atlas_nodes[i]
-            next_node = self._atlas_nodes[i+1]
-            if node[1] == next_node[1]:
-                self._atlas_nodes[i] = node[0], node[1], node[2]+next_node[2]
-                del self._atlas_nodes[i+1]
-            else:
-                i += 1
-
-        return region
+            j = i + 1
+            while j < n and nodes[j][0] < right:
+                if nodes[j][1] > top:
+                    top = nodes[j][1]
+                j += 1
+            top += height
+            if top < best_top or (top == best_top and w < best_width):
+                best_index, best_top, best_width = i, top, w
+        if best_index < 0:
+            return None
+        return best_index, (nodes[best_index][0], best_top - height,
+                            width, height)
+
+    def _add_node(self, index, region):
+        """Add the skyline node on top of a region found at a node"""
+        if isinstance(self._atlas_nodes, list):
+            return self._add_node_small(index, region)
+        # the new node covers the nodes under the region, and shrinks the
+        # last one if it goes further
+        nodes = self._atlas_nodes
+        x, y, width, height = region
+        right = x + width
+        after = nodes[index:]
+        after = after[after[:, 0] + after[:, 2] > right]
+        if len(after) and after[0, 0] < right:
+            after = after.copy()
+            after[0] = right, after[0, 1], after[0, 0] + after[0, 2] - right
+        self._set_nodes(np.concatenate((
+            nodes[:index], [[x, y + height, width]], after)))
+
+    def _add_node_small(self, index, region):
+        """Same as `_add_node`, editing the list in place (faster for a few
+        nodes)"""
+        nodes = self._atlas_nodes
+        x, y, width, height = region
+        top = y + height
+        right = x + width
+        stop = index
+        while stop < len(nodes) and nodes[stop][0] + nodes[stop][2] <= right:
+            stop += 1
+        if stop < len(nodes) and nodes[stop][0] < right:
+            node = nodes[stop]
+            nodes[stop] = [right, node[1], node[0] + node[2] - right]
+        nodes[index:stop] = [[x, top, width]]
+        # only the neighbors of the new node can have the same height
+        if index + 1 < len(nodes) and nodes[index + 1][1] == top:
+            nodes[index:index + 2] = [[x, top, width + nodes[index + 1][2]]]
+        if index > 0 and nodes[index - 1][1] == top:
+            node = nodes[index - 1]
+            nodes[index - 1:index + 1] = [[node[0], top,
+                                           node[2] + nodes[index][2]]]
+        if len(nodes) >= _SMALL_SKYLINE:
+            self._atlas_nodes = np.array(nodes, np.int64)
+
+    def release_region(self, region):
+        """Release a region, so that it can be allocated again
+
+        The data of the region is not cleared.
 
-    def _fit(self, index, width, height):
-        """Test if region (width, height) fit into self._atlas_nodes[index]"""
-        node = self._atlas_nodes[index]
-        x, y = node[0], node[1]
-        width_left = width
-        if x+width > self._shape[1]:
-            return -1
-        i = index
-        while width_left > 0:
-            node = self._atlas_nodes[i]
-            y = max(y, node[1])
-            if y+height > self._shape[0]:
-                return -1
-            width_left -= node[2]
-            i += 1
-        return y
+        Parameters
+        ----------
+        region : tuple
+            A region (x, y, w, h) returned by `get_free_region`.
+        """
+        x, y, w, h = (int(v) for v in region)
+        if w > 0 and h > 0:
+            bucket = self._free_regions.setdefault(h.bit_length(), [])
+            bucket.append((x, y, w, h))
+
+    def _set_nodes(self, nodes):
+        """Set the skyline nodes, merging the neighbors of equal heights"""
+        keep = np.ones(len(nodes), bool)
+        keep[1:] = nodes[1:, 1] != nodes[:-1, 1]
+        widths = np.add.reduceat(nodes[:, 2], np.flatnonzero(keep))
+        nodes = nodes[keep]
+        nodes[:, 2] = widths
+        if len(nodes) < _SMALL_SKYLINE:
+            nodes = nodes.tolist()
+        self._atlas_nodes = nodes
+
+    def _reuse_region(self, width, height):
+        """Allocate a region in the smallest released region it fits in,
+        None if there is none"""
+        for key in sorted(self._free_regions):
+            if key < int(height).bit_length():
+                continue
+            bucket = self._free_regions[key]
+            fits = [r for r in bucket if r[2] >= width and r[3] >= height]
+            if not fits:
+                continue
+            x, y, w, h = best = min(fits, key=lambda r: r[2] * r[3])
+            bucket.remove(best)
+            if not bucket:
+                del self._free_regions[key]
+            # split the rest along the longest leftover side
+            if w - width > h - height:
+                rest = (x + width, y, w - width, h), (x, y + height, width,
+                                                      h - height)
+            else:
+                rest = (x + width, y, w - width, height), (x, y + height, w,
+                                                           h - height)
+            for r in rest:
+                self.release_region(r)
+            return x, y, width, height
+        return None
+
+
+# below this number of skyline nodes, the skyline is a list and the regions
+# are found with a plain loop, as the overhead of numpy dominates
+_SMALL_SKYLINE = 32
+
+
+def _range_max(values, start, stop):
+    """Maximum of values[start:stop] for arrays of bounds (stop > start)"""
+    # table[k, i] is the maximum of values[i:i + 2 ** k], up to the longest
+    # range (the regions usually span a few nodes)
+    length = stop - start
+    table = [values]
+    step = 1
+    while 2 * step <= length.max():
+        level = table[-1].copy()
+        level[:-step] = np.maximum(level[:-step], level[step:])
+        table.append(level)
+        step *= 2
+    if len(table) == 1:
+        return values[start]
+    table = np.array(table)
+    k = np.log2(length).astype(int)
+    return np.maximum(table[k, start], table[k, stop - 2 ** k])
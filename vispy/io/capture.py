@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+
+"""
+Background encoding of captured frames.
+
+Frames (e.g. returned by ``SceneCanvas.render``) are queued and encoded on a
+pool of threads or processes, so that the rendering loop is only blocked
+when too many frames are pending.
+"""
+
+import os
+import threading
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, \
+    ThreadPoolExecutor
+
+import numpy as np
+
+from .image import _make_png
+
+_frame_formats = ('png', 'npy', 'raw')
+
+
+def _write_frame(fname, frame, format, options):
+    """Encode and write a frame to a file (run by the workers)"""
+    with open(fname, 'wb') as f:
+        if format == 'png':
+            f.write(_make_png(frame, **options))
+        elif format == 'npy':
+            np.save(f, frame)
+        else:
+            f.write(frame.tobytes())
+    return fname
+
+
+class FrameWriter(object):
+    """Encode frames and write them to files on a pool of workers
+
+    Parameters
+    ----------
+    pattern : str
+        Filename pattern with a ``%d`` field replaced by the index of each
+        frame, e.g. ``'frame_%05d.png'``. Since each frame has its own file,
+        the order of the frames is preserved whatever the order in which
+        they are encoded.
+    format : str | None
+        'png', 'npy' (NumPy array files) or 'raw' (pixel data only). If
+        None, it is inferred from the extension of the pattern.
+    n_workers : int | None
+        The number of workers. Defaults to the number of CPUs.
+    max_pending : int | None
+        The maximum number of frames queued or being encoded. When it is
+        reached, `write` blocks until a frame is written, which bounds the
+        memory used when frames are produced faster than they are encoded.
+        Defaults to twice the number of workers.
+    executor : str | Executor
+        'thread' (default) or 'process', or an existing
+        ``concurrent.futures.Executor``, which is not shut down by `close`.
+        Threads are enough for PNG files since zlib releases the GIL,
+        processes may help with adaptive PNG filtering.
+    start : int
+        The index of the first frame.
+    **options
+        Options of the PNG encoder: ``level``, ``filter_type`` and
+        ``strategy`` (see `write_png`).
+
+    Attributes
+    ----------
+    filenames : list
+        The files written so far, in order.
+
+    Examples
+    --------
+    Save an animation without blocking the rendering on PNG encoding::
+
+        with FrameWriter('frame_%05d.png', strategy='rle') as writer:
+            for t in range(100):
+                update(t)
+                writer.write(canvas.render())
+    """
+
+    def __init__(self, pattern, format=None, n_workers=None, max_pending=None,
+                 executor='thread', start=0, **options):
+        if format is None:
+            format = os.path.splitext(pattern)[1][1:].lower()
+        if format not in _frame_formats:
+            raise ValueError('format must be one of %s, got %r'
+                             % (', '.join(_frame_formats), format))
+        if options and format != 'png':
+            raise TypeError('options are only supported for PNG files')
+        try:
+            pattern % 0
+        except TypeError:
+            raise ValueError('pattern must have one %%d field, got %r'
+                             % (pattern,))
+        self._pattern = pattern
+        self._format = format
+        self._options = options
+        n_workers = n_workers or os.cpu_count() or 1
+
+        self._own_executor = not isinstance(executor, Executor)
+        if executor == 'thread':
+            executor = ThreadPoolExecutor(n_workers)
+        elif executor == 'process':
+            executor = ProcessPoolExecutor(n_workers)
+        elif self._own_executor:
+            raise ValueError('executor must be "thread", "process" or an '
+                             'Executor, got %r' % (executor,))
+        self._executor = executor
+        self._slots = threading.Semaphore(max_pending or 2 * n_workers)
+        self._futures = deque()
+        self._index = start
+        self._closed = False
+        self.filenames = []
+
+    @property
+    def pending(self):
+        """The number of frames that are not written yet"""
+        return sum(not f.done() for f in self._futures)
+
+    def write(self, frame, copy=True):
+        """Queue a frame to be encoded and written
+
+        Blocks while `max_pending` frames are pending. Errors raised by the
+        workers are raised by the following call to `write`, `flush` or
+        `close`.
+
+        Parameters
+        ----------
+        frame : array
+            The (H, W, 3 | 4) ubyte image (any array for 'npy' and 'raw'
+            files).
+        copy : bool
+            If False, the frame is not copied and must not be modified
+            until it is written.
+
+        Returns
+        -------
+        filename : str
+            The file the frame is written to.
+        """
+        if self._closed:
+            raise RuntimeError('cannot write to a closed FrameWriter')
+        if copy:
+            frame = np.array(frame, order='C')
+        else:
+            frame = np.ascontiguousarray(frame)
+        if self._format == 'png' and (frame.dtype != np.ubyte or
+                                      frame.ndim != 3 or
+                                      frame.shape[2] not in (3, 4)):
+            raise ValueError('PNG frames must be (H, W, 3 | 4) ubyte arrays, '
+                             'got %s %s' % (frame.dtype, frame.shape))
+        self._collect()
+        fname = self._pattern % self._index
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(_write_frame, fname, frame,
+                                           self._format, self._options)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._slots.release())
+        self._futures.append(future)
+        self._index += 1
+        return fname
+
+    def _collect(self, wait=False):
+        """Check the frames written so far, in order"""
+        while self._futures and (wait or self._futures[0].done()):
+            self.filenames.append(self._futures.popleft().result())
+
+    def flush(self):
+        """Wait until all the pending frames are written"""
+        self._collect(wait=True)
+
+    def close(self):
+        """Write the pending frames and release the workers"""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self.flush()
+        finally:
+            if self._own_executor:
+                self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
@@ -13,8 +13,256 @@ import numpy as np
 
 from ..ext.png import Reader
 
+_png_signature = b'\x89PNG\x0d\x0a\x1a\x0a'
 
-def _make_png(data, level=6):
+_png_filters = {'none': 0, 'sub': 1, 'up': 2, 'average': 3, 'paeth': 4}
+
+_zlib_strategies = {'default': zlib.Z_DEFAULT_STRATEGY,
+                    'filtered': zlib.Z_FILTERED,
+                    'huffman': zlib.Z_HUFFMAN_ONLY,
+                    'rle': zlib.Z_RLE,
+                    'fixed': zlib.Z_FIXED}
+
+# Number of channels of the PNG color types with 8 bits per sample
+_png_channels = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+# Number of rows decoded at once when undoing the Average and Paeth filters
+_wavefront_rows = 256
+
+
+def _png_chunk(name, data):
+    """Make a PNG chunk (length, name, data and CRC) from bytes"""
+    name = name.encode('ASCII')
+    crc = zlib.crc32(data, zlib.crc32(name)) & 0xffffffff
+    return b''.join([struct.pack('!I', len(data)), name, bytes(data),
+                     struct.pack('!I', crc)])
+
+
+def _paeth(a, b, c):
+    """Paeth predictor of the left (a), up (b) and upper left (c) bytes"""
+    pa = np.abs(b - c)
+    pb = np.abs(a - c)
+    pc = np.abs(a + b - 2 * c)
+    use_a = (pa <= pb) & (pa <= pc)
+    use_b = (pb <= pc) & ~use_a
+    return c + (a - c) * use_a + (b - c) * use_b
+
+
+def _filter_rows(lines, bpp, filter_type=0):
+    """Filter PNG scanlines
+
+    Parameters
+    ----------
+    lines : array
+        The (H, stride) ubyte scanlines.
+    bpp : int
+        The number of bytes per pixel.
+    filter_type : int | str
+        The filter type (0 to 4) or 'adaptive' to select the filter of each
+        row minimizing the sum of the absolute (signed) residuals, which is
+        the heuristic recommended by the PNG specification.
+
+    Returns
+    -------
+    filtered : array
+        The (H, stride + 1) ubyte scanlines, each starting with its filter
+        type.
+    """
+    h, stride = lines.shape
+    out = np.empty((h, stride + 1), dtype=np.ubyte)
+    if filter_type == 'adaptive':
+        types = range(5)
+    else:
+        types = [_png_filters.get(filter_type, filter_type)]
+        if types[0] not in range(5):
+            raise ValueError('filter_type must be in 0-4 or "adaptive", '
+                             'got %r' % (filter_type,))
+    out[:, 0] = types[0]
+    if types == [0]:
+        out[:, 1:] = lines
+        return out
+
+    x = lines.astype(np.int16)
+    a = np.zeros_like(x)
+    a[:, bpp:] = x[:, :-bpp]
+    b = np.zeros_like(x)
+    b[1:] = x[:-1]
+    c = np.zeros_like(x)
+    c[1:, bpp:] = x[:-1, :-bpp]
+    best = None
+    for t in types:
+        if t == 0:
+            pred = 0
+        elif t == 1:
+            pred = a
+        elif t == 2:
+            pred = b
+        elif t == 3:
+            pred = (a + b) >> 1
+        else:
+            pred = _paeth(a, b, c)
+        res = (x - pred).astype(np.ubyte)
+        if len(types) == 1:
+            out[:, 1:] = res
+            break
+        # Distance to zero of the residuals as signed bytes
+        cost = np.minimum(res, np.negative(res)).sum(axis=1, dtype=np.uint64)
+        better = slice(None) if best is None else cost < best
+        best = cost if best is None else np.minimum(best, cost)
+        out[better, 0] = t
+        out[better, 1:] = res[better]
+    return out
+
+
+def _unfilter_runs(out, types, bpp, start, stop):
+    """Undo the None, Sub and Up filters of rows start to stop (in place)"""
+    if stop <= start:
+        return
+    bounds = np.flatnonzero(np.diff(types[start:stop])) + start + 1
+    bounds = [start] + bounds.tolist() + [stop]
+    for r0, r1 in zip(bounds[:-1], bounds[1:]):
+        if types[r0] == 1:
+            rows = out[r0:r1].reshape(r1 - r0, -1, bpp)
+            np.cumsum(rows, axis=1, dtype=np.ubyte, out=rows)
+        elif types[r0] == 2:
+            rows = out[max(r0 - 1, 0):r1]
+            np.cumsum(rows, axis=0, dtype=np.ubyte, out=rows)
+
+
+def _unfilter_wavefront(out, types, bpp, start, stop):
+    """Undo any filter of rows start to stop (in place)
+
+    The Average and Paeth filters of a pixel depend on the decoded pixels on
+    its left, above and above left, so all the pixels of an anti-diagonal
+    are independent. Bands of rows are skewed so that anti-diagonals become
+    contiguous and decoded at once.
+    """
+    w = out.shape[1] // bpp
+    for b0 in range(start, stop, _wavefront_rows):
+        n = min(b0 + _wavefront_rows, stop) - b0
+        t = np.zeros((n + 1, 1), dtype=np.ubyte)
+        t[1:, 0] = types[b0:b0 + n]
+        used = [k for k in range(1, 5) if (t == k).any()]
+        if not used:
+            continue
+        # Padded band with the previous row on top and a zero column on
+        # the left, skewed so that pixel (r, q) is at D[r + q, r]
+        r = np.arange(n + 1)[:, np.newaxis]
+        skew = (r + np.arange(w + 1), r)
+        band = np.zeros((n + 1, w + 1, bpp), dtype=np.int16)
+        if b0 > 0:
+            band[0, 1:] = out[b0 - 1].reshape(w, bpp)
+        band[1:, 1:] = out[b0:b0 + n].reshape(n, w, bpp)
+        D = np.zeros((n + w + 1, n + 1, bpp), dtype=np.int16)
+        D[skew] = band
+
+        # Integer masks of the rows using each filter
+        masks = dict((k, np.repeat(t == k, bpp, axis=1).astype(np.int16))
+                     for k in used)
+        for s in range(2, n + w + 1):
+            lo, hi = max(s - w, 1), min(s, n + 1)
+            a = D[s - 1, lo:hi]
+            b = D[s - 1, lo - 1:hi - 1]
+            x = D[s, lo:hi]
+            for k in used:
+                if k == 1:
+                    pred = a
+                elif k == 2:
+                    pred = b
+                elif k == 3:
+                    pred = (a + b) >> 1
+                else:
+                    pred = _paeth(a, b, D[s - 2, lo - 1:hi - 1])
+                x += pred * masks[k][lo:hi]
+            x &= 255
+        out[b0:b0 + n] = D[skew][1:, 1:].reshape(n, -1)
+
+
+def _unfilter_rows(raw, bpp):
+    """Undo the filters of (H, stride + 1) PNG scanlines
+
+    Rows using the None, Sub and Up filters are decoded with cumulative sums.
+    The Average and Paeth filters require a sequential scan, which is done
+    by anti-diagonals from the first to the last row using them.
+    """
+    types = raw[:, 0]
+    if (types > 4).any():
+        raise ValueError('invalid PNG filter type')
+    out = raw[:, 1:].copy()
+    seq = np.flatnonzero(types >= 3)
+    if len(seq) == 0:
+        _unfilter_runs(out, types, bpp, 0, len(out))
+    else:
+        _unfilter_runs(out, types, bpp, 0, seq[0])
+        _unfilter_wavefront(out, types, bpp, seq[0], seq[-1] + 1)
+        _unfilter_runs(out, types, bpp, seq[-1] + 1, len(out))
+    return out
+
+
+def _decode_png(data):
+    """Decode PNG bytes to RGB8 or RGBA8 with NumPy
+
+    Returns None for the images this decoder does not support (bit depths
+    other than 8, interlacing, transparency keys, invalid files), which are
+    left to the bundled pure-Python decoder.
+    """
+    if data[:8] != _png_signature:
+        return None
+    pos = 8
+    ihdr = palette = trns = None
+    idat = []
+    while pos + 12 <= len(data):
+        size, name = struct.unpack('!I4s', data[pos:pos + 8])
+        chunk = data[pos + 8:pos + 8 + size]
+        crc = data[pos + 8 + size:pos + 12 + size]
+        if (len(crc) != 4 or struct.unpack('!I', crc)[0] !=
+                zlib.crc32(chunk, zlib.crc32(name)) & 0xffffffff):
+            return None
+        pos += size + 12
+        if name == b'IHDR':
+            ihdr = struct.unpack('!IIBBBBB', chunk)
+        elif name == b'PLTE':
+            palette = chunk
+        elif name == b'tRNS':
+            trns = chunk
+        elif name == b'IDAT':
+            idat.append(chunk)
+        elif name == b'IEND':
+            break
+    if ihdr is None:
+        return None
+    w, h, depth, ctyp, _, _, interlace = ihdr
+    bpp = _png_channels.get(ctyp)
+    if (depth != 8 or interlace or bpp is None or
+            (trns is not None and ctyp != 3) or
+            (ctyp == 3 and palette is None)):
+        return None
+    try:
+        raw = zlib.decompress(b''.join(idat))
+    except zlib.error:
+        return None
+    if len(raw) < h * (w * bpp + 1):
+        return None
+    raw = np.frombuffer(raw, np.ubyte, h * (w * bpp + 1))
+    im = _unfilter_rows(raw.reshape(h, w * bpp + 1), bpp).reshape(h, w, bpp)
+
+    if ctyp == 3:
+        lut = np.frombuffer(palette, np.ubyte).reshape(-1, 3)
+        if trns is not None:
+            alpha = np.full(len(lut), 255, dtype=np.ubyte)
+            trns = np.frombuffer(trns, np.ubyte)[:len(lut)]
+            alpha[:len(trns)] = trns
+            lut = np.column_stack([lut, alpha])
+        if im.max(initial=0) >= len(lut):
+            return None
+        im = lut[im[..., 0]]
+    elif ctyp in (0, 4):
+        im = np.concatenate([np.repeat(im[..., :1], 3, axis=2),
+                             im[..., 1:]], axis=2)
+    return im
+
+
+def _make_png(data, level=6, filter_type=0, strategy='default'):
     """Convert numpy array to PNG byte array.
 
     Parameters
@@ -30,36 +278,31 @@ def _make_png(data, level=6):
             * 0 is no compression.
 
         The default value is 6.
+    filter_type : int | str
+        The PNG filter applied to the scanlines before compression, from
+        0 (None, the fastest) to 4 (Paeth), or 'adaptive' to select the
+        filter of each row that is likely to compress best. Filtering
+        usually produces smaller files for images with smooth gradients.
+    strategy : str | int
+        The zlib compression strategy: 'default', 'filtered', 'huffman',
+        'rle' or 'fixed' (or one of the ``zlib.Z_*`` constants). 'rle' is
+        much faster than 'default' and compresses renderings with flat
+        areas well.
 
     Returns
     -------
     png : array
         PNG formatted array
     """
-    # Eventually we might want to use ext/png.py for this, but this
-    # routine *should* be faster b/c it's speacialized for our use case
-
-    def mkchunk(data, name):
-        if isinstance(data, np.ndarray):
-            size = data.nbytes
-        else:
-            size = len(data)
-        chunk = np.empty(size + 12, dtype=np.ubyte)
-        chunk.data[0:4] = np.array(size, '>u4').tostring()
-        chunk.data[4:8] = name.encode('ASCII')
-        chunk.data[8:8 + size] = data
-        # and-ing may not be necessary, but is done for safety:
-        # https://docs.python.org/3/library/zlib.html#zlib.crc32
-        chunk.data[-4:] = np.array(zlib.crc32(chunk[4:-4]) & 0xffffffff,
-                                   '>u4').tostring()
-        return chunk
-
     if data.dtype != np.ubyte:
         raise TypeError('data.dtype must be np.ubyte (np.uint8)')
 
     dim = data.shape[2]  # Dimension
     if dim not in (3, 4):
         raise TypeError('data.shape[2] must be in (3, 4)')
+    strategy = _zlib_strategies.get(strategy, strategy)
+    if strategy not in _zlib_strategies.values():
+        raise ValueError('unknown zlib strategy %r' % (strategy,))
 
     # www.libpng.org/pub/png/spec/1.2/PNG-Chunks.html#C.IHDR
     if dim == 4:
@@ -67,35 +310,36 @@ def _make_png(data, level=6):
     else:
         ctyp = 0b0010  # RGB
 
-    # www.libpng.org/pub/png/spec/1.2/PNG-Structure.html
-    header = b'\x89PNG\x0d\x0a\x1a\x0a'  # header
-
     h, w = data.shape[:2]
     depth = data.itemsize * 8
     ihdr = struct.pack('!IIBBBBB', w, h, depth, ctyp, 0, 0, 0)
-    c1 = mkchunk(ihdr, 'IHDR')
 
     # www.libpng.org/pub/png/spec/1.2/PNG-Chunks.html#C.IDAT
-    # insert filter byte at each scanline
-    idat = np.empty((h, w * dim + 1), dtype=np.ubyte)
-    idat[:, 1:] = data.reshape(h, w * dim)
-    idat[:, 0] = 0
-
-    comp_data = zlib.compress(idat, level)
-    c2 = mkchunk(comp_data, 'IDAT')
-    c3 = mkchunk(np.empty((0,), dtype=np.ubyte), 'IEND')
-
-    # concatenate
-    lh = len(header)
-    png = np.empty(lh + c1.nbytes + c2.nbytes + c3.nbytes, dtype=np.ubyte)
-    png.data[:lh] = header
-    p = lh
+    # filter the scanlines, each one starting with its filter type
+    idat = _filter_rows(data.reshape(h, w * dim), dim, filter_type)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS,
+                                  zlib.DEF_MEM_LEVEL, strategy)
+    comp_data = compressor.compress(idat) + compressor.flush()
 
-    for chunk in (c1, c2, c3):
-        png[p:p + len(chunk)] = chunk
-        p += chunk.nbytes
-
-    return png
+    # www.libpng.org/pub/png/spec/1.2/PNG-Structure.html
+    png = b''.join([_png_signature, _png_chunk('IHDR', ihdr),
+                    _png_chunk('IDAT', comp_data), _png_chunk('IEND', b'')])
+    return np.frombuffer(png, dtype=np.ubyte)
+
+
+def _read_png_reader(data):
+    """Decode PNG bytes with the bundled pure-Python decoder"""
+    x = Reader(bytes=data)
+    alpha = x.asDirect()[3]['alpha']
+    if alpha:
+        y = x.asRGBA8()[2]
+        n = 4
+    else:
+        y = x.asRGB8()[2]
+        n = 3
+    y = np.array([yy for yy in y], np.uint8)
+    y.shape = (y.shape[0], y.shape[1] // n, n)
+    return y
 
 
 def read_png(filename):
@@ -117,23 +361,18 @@ def read_png(filename):
     --------
     write_png, imread, imsave
     """
-    x = Reader(filename)
-    try:
-        alpha = x.asDirect()[3]['alpha']
-        if alpha:
-            y = x.asRGBA8()[2]
-            n = 4
-        else:
-            y = x.asRGB8()[2]
-            n = 3
-        y = np.array([yy for yy in y], np.uint8)
-    finally:
-        x.file.close()
-    y.shape = (y.shape[0], y.shape[1] // n, n)
-    return y
+    if hasattr(filename, 'read'):
+        data = filename.read()
+    else:
+        with open(filename, 'rb') as f:
+            data = f.read()
+    im = _decode_png(data)
+    if im is None:
+        im = _read_png_reader(data)
+    return im
 
 
-def write_png(filename, data):
+def write_png(filename, data, level=6, filter_type=0, strategy='default'):
     """Write a PNG file
 
     Unlike imsave, this requires no external dependencies.
@@ -144,6 +383,12 @@ def write_png(filename, data):
         File to save to.
     data : array
         Image data.
+    level : int
+        The zlib compression level, from 0 (none) to 9 (best).
+    filter_type : int | str
+        The PNG filter type (0 to 4) or 'adaptive' (see ``_make_png``).
+    strategy : str | int
+        The zlib compression strategy (see ``_make_png``).
 
     See also
     --------
@@ -153,7 +398,7 @@ def write_png(filename, data):
     if not data.ndim == 3 and data.shape[-1] in (3, 4):
         raise ValueError('data must be a 3D array with last dimension 3 or 4')
     with open(filename, 'wb') as f:
-        f.write(_make_png(data))  # Save array with make_png
+        f.write(_make_png(data, level, filter_type, strategy))
 
 
 def imread(filename, format=None):
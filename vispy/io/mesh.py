@@ -10,16 +10,27 @@ from os import path as op
 
 from .wavefront import WavefrontReader, WavefrontWriter
 from .stl import load_stl
+from .vmesh import read_vmesh, write_vmesh, read_cache, write_cache
 
 
-def read_mesh(fname):
+def read_mesh(fname, weld=False, cache=False):
     """Read mesh data from file.
 
     Parameters
     ----------
     fname : str
         File name to read. Format will be inferred from the filename.
-        Currently only '.obj' and '.obj.gz' are supported.
+        Currently only '.obj', '.obj.gz', '.stl' and '.vmesh' are supported
+        (other formats require meshio).
+    weld : bool
+        If True, merge the identical vertices of STL files. Otherwise, each
+        face of an STL file has its own three vertices.
+    cache : bool
+        If True, the mesh is cached in a side-car .vmesh file next to
+        *fname* (if the directory is writable), which is read instead of
+        *fname* as long as the size and modification time of *fname* do not
+        change. The arrays of a cached mesh are memory-mapped
+        (copy-on-write).
 
     Returns
     -------
@@ -37,11 +48,24 @@ def read_mesh(fname):
     if fmt == '.gz':
         fmt = op.splitext(op.splitext(fname)[0])[1].lower()
 
+    if cache and fmt != '.vmesh':
+        mesh = read_cache(fname, weld=weld)
+        if mesh is None:
+            mesh = read_mesh(fname, weld=weld)
+            write_cache(fname, *mesh, weld=weld)
+            return mesh
+        return tuple(mesh.get(name) for name in
+                     ('vertices', 'faces', 'normals', 'texcoords'))
+
     if fmt in ('.obj'):
         return WavefrontReader.read(fname)
+    elif fmt == '.vmesh':
+        mesh = read_vmesh(fname)
+        return tuple(mesh.get(name) for name in
+                     ('vertices', 'faces', 'normals', 'texcoords'))
     elif fmt in ('.stl'):
-        file_obj = open(fname, mode='rb')
-        mesh = load_stl(file_obj)
+        with open(fname, mode='rb') as file_obj:
+            mesh = load_stl(file_obj, weld=weld)
         vertices = mesh['vertices']
         faces = mesh['faces']
         normals = mesh['face_normals']
@@ -66,13 +90,15 @@ def read_mesh(fname):
 
 
 def write_mesh(fname, vertices, faces, normals, texcoords, name='',
-               format=None, overwrite=False, reshape_faces=True):
+               format=None, overwrite=False, reshape_faces=True,
+               colors=None, compress=False):
     """ Write mesh data to file.
 
     Parameters
     ----------
     fname : str
-        Filename to write. Must end with ".obj" or ".gz".
+        Filename to write. Must end with ".obj", ".gz" or ".vmesh" (other
+        formats require meshio).
     vertices : array
         Vertices.
     faces : array | None
@@ -84,12 +110,17 @@ def write_mesh(fname, vertices, faces, normals, texcoords, name='',
     name : str
         Name of the object.
     format : str
-        Currently only "obj" is supported.
+        Currently only "obj" and "vmesh" are supported.
     overwrite : bool
         If the file exists, overwrite it.
     reshape_faces : bool
         Reshape the `faces` array to (Nf, 3). Set to `False`
         if you need to write a mesh with non triangular faces.
+    colors : array | None
+        Colors of the vertices. Only supported by the "vmesh" format.
+    compress : bool
+        If True, compress the arrays with zlib. Only supported by the
+        "vmesh" format.
     """
     # Check file
     if op.isfile(fname) and not overwrite:
@@ -99,10 +130,18 @@ def write_mesh(fname, vertices, faces, normals, texcoords, name='',
         format = os.path.splitext(fname)[1][1:]
 
     # Check format
+    if format != 'vmesh' and (colors is not None or compress):
+        raise ValueError('colors and compress are only supported by the '
+                         'vmesh format')
     if format == 'obj':
         WavefrontWriter.write(fname, vertices, faces,
                               normals, texcoords, name, reshape_faces)
         return
+    elif format == 'vmesh':
+        write_vmesh(fname, vertices, faces, normals, texcoords,
+                    colors=colors, compress=compress,
+                    metadata=dict(name=name))
+        return
 
     try:
         import meshio
@@ -6,8 +6,12 @@
 # See https://github.com/mikedh/trimesh/blob/master/LICENSE.md for
 # the license.
 
+import warnings
+
 import numpy as np
 
+from ..geometry.meshdata import _weld_vertices
+
 
 class HeaderError(Exception):
     # the exception raised if an STL file object doesn't match its header
@@ -23,7 +27,14 @@ _stl_dtype_header = np.dtype([('header', np.void, 80),
                               ('face_count', np.int32)])
 
 
-def load_stl(file_obj, file_type=None):
+# size of the chunks read by the ASCII parser
+_ascii_chunk_size = 2 ** 24
+# the words of an ASCII STL file, apart from the numbers
+_ascii_keywords = (b'endfacet', b'endloop', b'facet', b'normal', b'outer',
+                   b'loop', b'vertex')
+
+
+def load_stl(file_obj, file_type=None, weld=False):
     '''
     Load an STL file from a file object.
 
@@ -31,6 +42,8 @@ def load_stl(file_obj, file_type=None):
     ----------
     file_obj: open file- like object
     file_type: not used
+    weld: bool, if True merge identical vertices, which are otherwise
+          repeated for every face using them
 
     Returns
     ----------
@@ -46,20 +59,48 @@ def load_stl(file_obj, file_type=None):
         # if that is true, it is almost certainly a binary STL file
         # if the header doesn't match the file length a HeaderError will be
         # raised
-        return load_stl_binary(file_obj)
+        result = load_stl_binary(file_obj)
     except HeaderError:
         # move the file back to where it was initially
         file_obj.seek(file_pos)
         # try to load the file as an ASCII STL
         # if the header doesn't match the file length a HeaderError will be
         # raised
-        return load_stl_ascii(file_obj)
+        result = load_stl_ascii(file_obj)
+    if weld:
+        result.update(weld_stl(result['vertices']))
+    return result
+
+
+def weld_stl(vertices):
+    '''
+    Merge the identical vertices of an STL mesh.
+
+    Parameters
+    ----------
+    vertices: (n,3) float, vertices of the faces, three per face
+
+    Returns
+    ----------
+    welded: dict with keys:
+              vertices:     (p,3) float, unique vertices
+              faces:        (n/3,3) int, indexes of vertices
+    '''
+    first, index = _weld_vertices(vertices)
+    return {'vertices': vertices[first],
+            'faces': index.reshape((-1, 3))}
 
 
 def load_stl_binary(file_obj):
     '''
     Load a binary STL file from a file object.
 
+    If the file object is backed by a file on disk, the file is memory
+    mapped rather than read, and the arrays of the result are views of the
+    mapped data (copy-on-write: they can be modified, without changing the
+    file). Only the vertices, which are interleaved with the normals in the
+    file, need to be copied.
+
     Parameters
     ----------
     file_obj: open file- like object
@@ -70,6 +111,8 @@ def load_stl_binary(file_obj):
               vertices:     (n,3) float, vertices
               faces:        (m,3) int, indexes of vertices
               face_normals: (m,3) float, normal vector of each face
+              triangles:    (m,3,3) float, vertices of each face (a view
+                            of the file data)
     '''
     # the header is always 84 bytes long, we just reference the dtype.itemsize
     # to be explicit about where that magical number comes from
@@ -78,7 +121,8 @@ def load_stl_binary(file_obj):
     if len(header_data) < header_length:
         raise HeaderError('Binary STL file not long enough to contain header!')
 
-    header = np.fromstring(header_data, dtype=_stl_dtype_header)
+    header = np.frombuffer(header_data, dtype=_stl_dtype_header)
+    face_count = int(header['face_count'][0])
 
     # now we check the length from the header versus the length of the file
     # data_start should always be position 84, but hard coding that felt ugly
@@ -95,7 +139,7 @@ def load_stl_binary(file_obj):
     # of the file doesn't match the header, the loaded version is almost
     # certainly going to be garbage.
     len_data = data_end - data_start
-    len_expected = header['face_count'] * _stl_dtype.itemsize
+    len_expected = face_count * _stl_dtype.itemsize
 
     # this check is to see if this really is a binary STL file.
     # if we don't do this and try to load a file that isn't structured properly
@@ -106,12 +150,25 @@ def load_stl_binary(file_obj):
 
     # all of our vertices will be loaded in order due to the STL format,
     # so faces are just sequential indices reshaped.
-    faces = np.arange(header['face_count'] * 3).reshape((-1, 3))
-    blob = np.fromstring(file_obj.read(), dtype=_stl_dtype)
+    faces = np.arange(face_count * 3).reshape((-1, 3))
+    blob = None
+    if face_count > 0:
+        try:
+            file_obj.fileno()
+        except (AttributeError, IOError, ValueError):
+            pass
+        else:
+            # copy-on-write, so that the arrays are writable as when read
+            blob = np.memmap(file_obj, dtype=_stl_dtype, mode='c',
+                             offset=data_start, shape=(face_count,))
+            file_obj.seek(data_end)
+    if blob is None:
+        blob = np.frombuffer(bytearray(file_obj.read()), dtype=_stl_dtype)
 
     result = {'vertices': blob['vertices'].reshape((-1, 3)),
-              'face_normals': blob['normals'].reshape((-1, 3)),
-              'faces': faces}
+              'face_normals': blob['normals'],
+              'faces': faces,
+              'triangles': blob['vertices']}
     return result
 
 
@@ -119,6 +176,9 @@ def load_stl_ascii(file_obj):
     '''
     Load an ASCII STL file from a file object.
 
+    The file is parsed in chunks, by removing the keywords and converting
+    the remaining numbers at once.
+
     Parameters
     ----------
     file_obj: open file- like object
@@ -133,30 +193,48 @@ def load_stl_ascii(file_obj):
     # header (not used by this function)
     file_obj.readline()
 
-    text = file_obj.read()
-    if hasattr(text, 'decode'):
-        text = text.decode('utf-8')
-    text = text.lower().split('endsolid')[0]
-    blob = np.array(text.split())
-
-    # there are 21 'words' in each face
-    face_len = 21
-    face_count = len(blob) / face_len
-    if (len(blob) % face_len) != 0:
+    values = []
+    rest = b''
+    while True:
+        chunk = file_obj.read(_ascii_chunk_size)
+        if not isinstance(chunk, bytes):
+            chunk = chunk.encode('utf-8')
+        text = (rest + chunk).lower()
+        end = text.find(b'endsolid')
+        if end >= 0:
+            text, chunk = text[:end], b''
+        elif chunk:
+            # keep the last (possibly incomplete) line for the next chunk
+            cut = text.rfind(b'\n') + 1
+            text, rest = text[:cut], text[cut:]
+        for word in _ascii_keywords:
+            text = text.replace(word, b' ')
+        text = text.strip()
+        if text:
+            # parsing stops with a warning at the first invalid value
+            with warnings.catch_warnings():
+                warnings.simplefilter('error', DeprecationWarning)
+                try:
+                    numbers = np.fromstring(text, dtype=np.float64, sep=' ')
+                except (DeprecationWarning, ValueError):
+                    raise HeaderError('Incorrect values in STL file!')
+            values.append(numbers)
+        if not chunk:
+            break
+    values = np.concatenate(values) if values else np.zeros(0)
+
+    # there are 12 numbers in each face
+    face_len = 12
+    if (len(values) % face_len) != 0:
         raise HeaderError('Incorrect number of values in STL file!')
-
-    face_count = int(face_count)
-    # this offset is to be added to a fixed set of indices that is tiled
-    offset = face_len * np.arange(face_count).reshape((-1, 1))
-    normal_index = np.tile([2, 3, 4], (face_count, 1)) + offset
-    vertex_index = np.tile(
-        [8, 9, 10, 12, 13, 14, 16, 17, 18], (face_count, 1)) + offset
+    values = values.reshape((-1, face_len))
+    face_count = len(values)
 
     # faces are groups of three sequential vertices, as vertices are not
     # references
     faces = np.arange(face_count * 3).reshape((-1, 3))
-    face_normals = blob[normal_index].astype(np.float64)
-    vertices = blob[vertex_index.reshape((-1, 3))].astype(np.float64)
+    face_normals = values[:, :3]
+    vertices = values[:, 3:].reshape((-1, 3))
 
     return {'vertices': vertices,
             'faces': faces,
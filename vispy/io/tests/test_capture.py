@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+import numpy as np
+from numpy.testing import assert_array_equal
+from os import path as op
+from concurrent.futures import ThreadPoolExecutor
+
+from vispy.io import FrameWriter, read_png
+from vispy.testing import run_tests_if_main, assert_raises
+from vispy.util import _TempDir
+
+temp_dir = _TempDir()
+
+
+def test_frame_writer():
+    """Test writing frames in the background"""
+    frames = np.random.randint(256, size=(12, 20, 30, 4)).astype(np.ubyte)
+    pattern = op.join(temp_dir, 'frame_%03d.png')
+    with FrameWriter(pattern, n_workers=3, max_pending=2,
+                     filter_type='adaptive') as writer:
+        for frame in frames:
+            writer.write(frame)
+            assert writer.pending <= 2
+    assert writer.filenames == [pattern % i for i in range(12)]
+    for fname, frame in zip(writer.filenames, frames):
+        assert_array_equal(read_png(fname), frame)
+    assert_raises(RuntimeError, writer.write, frames[0])
+
+    # other formats, frames are copied before being queued
+    executor = ThreadPoolExecutor(2)
+    for ext in ('npy', 'raw'):
+        pattern = op.join(temp_dir, 'frame_%03d.' + ext)
+        with FrameWriter(pattern, executor=executor, start=5) as writer:
+            frame = frames[0].copy()
+            assert writer.write(frame) == pattern % 5
+            frame[:] = 0
+            writer.write(frame[:, :, :3])
+            writer.flush()
+        if ext == 'npy':
+            assert_array_equal(np.load(pattern % 5), frames[0])
+            assert_array_equal(np.load(pattern % 6), 0)
+        else:
+            data = np.fromfile(pattern % 5, np.ubyte).reshape(frames[0].shape)
+            assert_array_equal(data, frames[0])
+    assert executor.submit(int).result() == 0  # not shut down
+    executor.shutdown()
+
+    # errors
+    assert_raises(ValueError, FrameWriter, 'frame.jpg')
+    assert_raises(ValueError, FrameWriter, 'frame.png')
+    assert_raises(TypeError, FrameWriter, 'frame%d.npy', level=1)
+    assert_raises(ValueError, FrameWriter, 'frame%d.png', executor='foo')
+    with FrameWriter(op.join(temp_dir, 'frame%d.png')) as writer:
+        assert_raises(ValueError, writer.write, frames[0, ..., :2])
+        assert_raises(ValueError, writer.write, frames[0].astype(float))
+    writer = FrameWriter(op.join(temp_dir, 'missing', 'frame%d.png'))
+    writer.write(frames[0])
+    assert_raises(IOError, writer.close)
+
+
+run_tests_if_main()
@@ -7,7 +7,9 @@ from os import path as op
 import warnings
 
 from vispy.io import load_crate, imsave, imread, read_png, write_png
-from vispy.testing import requires_img_lib, run_tests_if_main
+from vispy.io.image import (_make_png, _filter_rows, _read_png_reader,
+                            _unfilter_rows)
+from vispy.testing import requires_img_lib, run_tests_if_main, assert_raises
 from vispy.util import _TempDir
 
 temp_dir = _TempDir()
@@ -34,6 +36,33 @@ def test_make_png():
         assert_array_equal(rgb_a, rgb_a_read)
 
 
+def test_png_filters():
+    """Test PNG filters and compression options"""
+    yy, xx = np.mgrid[:37, :41]
+    grad = np.stack([3 * xx, 5 * yy, xx + yy, 255 - xx], -1).astype(np.ubyte)
+    noise = np.random.randint(256, size=grad.shape).astype(np.ubyte)
+    png_out = op.join(temp_dir, 'filters.png')
+    for data in (grad, noise, grad[..., :3]):
+        for filter_type in (0, 1, 2, 3, 4, 'paeth', 'adaptive'):
+            for strategy in ('default', 'rle'):
+                write_png(png_out, data, 6, filter_type, strategy)
+                assert_array_equal(read_png(png_out), data)
+            # the pure-Python decoder agrees
+            png = _make_png(np.ascontiguousarray(data), 6, filter_type)
+            assert_array_equal(_read_png_reader(png.tobytes()), data)
+    sizes = [len(_make_png(grad, filter_type=f)) for f in (0, 'adaptive')]
+    assert sizes[1] < sizes[0]
+    assert_raises(ValueError, _make_png, grad, filter_type=5)
+    assert_raises(ValueError, _make_png, grad, strategy='foo')
+
+    # rows with different filters, as selected by the adaptive filter
+    lines = grad.reshape(37, -1)
+    filtered = np.array([_filter_rows(lines, 4, t) for t in range(5)])
+    types = np.random.randint(5, size=37)
+    raw = filtered[types, np.arange(37)]
+    assert_array_equal(_unfilter_rows(raw, 4), lines)
+
+
 @requires_img_lib()
 def test_read_write_image():
     """Test reading and writing of images"""
@@ -38,6 +38,48 @@ def test_wavefront():
                     rtol=1e-7, atol=1e-7)
 
 
+def test_wavefront_reader():
+    """Test wavefront reading of index sets, in chunks and gzipped"""
+    from vispy.io.wavefront import WavefrontReader
+    from vispy.ext.gzip_open import gzip_open
+    text = (b'# square # with a #\nmtllib foo.mtl\no square\n'
+            b'v 0 0 0\nv 1 0 0\n  v 1 1 0 # inline comment\nvt 0 0\nvt 1 0\n'
+            b'vt 1 1\nvn 0 0 1#normal\nf 1/1/1 2/2/1 3/3/1 # face\n  #\n'
+            b'v 0 1 0\r\nf -4/1/-1 -2/3/1 -1/2/1')
+    fname = op.join(temp_dir, 'temp.obj.gz')
+    with gzip_open(fname, 'wb') as fid:
+        fid.write(text)
+    for chunk_size in (7, 2 ** 24):
+        WavefrontReader._chunk_size = chunk_size
+        try:
+            vertices, faces, normals, texcoords = read_mesh(fname)
+        finally:
+            WavefrontReader._chunk_size = 2 ** 24
+        # identical index sets share a vertex
+        assert_array_equal(vertices, [[0, 0, 0], [1, 0, 0], [1, 1, 0],
+                                      [0, 1, 0]])
+        assert_array_equal(faces, [[0, 1, 2], [0, 2, 3]])
+        assert faces.dtype == np.uint32
+        assert_array_equal(normals, np.tile([0, 0, 1], (4, 1)))
+        assert_array_equal(texcoords, [[0, 0], [1, 0], [1, 1], [1, 0]])
+
+    # texcoords and normals not given for all faces are ignored
+    fname = op.join(temp_dir, 'temp.obj')
+    with open(fname, 'wb') as fid:
+        fid.write(b'v 0 0 0\nv 1 0 0\nv 0 1 0\nvt 0 0\nvn 0 0 1\n'
+                  b'f 1/1/1 2/1/1 3/1/1\nf 3// 2 1\n')
+    vertices, faces, normals, texcoords = read_mesh(fname)
+    assert_array_equal(faces, [[0, 1, 2], [2, 1, 0]])
+    assert texcoords is None
+    assert_allclose(normals, 0, atol=1e-7)
+    with open(fname, 'wb') as fid:
+        fid.write(b'v 0 0 0\nv 1 0 0\nv 0 1 0\nf 1 2 4\n')
+    assert_raises(IndexError, read_mesh, fname)
+    with open(fname, 'wb') as fid:
+        fid.write(b'v 0 0 0\nv 1 0 x\nv 0 1 0\nf 1 2 3\n')
+    assert_raises(ValueError, read_mesh, fname)
+
+
 def test_wavefront_non_triangular():
     '''Test wavefront writing with non-triangular faces'''
     vertices = np.array([[0.5, 1.375, 0.],
@@ -119,4 +161,115 @@ def test_huge_cross():
     assert_array_equal(z, zz)
 
 
+def test_stl():
+    """Test reading binary and ASCII STL files"""
+    from vispy.io.stl import _stl_dtype, _stl_dtype_header, HeaderError
+    vertices = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0]],
+                        dtype=np.float32)
+    faces = np.array([[0, 1, 2], [0, 2, 3]])
+    normals = np.array([[0, 0, 1], [0, 0, 1]], dtype=np.float32)
+
+    fname = op.join(temp_dir, 'temp.stl')
+    header = np.zeros(1, _stl_dtype_header)
+    header['face_count'] = len(faces)
+    data = np.zeros(len(faces), _stl_dtype)
+    data['vertices'] = vertices[faces]
+    data['normals'] = normals
+    with open(fname, 'wb') as fid:
+        fid.write(header.tobytes() + data.tobytes())
+    out_vertices, out_faces, out_normals, texcoords = read_mesh(fname)
+    assert_array_equal(out_vertices[out_faces], vertices[faces])
+    assert_array_equal(out_faces, np.arange(6).reshape(2, 3))
+    assert_array_equal(out_normals, normals)
+    assert texcoords is None
+    # the arrays can be modified, without changing the file
+    out_vertices -= out_vertices.mean(axis=0)
+    out_normals *= -1
+    assert_array_equal(read_mesh(fname)[0][out_faces], vertices[faces])
+    out_vertices, out_faces, _, _ = read_mesh(fname, weld=True)
+    assert_array_equal(out_vertices, vertices)
+    assert_array_equal(out_faces, faces)
+
+    fname = op.join(temp_dir, 'temp_ascii.stl')
+    with open(fname, 'w') as fid:
+        fid.write('solid square\n')
+        for face, normal in zip(faces, normals):
+            fid.write('facet normal %g %g %g\n outer loop\n' % tuple(normal))
+            for vertex in vertices[face]:
+                fid.write('  VERTEX %e %e %e\n' % tuple(vertex))
+            fid.write(' endloop\nendfacet\n')
+        fid.write('endsolid square\n')
+    out_vertices, out_faces, out_normals, _ = read_mesh(fname, weld=True)
+    assert_array_equal(out_vertices, vertices)
+    assert_array_equal(out_faces, faces)
+    assert_array_equal(out_normals, normals)
+
+    with open(fname, 'w') as fid:
+        fid.write('solid square\nfacet normal 0 0 x\n')
+    assert_raises(HeaderError, read_mesh, fname)
+
+
+def test_vmesh():
+    """Test the binary mesh format and the mesh cache"""
+    from vispy.io.vmesh import read_vmesh, write_vmesh
+    vertices = np.random.RandomState(0).rand(10, 3).astype(np.float32)
+    faces = np.arange(9, dtype=np.uint32).reshape(3, 3)
+    colors = np.ones((10, 4), dtype='>f8')
+    fname = op.join(temp_dir, 'temp.vmesh')
+    for compress in (False, True):
+        write_vmesh(fname, vertices, faces, colors=colors, compress=compress,
+                    metadata=dict(foo='bar'))
+        mesh = read_vmesh(fname)
+        assert_equal(set(mesh), set(['vertices', 'faces', 'colors',
+                                     'metadata']))
+        assert_equal(isinstance(mesh['faces'], np.memmap), not compress)
+        assert_array_equal(mesh['vertices'], vertices)
+        assert_array_equal(mesh['faces'], faces)
+        assert_equal(mesh['faces'].dtype, np.uint32)
+        assert_equal(mesh['colors'].dtype, np.dtype('>f8'))
+        assert_array_equal(mesh['colors'], colors)
+        assert_equal(mesh['metadata'], dict(foo='bar'))
+        # the arrays are writable, without changing the file
+        mesh['vertices'][0] = 2.
+        mesh['colors'][:] = 0.
+        del mesh
+        assert_array_equal(read_vmesh(fname)['vertices'], vertices)
+    write_mesh(fname, vertices, faces, None, vertices[:, :2],
+               overwrite=True)
+    mesh = read_mesh(fname)
+    assert_array_equal(mesh[0], vertices)
+    assert_array_equal(mesh[1], faces)
+    assert mesh[2] is None
+    assert_array_equal(mesh[3], vertices[:, :2])
+    write_mesh(fname, vertices, faces, None, None, overwrite=True,
+               colors=colors, compress=True)
+    mesh = read_mesh(fname)
+    assert_array_equal(mesh[0], vertices)
+    assert_array_equal(mesh[1], faces)
+    assert not isinstance(mesh[0], np.memmap)  # compressed
+    assert_array_equal(read_vmesh(fname)['colors'], colors)
+    assert_raises(ValueError, write_mesh, op.join(temp_dir, 'temp.obj'),
+                  vertices, faces, None, None, overwrite=True, colors=colors)
+    assert_raises(ValueError, read_vmesh, op.abspath(__file__))
+
+    # cache of an OBJ file
+    fname = op.join(temp_dir, 'cached.obj')
+    write_mesh(fname, vertices, faces, None, None, overwrite=True)
+    assert not op.isfile(fname + '.vmesh')
+    mesh = read_mesh(fname, cache=True)
+    assert op.isfile(fname + '.vmesh')
+    cached = read_mesh(fname, cache=True)
+    assert isinstance(cached[0], np.memmap)
+    for m1, m2 in zip(mesh, cached):
+        assert_array_equal(m1, m2)
+    cached[0][0] = 2.
+    del cached
+    assert_array_equal(read_mesh(fname, cache=True)[0], mesh[0])
+    # the cache is ignored once the file changed
+    write_mesh(fname, vertices[:5], faces[:1], None, None, overwrite=True)
+    mesh = read_mesh(fname, cache=True)
+    assert_equal(len(mesh[0]), 3)
+    assert_equal(len(read_mesh(fname, cache=True)[0]), 3)
+
+
 run_tests_if_main()
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+
+"""
+Reading and writing of meshes in a compact binary format (.vmesh).
+
+The file starts with a header giving the format version, JSON metadata and
+a table of the arrays stored in the file (name, dtype with endianness,
+shape, compression, position). Arrays follow, aligned on 64 bytes so that
+uncompressed arrays can be memory-mapped. Arrays may be compressed
+individually with zlib.
+
+This format is also used to cache the meshes read from other formats (see
+read_mesh).
+"""
+
+import json
+import os
+import struct
+import zlib
+
+import numpy as np
+
+_magic = b'VISPYMSH'
+_version = 1
+_alignment = 64
+# magic, version, number of arrays, length of the metadata
+_header = struct.Struct('<8sIII')
+_table_dtype = np.dtype([('name', 'S16'), ('dtype', 'S8'),
+                         ('ndim', '<u4'), ('compression', '<u4'),
+                         ('shape', '<u8', 4), ('offset', '<u8'),
+                         ('nbytes', '<u8')])
+_names = ('vertices', 'faces', 'normals', 'texcoords', 'colors')
+
+
+def write_vmesh(fname, vertices, faces=None, normals=None, texcoords=None,
+                colors=None, compress=False, metadata=None):
+    """Write mesh data to a .vmesh file
+
+    Parameters
+    ----------
+    fname : str
+        The file name.
+    vertices : array
+        Vertices.
+    faces : array | None
+        Face definitions.
+    normals : array | None
+        Normals.
+    texcoords : array | None
+        Texture coordinates.
+    colors : array | None
+        Colors.
+    compress : bool
+        If True, compress the arrays with zlib. Compressed arrays cannot be
+        memory-mapped when reading the file.
+    metadata : dict | None
+        Additional data to store in the file header. Must be serializable
+        to JSON.
+    """
+    arrays = [(name, np.ascontiguousarray(a)) for name, a in
+              zip(_names, (vertices, faces, normals, texcoords, colors))
+              if a is not None]
+    meta = json.dumps(metadata or {}).encode('utf-8')
+    table = np.zeros(len(arrays), _table_dtype)
+    data = []
+    offset = _header.size + len(meta) + table.nbytes
+    for entry, (name, a) in zip(table, arrays):
+        if a.ndim > 4:
+            raise ValueError('%s has too many dimensions' % name)
+        buf = a.tobytes()
+        if compress:
+            buf = zlib.compress(buf)
+        offset += -offset % _alignment
+        entry['name'] = name.encode('ascii')
+        entry['dtype'] = a.dtype.str.encode('ascii')
+        entry['ndim'] = a.ndim
+        entry['compression'] = int(compress)
+        entry['shape'][:a.ndim] = a.shape
+        entry['offset'] = offset
+        entry['nbytes'] = len(buf)
+        data.append((offset, buf))
+        offset += len(buf)
+
+    with open(fname, 'wb') as fid:
+        fid.write(_header.pack(_magic, _version, len(arrays), len(meta)))
+        fid.write(meta)
+        fid.write(table.tobytes())
+        for offset, buf in data:
+            fid.write(b'\0' * (offset - fid.tell()))
+            fid.write(buf)
+
+
+def read_vmesh(fname, mmap=True):
+    """Read mesh data from a .vmesh file
+
+    Parameters
+    ----------
+    fname : str
+        The file name.
+    mmap : bool
+        If True, uncompressed arrays are memory-mapped rather than read. They
+        are copy-on-write: they can be modified, without changing the file.
+
+    Returns
+    -------
+    mesh : dict
+        The arrays stored in the file (a subset of 'vertices', 'faces',
+        'normals', 'texcoords' and 'colors'), and the metadata under
+        'metadata'.
+    """
+    with open(fname, 'rb') as fid:
+        header = fid.read(_header.size)
+        if len(header) != _header.size or header[:8] != _magic:
+            raise ValueError('%s is not a vmesh file' % fname)
+        magic, version, n_arrays, n_meta = _header.unpack(header)
+        if version > _version:
+            raise ValueError('vmesh version %d is not supported (newer than '
+                             '%d)' % (version, _version))
+        meta = json.loads(fid.read(n_meta).decode('utf-8'))
+        table = np.frombuffer(fid.read(n_arrays * _table_dtype.itemsize),
+                              _table_dtype)
+        mesh = dict(metadata=meta)
+        for entry in table:
+            name = entry['name'].decode('ascii')
+            dtype = np.dtype(entry['dtype'].decode('ascii'))
+            shape = tuple(int(s) for s in entry['shape'][:entry['ndim']])
+            offset, nbytes = int(entry['offset']), int(entry['nbytes'])
+            if entry['compression'] == 0 and mmap and nbytes > 0:
+                a = np.memmap(fid, dtype, 'c', offset, shape)
+            else:
+                fid.seek(offset)
+                buf = fid.read(nbytes)
+                if entry['compression'] == 1:
+                    buf = zlib.decompress(buf)
+                elif entry['compression'] != 0:
+                    raise ValueError('unknown compression for %s' % name)
+                a = np.frombuffer(bytearray(buf), dtype).reshape(shape)
+            mesh[name] = a
+    return mesh
+
+
+def _cache_key(fname, **kwargs):
+    """The metadata identifying a version of a file"""
+    stat = os.stat(fname)
+    key = dict(source_size=stat.st_size, source_mtime=stat.st_mtime)
+    key.update(kwargs)
+    return key
+
+
+def read_cache(fname, **kwargs):
+    """Read the mesh cached for a file
+
+    Parameters
+    ----------
+    fname : str
+        The file whose mesh was cached by write_cache.
+    **kwargs : dict
+        The options used to read the mesh, which must match the ones given
+        to write_cache.
+
+    Returns
+    -------
+    mesh : dict | None
+        The mesh arrays (see read_vmesh), or None if the cache does not
+        exist or is outdated.
+    """
+    cache = fname + '.vmesh'
+    if not os.path.isfile(cache):
+        return None
+    try:
+        mesh = read_vmesh(cache)
+    except (IOError, OSError, ValueError):
+        return None
+    key = json.loads(json.dumps(_cache_key(fname, **kwargs)))
+    if mesh['metadata'] != key:
+        return None
+    return mesh
+
+
+def write_cache(fname, vertices, faces=None, normals=None, texcoords=None,
+                **kwargs):
+    """Cache the mesh read from a file in a side-car .vmesh file
+
+    The cache is identified by the size and modification time of the file,
+    and by the keyword arguments, so that it is ignored once the file has
+    changed. Returns True if the cache could be written.
+    """
+    cache = fname + '.vmesh'
+    temp = '%s.%d.tmp' % (cache, os.getpid())
+    try:
+        write_vmesh(temp, vertices, faces, normals, texcoords,
+                    metadata=_cache_key(fname, **kwargs))
+        os.replace(temp, cache)
+    except (IOError, OSError):
+        if os.path.exists(temp):
+            os.remove(temp)
+        return False
+    return True
@@ -20,6 +20,7 @@ The classes are written with compatibility of Python3 in mind.
 
 import numpy as np
 import time
+import warnings
 from os import path as op
 
 from ..ext.gzip_open import gzip_open
@@ -27,30 +28,42 @@ from ..geometry import _calculate_normals
 from ..util import logger
 
 
+# byte values used to classify lines
+_SPACE = np.zeros(256, dtype=bool)
+_SPACE[[ord(c) for c in ' \t\r\n\v\f']] = True
+_NL, _SLASH = ord('\n'), ord('/')
+_V, _T, _N, _F, _HASH = (ord(c) for c in 'vtnf#')
+
+# line kinds
+_OTHER, _VERTEX, _TEXCOORD, _NORMAL, _FACE, _IGNORED = range(6)
+
+
 class WavefrontReader(object):
+    """ Bulk reader of OBJ files
+
+    The file is read by chunks of complete lines. Lines are classified by
+    their prefix with NumPy, and the numbers of each kind of line are
+    converted at once. The v/vt/vn index triples of the faces are resolved
+    into unique vertices at the end.
+    """
+
+    # number of bytes read at once
+    _chunk_size = 2 ** 24
 
     def __init__(self, f):
         self._f = f
 
-        # Original vertices, normals and texture coords.
+        # Original vertices, normals and texture coords (lists of arrays).
         # These are not necessarily of the same length.
         self._v = []
         self._vn = []
         self._vt = []
+        self._counts = {_VERTEX: 0, _TEXCOORD: 0, _NORMAL: 0}
 
-        # Final vertices, normals and texture coords.
-        # All three lists are of the same length, as opengl wants it.
-        self._vertices = []
-        self._normals = []
-        self._texcords = []
-
-        # The faces, indices to vertex/normal/texcords arrays.
+        # The faces, as (Nf, n, 3) arrays of absolute indices into the
+        # vertex/texcords/normal arrays (-1 if not given).
         self._faces = []
 
-        # Dictionary to keep track of processed face data, so we can
-        # convert the original v/vn/vn to the final vertices/normals/texcords.
-        self._facemap = {}
-
     @classmethod
     def read(cls, fname):
         """ read(fname, fmt)
@@ -69,12 +82,19 @@ class WavefrontReader(object):
         assert fmt in ('.obj', '.gz')
         opener = open if fmt == '.obj' else gzip_open
         with opener(fname, 'rb') as f:
-            try:
-                reader = WavefrontReader(f)
-                while True:
-                    reader.readLine()
-            except EOFError:
-                pass
+            reader = WavefrontReader(f)
+            rest = b''
+            while True:
+                chunk = f.read(cls._chunk_size)
+                if not chunk:
+                    break
+                data = rest + chunk
+                # keep the last (possibly incomplete) line for later
+                cut = data.rfind(b'\n') + 1
+                data, rest = data[:cut], data[cut:]
+                reader.readLines(data)
+            if rest.strip():
+                reader.readLines(rest + b'\n')
 
         # Done
         t0 = time.time()
@@ -84,142 +104,214 @@ class WavefrontReader(object):
                      ' seconds')
         return mesh
 
-    def readLine(self):
-        """ The method that reads a line and processes it.
+    def readLines(self, data):
+        """ Process a block of complete lines (ending with a newline).
         """
-
-        # Read line
-        line = self._f.readline().decode('ascii', 'ignore')
-        if not line:
-            raise EOFError()
-        line = line.strip()
-
-        if line.startswith('v '):
-            # self._vertices.append( *self.readTuple(line) )
-            self._v.append(self.readTuple(line))
-        elif line.startswith('vt '):
-            self._vt.append(self.readTuple(line, 3))
-        elif line.startswith('vn '):
-            self._vn.append(self.readTuple(line))
-        elif line.startswith('f '):
-            self._faces.append(self.readFace(line))
-        elif line.startswith('#'):
-            pass  # Comment
-        elif line.startswith('mtllib '):
+        if not data:
+            return
+        # Index sets without texcords or trailing slashes get 0 (no index)
+        # so that each index set has numbers separated by slashes only
+        if b'/' in data:
+            for old, new in ((b'//', b'/0/'), (b'/ ', b'/0 '),
+                             (b'/\t', b'/0\t'), (b'/\r', b'/0\r'),
+                             (b'/\n', b'/0\n')):
+                data = data.replace(old, new)
+        text = np.frombuffer(data, dtype=np.uint8).copy()
+        ends = np.flatnonzero(text == _NL)
+        starts = np.concatenate([[0], ends[:-1] + 1])
+
+        # Blank the comments, from the first # of a line to its end
+        hashes = np.flatnonzero(text == _HASH)
+        if len(hashes):
+            line = np.searchsorted(ends, hashes)
+            first = np.concatenate([[True], line[1:] != line[:-1]])
+            comment = np.zeros(len(text) + 1, dtype=np.int8)
+            comment[hashes[first]] = 1
+            comment[ends[line[first]]] = -1
+            text[np.cumsum(comment[:-1]) > 0] = ord(' ')
+
+        # First characters of each (stripped) line
+        lead = starts.copy()
+        while True:
+            indent = _SPACE[text[lead]] & (lead < ends)
+            if not indent.any():
+                break
+            lead[indent] += 1
+        c = [text[np.minimum(lead + i, ends)] for i in range(3)]
+        kind = np.full(len(starts), _OTHER, dtype=np.uint8)
+        kind[(c[0] == _V) & _SPACE[c[1]]] = _VERTEX
+        kind[(c[0] == _V) & (c[1] == _T) & _SPACE[c[2]]] = _TEXCOORD
+        kind[(c[0] == _V) & (c[1] == _N) & _SPACE[c[2]]] = _NORMAL
+        kind[(c[0] == _F) & _SPACE[c[1]]] = _FACE
+        kind[lead == ends] = _IGNORED
+        for i in np.flatnonzero(kind == _OTHER):
+            self._readOther(data[lead[i]:ends[i]].decode('ascii', 'ignore'))
+
+        # Remove the prefixes, count the numbers or index sets of each line
+        text[lead[kind != _IGNORED]] = ord(' ')
+        prefix2 = (kind == _TEXCOORD) | (kind == _NORMAL)
+        text[lead[prefix2] + 1] = ord(' ')
+        space = _SPACE[text]
+        token = ~space
+        token[1:] &= space[:-1]
+        n_tokens = np.add.reduceat(token, starts, dtype=np.intp)
+        byte_kind = np.repeat(kind, ends - starts + 1)
+        counts = self._counts
+        before = dict((k, np.cumsum(kind == k) + counts[k]) for k in counts)
+
+        for k, out, n in ((_VERTEX, self._v, 3), (_TEXCOORD, self._vt, 3),
+                          (_NORMAL, self._vn, 3)):
+            lines = kind == k
+            if lines.any():
+                values = self._parse(text[byte_kind == k], float)
+                out.append(_first_values(values, n_tokens[lines], n))
+                counts[k] += len(out[-1])
+
+        lines = np.flatnonzero(kind == _FACE)
+        if len(lines):
+            self._readFaces(text, byte_kind == _FACE, token,
+                            n_tokens[lines],
+                            [before[k][lines] for k in
+                             (_VERTEX, _TEXCOORD, _NORMAL)])
+
+    def _readOther(self, line):
+        if line.startswith('mtllib '):
             logger.warning('Notice reading .OBJ: material properties are '
                            'ignored.')
         elif any(line.startswith(x) for x in ('g ', 's ', 'o ', 'usemtl ')):
             pass  # Ignore groups and smoothing groups, obj names, material
-        elif not line.strip():
-            pass
         else:
             logger.warning('Notice reading .OBJ: ignoring %s command.'
                            % line.strip())
 
-    def readTuple(self, line, n=3):
-        """ Reads a tuple of numbers. e.g. vertices, normals or teture coords.
+    def _parse(self, text, dtype):
+        """ Convert the numbers of a block of text at once.
         """
-        numbers = [num for num in line.split(' ') if num]
-        return [float(num) for num in numbers[1:n + 1]]
+        with warnings.catch_warnings():
+            # parsing stops with a warning at the first invalid value
+            warnings.simplefilter('error', DeprecationWarning)
+            try:
+                return np.fromstring(text.tobytes(), dtype=dtype, sep=' ')
+            except (DeprecationWarning, ValueError):
+                raise ValueError('Invalid numbers in OBJ file')
 
-    def readFace(self, line):
+    def _readFaces(self, text, mask, token, n_sets, refs):
         """ Each face consists of three or more sets of indices. Each set
         consists of 1, 2 or 3 indices to vertices/normals/texcords.
         """
-
-        # Get parts (skip first)
-        indexSets = [num for num in line.split(' ') if num][1:]
-
-        final_face = []
-        for indexSet in indexSets:
-
-            # Did we see this exact index earlier? If so, it's easy
-            final_index = self._facemap.get(indexSet)
-            if final_index is not None:
-                final_face.append(final_index)
-                continue
-
-            # If not, we need to sync the vertices/normals/texcords ...
-
-            # Get and store final index
-            final_index = len(self._vertices)
-            final_face.append(final_index)
-            self._facemap[indexSet] = final_index
-
-            # What indices were given?
-            indices = [i for i in indexSet.split('/')]
-
-            # Store new set of vertex/normal/texcords.
-            # If there is a single face that does not specify the texcord
-            # index, the texcords are ignored. Likewise for the normals.
-            if True:
-                vertex_index = self._absint(indices[0], len(self._v))
-                self._vertices.append(self._v[vertex_index])
-            if self._texcords is not None:
-                if len(indices) > 1 and indices[1]:
-                    texcord_index = self._absint(indices[1], len(self._vt))
-                    self._texcords.append(self._vt[texcord_index])
-                else:
-                    if self._texcords:
-                        logger.warning('Ignoring texture coordinates because '
-                                       'it is not specified for all faces.')
-                    self._texcords = None
-            if self._normals is not None:
-                if len(indices) > 2 and indices[2]:
-                    normal_index = self._absint(indices[2], len(self._vn))
-                    self._normals.append(self._vn[normal_index])
-                else:
-                    if self._normals:
-                        logger.warning('Ignoring normals because it is not '
-                                       'specified for all faces.')
-                    self._normals = None
-
-        # Check face
-        if self._faces and len(self._faces[0]) != len(final_face):
+        # Check faces
+        n = n_sets[0] if not self._faces else self._faces[0].shape[1]
+        if (n_sets != n).any():
             raise RuntimeError(
                 'Vispy requires that all faces are either triangles or quads.')
 
-        # Done
-        return final_face
-
-    def _absint(self, i, ref):
-        i = int(i)
-        if i > 0:
-            return i - 1
+        # Number of indices in each set
+        slash = text == _SLASH
+        set_id = np.searchsorted(np.flatnonzero(token & mask),
+                                 np.flatnonzero(slash & mask), 'right') - 1
+        n_indices = np.bincount(set_id, minlength=n * len(n_sets)) + 1
+        text[slash] = ord(' ')
+        values = self._parse(text[mask], np.int64)
+        if len(values) != n_indices.sum() or n_indices.max() > 3:
+            raise ValueError('Invalid face in OBJ file')
+        faces = np.zeros((len(n_sets) * n, 3), dtype=np.int64)
+        if (n_indices == n_indices[0]).all():
+            faces[:, :n_indices[0]] = values.reshape(len(faces), -1)
         else:
-            return ref + i
+            first = np.cumsum(n_indices) - n_indices
+            rows = np.repeat(np.arange(len(faces)), n_indices)
+            faces[rows, np.arange(len(values)) - first[rows]] = values
+
+        # Make indices absolute, relative to the current number of items
+        faces = faces.reshape(len(n_sets), n, 3)
+        for i in range(3):
+            idx = faces[:, :, i]
+            ref = refs[i][:, np.newaxis]
+            idx -= 1
+            np.add(idx, ref + 1, out=idx, where=idx < -1)
+        self._faces.append(faces)
 
     def _calculate_normals(self):
-        vertices, faces = self._vertices, self._faces
-        if faces is None:
-            # ensure it's always 2D so we can use our methods
-            faces = np.arange(0, vertices.size, dtype=np.uint32)[:, np.newaxis]
-        normals = _calculate_normals(vertices, faces)
-        return normals
+        return _calculate_normals(self._vertices, self._faces)
 
     def finish(self):
-        """ Converts gathere lists to numpy arrays and creates
-        BaseMesh instance.
+        """ Converts gathered arrays to the final vertices, faces, normals
+        and texture coordinates.
         """
-        self._vertices = np.array(self._vertices, 'float32')
-        if self._faces:
-            self._faces = np.array(self._faces, 'uint32')
-        else:
+        v, vt, vn = [np.concatenate(a) if a else np.zeros((0, 3))
+                     for a in (self._v, self._vt, self._vn)]
+        if not self._faces:
             # Use vertices only
-            self._vertices = np.array(self._v, 'float32')
+            self._vertices = v.astype('float32')
             self._faces = None
-        if self._normals:
-            self._normals = np.array(self._normals, 'float32')
+            self._normals = (vn.astype('float32') if len(vn) == len(v) and
+                             len(vn) else None)
+            self._texcords = None
+            return (self._vertices, self._faces, self._normals,
+                    self._texcords)
+
+        faces = np.concatenate(self._faces)
+        sets = faces.reshape(-1, 3)
+
+        # If there is a single face that does not specify the texcord
+        # index, the texcords are ignored. Likewise for the normals.
+        for i, name in ((1, 'texture coordinates'), (2, 'normals')):
+            missing = sets[:, i] < 0
+            if missing.any():
+                if not missing.all():
+                    logger.warning('Ignoring %s because it is not '
+                                   'specified for all faces.' % name)
+                sets[:, i] = -1
+        for i, ref in enumerate((v, vt, vn)):
+            idx = sets[:, i]
+            if ((idx < -1) | (idx >= len(ref))).any() or \
+                    (i == 0 and (idx < 0).any()):
+                raise IndexError('Invalid index in OBJ face')
+
+        # Unique index sets, numbered in order of first appearance
+        shape = [len(v), len(vt) + 1, len(vn) + 1]
+        if np.prod(shape, dtype=float) < 2 ** 62:
+            keys = np.ravel_multi_index((sets + [0, 1, 1]).T, shape)
         else:
-            self._normals = self._calculate_normals()
-        if self._texcords:
-            self._texcords = np.array(self._texcords, 'float32')
+            keys = np.ascontiguousarray(sets).view(
+                np.dtype((np.void, sets.dtype.itemsize * 3))).ravel()
+        _, first, inverse = np.unique(keys, return_index=True,
+                                      return_inverse=True)
+        order = np.argsort(first, kind='stable')
+        rank = np.empty(len(first), dtype=np.uint32)
+        rank[order] = np.arange(len(first))
+        first = first[order]
+
+        self._faces = rank[inverse].reshape(faces.shape[:2])
+        self._vertices = v[sets[first, 0]].astype('float32')
+        if sets[0, 1] >= 0:
+            self._texcords = vt[sets[first, 1]].astype('float32')
         else:
             self._texcords = None
+        if sets[0, 2] >= 0:
+            self._normals = vn[sets[first, 2]].astype('float32')
+        else:
+            self._normals = self._calculate_normals()
 
         return self._vertices, self._faces, self._normals, self._texcords
 
 
+def _first_values(values, counts, n):
+    """ Keep the first n values (at most) of each line of a block of lines
+    having counts values.
+    """
+    width = min(n, counts.max()) if len(counts) else n
+    if (counts == counts[0]).all():
+        return values.reshape(len(counts), -1)[:, :width]
+    out = np.zeros((len(counts), width))
+    first = np.cumsum(counts) - counts
+    rows = np.repeat(np.arange(len(counts)), counts)
+    cols = np.arange(len(values)) - first[rows]
+    keep = cols < width
+    out[rows[keep], cols[keep]] = values[keep]
+    return out
+
+
 class WavefrontWriter(object):
 
     def __init__(self, f):
@@ -60,6 +60,7 @@ def _init():
         'dpi': (int, type(None)),
         'profile': string_types + (type(None),),
         'audit_tests': (bool,),
+        'glyph_cache': string_types + (bool,),
         'test_data_path': string_types + (type(None),),
     }
 
@@ -76,6 +77,7 @@ def _init():
         'dpi': None,
         'profile': None,
         'audit_tests': False,
+        'glyph_cache': False,
         'test_data_path': _test_data_path,
     }
 
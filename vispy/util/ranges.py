@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+
+import numpy as np
+
+
+def _ranges(starts, counts):
+    """Concatenation of the ranges [start, start + count)"""
+    counts = np.asarray(counts, np.intp)
+    ends = np.cumsum(counts)
+    total = ends[-1] if len(ends) else 0
+    return np.arange(total) + np.repeat(np.asarray(starts, np.intp) -
+                                        ends + counts, counts)
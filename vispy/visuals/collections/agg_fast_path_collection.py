@@ -16,6 +16,7 @@ from ... import glsl
 from ...gloo import gl
 from . collection import Collection
 from ..transforms import NullTransform
+from . path_lod import PathLOD
 
 
 class AggFastPathCollection(Collection):
@@ -29,8 +30,12 @@ class AggFastPathCollection(Collection):
     be made on miter joins which may result in some glitches on screen.
     """
 
+    # vertex attributes computed from the paths
+    _path_fields = ('collection_index', 'prev', 'curr', 'next', 'id')
+
     def __init__(self, user_dtype=None, transform=None,
-                 vertex=None, fragment=None, **kwargs):
+                 vertex=None, fragment=None, lod=False, lod_tolerance=0.5,
+                 **kwargs):
         """
         Initialize the collection.
 
@@ -50,6 +55,15 @@ class AggFastPathCollection(Collection):
         fragment: string
             Fragment  shader code
 
+        lod: bool
+            Whether to simplify paths according to the current zoom level.
+            Paths are re-uploaded at draw time, only when the size of a pixel
+            (given by transform and viewport) changes by a factor of two.
+
+        lod_tolerance: float
+            Maximum distance (in pixels) between a path and its
+            simplification when lod is True
+
         caps : string
             'local', 'shared' or 'global'
 
@@ -80,6 +94,7 @@ class AggFastPathCollection(Collection):
         if transform is None:
             transform = NullTransform()
         self.transform = transform        
+        self._lod = PathLOD(lod_tolerance) if lod else None
         if fragment is None:
             fragment = glsl.get('collections/agg-fast-path.frag')
 
@@ -122,6 +137,27 @@ class AggFastPathCollection(Collection):
            Path antialias area
         """
 
+        if self._lod is not None:
+            self._lod.append(self, P, closed, itemsize, **kwargs)
+        else:
+            self._append(P, closed, itemsize, **kwargs)
+
+    def __delitem__(self, index):
+        """ x.__delitem__(y) <==> del x[y] """
+
+        Collection.__delitem__(self, index)
+        if self._lod is not None:
+            self._lod.delete(index)
+
+    def _vertex_index(self, n, closed=False):
+        """ Index of the first vertex baked from each of the n vertices of a
+        path """
+
+        return 2 * np.arange(1, n + 1)
+
+    def _append(self, P, closed=False, itemsize=None, **kwargs):
+        """ Append paths without level of detail bookkeeping """
+
         itemsize = int(itemsize or len(P))
         itemcount = len(P) // itemsize
 
@@ -131,7 +167,8 @@ class AggFastPathCollection(Collection):
             # Apply default values on vertices
             for name in self.vtype.names:
                 if name not in ['collection_index', 'prev', 'curr', 'next']:
-                    V[name][1:-2] = kwargs.get(name, self._defaults[name])
+                    V[name][:, 1:-2] = self._local(name, itemcount,
+                                                   itemsize, **kwargs)
             V['prev'][:, 2:-1] = P
             V['prev'][:, 1] = V['prev'][:, -2]
             V['curr'][:, 1:-2] = P
@@ -144,7 +181,8 @@ class AggFastPathCollection(Collection):
             # Apply default values on vertices
             for name in self.vtype.names:
                 if name not in ['collection_index', 'prev', 'curr', 'next']:
-                    V[name][1:-1] = kwargs.get(name, self._defaults[name])
+                    V[name][:, 1:-1] = self._local(name, itemcount,
+                                                   itemsize, **kwargs)
             V['prev'][:, 2:] = P
             V['prev'][:, 1] = V['prev'][:, 2]
             V['curr'][:, 1:-1] = P
@@ -176,6 +214,16 @@ class AggFastPathCollection(Collection):
         Collection.append(self, vertices=V, uniforms=U,
                           itemsize=2 * (itemsize + 2 + closed))
 
+    def _local(self, name, itemcount, itemsize, **kwargs):
+        """ Value of a vertex attribute, per path vertex if one value is
+        given for each vertex """
+
+        value = np.asarray(kwargs.get(name, self._defaults[name]))
+        shape = self.vtype[name].shape
+        if value.shape == (itemcount * itemsize,) + shape:
+            value = value.reshape((itemcount, itemsize) + shape)
+        return value
+
     def bake(self, P, key='curr', closed=False, itemsize=None):
         """
         Given a path P, return the baked vertices as they should be copied in
@@ -221,6 +269,8 @@ class AggFastPathCollection(Collection):
     def draw(self, mode="triangle_strip"):
         """ Draw collection """
 
+        if self._lod is not None:
+            self._lod.update(self)
         gl.glDepthMask(gl.GL_FALSE)
         Collection.draw(self, mode)
         gl.glDepthMask(gl.GL_TRUE)
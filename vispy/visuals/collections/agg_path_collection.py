@@ -15,6 +15,7 @@ from ... import glsl
 from ...gloo import gl
 from . collection import Collection
 from ..transforms import NullTransform
+from . path_lod import PathLOD
 
 
 class AggPathCollection(Collection):
@@ -27,8 +28,12 @@ class AggPathCollection(Collection):
     sparingly, mainly for thick paths where quality is critical.
     """
 
+    # vertex attributes computed from the paths
+    _path_fields = ('collection_index', 'p0', 'p1', 'p2', 'p3', 'uv')
+
     def __init__(self, user_dtype=None, transform=None,
-                 vertex=None, fragment=None, **kwargs):
+                 vertex=None, fragment=None, lod=False, lod_tolerance=0.5,
+                 **kwargs):
         """
         Initialize the collection.
 
@@ -48,6 +53,15 @@ class AggPathCollection(Collection):
         fragment: string
             Fragment  shader code
 
+        lod: bool
+            Whether to simplify paths according to the current zoom level.
+            Paths are re-uploaded at draw time, only when the size of a pixel
+            (given by transform and viewport) changes by a factor of two.
+
+        lod_tolerance: float
+            Maximum distance (in pixels) between a path and its
+            simplification when lod is True
+
         caps : string
             'local', 'shared' or 'global'
 
@@ -90,6 +104,7 @@ class AggPathCollection(Collection):
         if transform is None:
             transform = NullTransform()
         self.transform = transform        
+        self._lod = PathLOD(lod_tolerance) if lod else None
         if fragment is None:
             fragment = glsl.get('collections/agg-path.frag')
 
@@ -136,6 +151,27 @@ class AggPathCollection(Collection):
            Path antialias area
         """
 
+        if self._lod is not None:
+            self._lod.append(self, P, closed, itemsize, **kwargs)
+        else:
+            self._append(P, closed, itemsize, **kwargs)
+
+    def __delitem__(self, index):
+        """ x.__delitem__(y) <==> del x[y] """
+
+        Collection.__delitem__(self, index)
+        if self._lod is not None:
+            self._lod.delete(index)
+
+    def _vertex_index(self, n, closed=False):
+        """ Index of the first vertex of the segment starting at each of the
+        n vertices of a path (the last vertex uses the last segment) """
+
+        return 4 * np.minimum(np.arange(n), n - 2)
+
+    def _append(self, P, closed=False, itemsize=None, **kwargs):
+        """ Append paths without level of detail bookkeeping """
+
         itemsize = int(itemsize or len(P))
         itemcount = len(P) // itemsize
 
@@ -198,6 +234,8 @@ class AggPathCollection(Collection):
     def draw(self, mode="triangles"):
         """ Draw collection """
 
+        if self._lod is not None:
+            self._lod.update(self)
         gl.glDepthMask(0)
         Collection.draw(self, mode)
         gl.glDepthMask(1)
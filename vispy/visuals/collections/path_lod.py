@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+# -----------------------------------------------------------------------------
+"""
+Level of detail for path collections
+
+Paths are stored along with the Douglas-Peucker significance of their
+vertices, which encodes a whole pyramid of simplifications in a single array:
+level k keeps the vertices whose significance is above 2**k (data units).
+The level is chosen from the size of a pixel, as given by the collection
+transform and viewport, and paths are only re-uploaded when it changes.
+"""
+import numpy as np
+from ...geometry.simplify import path_significance
+
+
+class PathLOD(object):
+
+    """
+    Level of detail pyramid for the paths of a collection
+
+    Parameters
+    ----------
+
+    tolerance : float
+        Maximum distance, in pixels, between a path and its simplification.
+    """
+
+    def __init__(self, tolerance=0.5):
+        self.tolerance = float(tolerance)
+        self.level = None
+        self._paths = []
+        self._levels = None
+        self._bounds = None
+
+    def __len__(self):
+        return len(self._paths)
+
+    @property
+    def levels(self):
+        """ Range (min, max) of meaningful levels, None if all are equal """
+
+        return self._levels
+
+    def append(self, collection, P, closed=False, itemsize=None, **kwargs):
+        """
+        Record new paths and append them to the collection at the current
+        level of detail.
+
+        Parameters are the ones of the collection `append` method. Local
+        (per vertex) keyword arguments are simplified along with the paths.
+        """
+
+        P = np.asarray(P)
+        itemsize = int(itemsize or len(P))
+        itemcount = len(P) // itemsize
+        start = len(self._paths)
+
+        for i in range(itemcount):
+            Q = P[i * itemsize:(i + 1) * itemsize]
+            kw = dict()
+            local = dict()
+            for name, value in kwargs.items():
+                if name in collection.vtype.names:
+                    shape = collection.vtype[name].shape
+                    if np.shape(value) == (len(P),) + shape:
+                        local[name] = np.array(np.asarray(value)[
+                            i * itemsize:(i + 1) * itemsize])
+                        continue
+                elif collection.utype and name in collection.utype.names:
+                    shape = collection.utype[name].shape
+                    if np.shape(value) == (itemcount,) + shape:
+                        value = np.asarray(value)[i:i + 1]
+                kw[name] = value
+            sig = path_significance(Q, closed=closed)
+            self._paths.append((Q, sig, closed, kw, local))
+
+            # Update levels and bounds
+            finite = sig[np.isfinite(sig) & (sig > 0)]
+            if len(finite):
+                lo = int(np.floor(np.log2(finite.min()))) - 1
+                hi = int(np.ceil(np.log2(finite.max())))
+                if self._levels is not None:
+                    lo = min(lo, self._levels[0])
+                    hi = max(hi, self._levels[1])
+                self._levels = lo, hi
+            if len(Q):
+                bounds = np.array([Q.min(axis=0), Q.max(axis=0)])
+                if self._bounds is not None:
+                    bounds[0] = np.minimum(bounds[0], self._bounds[0])
+                    bounds[1] = np.maximum(bounds[1], self._bounds[1])
+                self._bounds = bounds
+
+        for Q, closed, kw in self.paths(start=start):
+            collection._append(Q, closed, **kw)
+
+    def paths(self, level=None, start=0):
+        """
+        Iterate over the (simplified) recorded paths.
+
+        Parameters
+        ----------
+
+        level : int | None
+            Level of detail, defaults to the current one. The level of a
+            collection that has not been drawn yet is None, meaning no
+            simplification.
+
+        start : int
+            Index of the first path.
+
+        Returns
+        -------
+
+        paths : generator
+            Generator of (vertices, closed, kwargs) tuples.
+        """
+
+        if level is None:
+            level = self.level
+        for Q, sig, closed, kw, local in self._paths[start:]:
+            keep = self._keep(sig, level)
+            kw = dict(kw)
+            for name, value in local.items():
+                kw[name] = value[keep]
+            yield Q[keep], closed, kw
+
+    def delete(self, index):
+        """
+        Forget the paths of deleted items.
+
+        Parameters
+        ----------
+
+        index : int | slice | Ellipsis
+            Index of the items, as in `del collection[index]`.
+        """
+
+        if index is Ellipsis:
+            index = slice(None)
+        del self._paths[index]
+
+    def _keep(self, sig, level):
+        """ Mask of the vertices kept at a level """
+
+        if level is None:
+            return np.ones(len(sig), bool)
+        return sig > 2.0 ** level
+
+    def _read_back(self, collection):
+        """
+        Record the per vertex attributes of the paths as they are in the
+        collection, since they may have been modified after being appended.
+        Vertices that are not displayed at the current level keep their
+        value.
+        """
+
+        names = [name for name in collection.vtype.names
+                 if name not in collection._path_fields]
+        if not names:
+            return
+        V = collection._vertices_list
+        for i, (Q, sig, closed, kw, local) in enumerate(self._paths):
+            keep = self._keep(sig, self.level)
+            index = V._items[i][0] + collection._vertex_index(keep.sum(),
+                                                               closed)
+            for name in names:
+                if name not in local:
+                    shape = collection.vtype[name].shape
+                    value = np.empty((len(Q),) + shape,
+                                     collection.vtype[name].base)
+                    value[...] = kw.pop(name, collection._defaults[name])
+                    local[name] = value
+                local[name][keep] = V.data[name][index]
+
+    def select(self, transform, viewport):
+        """
+        Return the level of detail matching the current pixel size.
+
+        Parameters
+        ----------
+
+        transform : Transform instance
+            Transform from data to normalized device coordinates.
+
+        viewport : 4-tuple
+            Viewport (x, y, width, height) in pixels.
+        """
+
+        if self._levels is None:
+            return None
+
+        # Size of a pixel (in data units) at the center of the paths
+        lo, hi = self._bounds
+        delta = max(float((hi - lo).max()) * 1e-3, 1e-12)
+        pos = np.zeros((3, 3))
+        pos[:, :len(lo)] = (lo + hi) / 2.
+        pos[1, 0] += delta
+        pos[2, 1] += delta
+        ndc = np.asarray(transform.map(pos), dtype=np.float64)
+        ndc = ndc[:, :2] / ndc[:, 3:4]
+        viewport = np.asarray(viewport, dtype=np.float64).ravel()
+        pixels = (ndc[1:] - ndc[0]) * viewport[2:4] / 2.
+        scale = np.sqrt((pixels ** 2).sum(axis=1)).max() / delta
+        if not np.isfinite(scale) or scale <= 0:
+            return self._levels[1]
+
+        level = int(np.floor(np.log2(self.tolerance / scale)))
+        return int(np.clip(level, *self._levels))
+
+    def update(self, collection):
+        """
+        Re-upload the paths of the collection if the level of detail
+        changed since last update.
+
+        Returns True if the collection has been updated.
+        """
+
+        viewport = collection._programs[0]['viewport']
+        level = self.select(collection.transform, viewport)
+        if level == self.level:
+            return False
+        self._read_back(collection)
+        self.level = level
+
+        # Uniforms are kept as is since items do not change
+        U = None
+        if collection.utype is not None:
+            U = collection._uniforms_list.data.copy()
+            del collection._uniforms_list[...]
+        del collection._vertices_list[...]
+        if collection.itype is not None:
+            del collection._indices_list[...]
+
+        for Q, closed, kw in self.paths():
+            collection._append(Q, closed, **kw)
+        if U is not None:
+            collection._uniforms_list.data[...] = U
+        return True
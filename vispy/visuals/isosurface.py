@@ -5,7 +5,7 @@
 from __future__ import division
 
 from .mesh import MeshVisual
-from ..geometry.isosurface import isosurface
+from ..geometry.isosurface import IncrementalIsosurface
 from ..color import Color
 
 
@@ -24,12 +24,20 @@ class IsosurfaceVisual(MeshVisual):
         The face colors to use.
     color : ndarray | None
         The color to use.
+    block_size : int
+        Size of the blocks of the volume whose minimum and maximum are
+        indexed, so that changing the level or updating a part of the data
+        only processes the blocks straddling the level or affected by the
+        update.
     **kwargs : dict
         Keyword arguments to pass to the mesh construction.
     """
     def __init__(self, data=None, level=None, vertex_colors=None,
-                 face_colors=None, color=(0.5, 0.5, 1, 1), **kwargs):
+                 face_colors=None, color=(0.5, 0.5, 1, 1), block_size=16,
+                 **kwargs):
         self._data = None
+        self._isosurface = None
+        self._block_size = block_size
         self._level = level
         self._vertex_colors = vertex_colors
         self._face_colors = face_colors
@@ -61,7 +69,7 @@ class IsosurfaceVisual(MeshVisual):
         self.update()
 
     def set_data(self, data=None, vertex_colors=None, face_colors=None,
-                 color=None):
+                 color=None, offset=None):
         """ Set the scalar array data
 
         Parameters
@@ -75,10 +83,24 @@ class IsosurfaceVisual(MeshVisual):
             Colors to use for each face.
         color : instance of Color
             The color to use.
+        offset : tuple | None
+            If given, *data* is a part of the volume starting at *offset*,
+            and the current data is updated. The volume is copied on
+            the first partial update, so that the array given earlier is
+            left unchanged. Only the affected parts of the isosurface are
+            then recomputed.
         """
         # We only change the internal variables if they are provided
         if data is not None:
-            self._data = data
+            if offset is None:
+                self._isosurface = IncrementalIsosurface(
+                    data, block_size=self._block_size)
+                self._data = self._isosurface.data
+            elif self._isosurface is None:
+                raise ValueError('a partial update requires data to be set')
+            else:
+                self._isosurface.set_data(data, offset)
+                self._data = self._isosurface.data
             self._recompute = True
         if vertex_colors is not None:
             self._vertex_colors = vertex_colors
@@ -97,8 +119,8 @@ class IsosurfaceVisual(MeshVisual):
             return False
 
         if self._recompute:
-            self._vertices_cache, self._faces_cache = isosurface(self._data,
-                                                                 self._level)
+            self._vertices_cache, self._faces_cache = \
+                self._isosurface.extract(self._level)
             self._recompute = False
             self._update_meshvisual = True
 
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+"""
+Min/max decimation of long lines at screen resolution.
+"""
+
+from __future__ import division
+
+import numpy as np
+
+
+class MinMaxPyramid(object):
+    """Multi-resolution min/max pyramid of a sampled curve y = f(x)
+
+    Level k of the pyramid stores the minimum and maximum of y over blocks
+    of 2**k consecutive samples. The envelope of any range of samples can
+    then be computed at screen resolution in a time proportional to the
+    number of pixel columns rather than to the number of samples, while
+    preserving the peaks of the curve.
+
+    Parameters
+    ----------
+    pos : array
+        Array of shape (N, 2) of samples, sorted by increasing x.
+    """
+    def __init__(self, pos):
+        pos = np.asarray(pos)
+        if pos.ndim != 2 or pos.shape[1] != 2:
+            raise ValueError('pos must be an array of shape (N, 2)')
+        x = pos[:, 0]
+        if len(x) > 1 and (np.diff(x) < 0).any():
+            raise ValueError('decimation requires x coordinates sorted in '
+                             'increasing order')
+        self._pos = pos
+        self._levels = []
+        ymin = ymax = pos[:, 1].astype(np.float32)
+        while len(ymin) > 1:
+            ymin = self._reduce(np.minimum, ymin)
+            ymax = self._reduce(np.maximum, ymax)
+            self._levels.append((ymin, ymax))
+
+    @staticmethod
+    def _reduce(ufunc, y):
+        """Reduce pairs of consecutive values (the last one may be alone)"""
+        m = len(y) // 2
+        out = np.empty(len(y) - m, dtype=y.dtype)
+        ufunc(y[0:2 * m:2], y[1:2 * m:2], out=out[:m])
+        if len(y) % 2:
+            out[-1] = y[-1]
+        return out
+
+    def __len__(self):
+        return len(self._pos)
+
+    def envelope(self, xmin, xmax, n):
+        """Return the min/max envelope of the curve over a range
+
+        Parameters
+        ----------
+        xmin, xmax : float
+            The range of x to cover.
+        n : int
+            The number of columns (typically pixels) spanning the range.
+
+        Returns
+        -------
+        pos : array
+            Array of shape (M, 2) to draw as a line strip. If the range
+            contains less than two samples per column, the samples are
+            returned as is. Otherwise each column holds two vertices, at
+            the minimum and maximum of y. The samples immediately outside
+            of the range are included so that the curve is not cut at the
+            edges.
+        """
+        x = self._pos[:, 0]
+        n = max(int(n), 1)
+        i0 = max(np.searchsorted(x, xmin, 'left') - 1, 0)
+        i1 = min(np.searchsorted(x, xmax, 'right') + 1, len(x))
+        count = i1 - i0
+        if count <= 2 * n or xmax <= xmin:
+            return np.ascontiguousarray(self._pos[i0:i1], dtype=np.float32)
+
+        # Level whose blocks are at most one column wide
+        k = min(int(np.log2(count / n)), len(self._levels))
+        ymin, ymax = self._levels[k - 1]
+        b0 = i0 >> k
+        b1 = ((i1 - 1) >> k) + 1
+        bx = x[np.arange(b0, b1) << k]
+        col = np.floor((bx - xmin) * (n / (xmax - xmin)))
+        np.clip(col, -1, n, out=col)
+
+        # Merge the blocks of each column (col is sorted)
+        starts = np.flatnonzero(np.diff(col, prepend=col[0] - 1))
+        out = np.empty((len(starts), 2, 2), dtype=np.float32)
+        out[:, :, 0] = bx[starts, np.newaxis]
+        out[:, 0, 1] = np.minimum.reduceat(ymin[b0:b1], starts)
+        out[:, 1, 1] = np.maximum.reduceat(ymax[b0:b1], starts)
+        return out.reshape(-1, 2)
@@ -17,6 +17,7 @@ from ..visual import Visual, CompoundVisual
 from ...util.profiler import Profiler
 
 from .dash_atlas import DashAtlas
+from .decimation import MinMaxPyramid
 
 
 vec2to4 = Function("""
@@ -88,9 +89,15 @@ class LineVisual(CompoundVisual):
         Enables or disables antialiasing.
         For method='gl', this specifies whether to use GL's line smoothing,
         which may be unavailable or inconsistent on some platforms.
+    decimate : bool
+        If True, only draw the min/max envelope of the line at screen
+        resolution (two vertices per pixel column within the visible range).
+        This requires 2D positions sorted by increasing x, a 'strip'
+        connection and a single color (or colormap).
     """
     def __init__(self, pos=None, color=(0.5, 0.5, 0.5, 1), width=1,
-                 connect='strip', method='gl', antialias=False):
+                 connect='strip', method='gl', antialias=False,
+                 decimate=False):
         self._line_visual = None
 
         self._changed = {'pos': False, 'color': False, 'width': False,
@@ -103,6 +110,10 @@ class LineVisual(CompoundVisual):
         self._bounds = None
         self._antialias = None
         self._method = 'none'
+        self._decimate = False
+        self._pyramid = None
+        self._decimated = None
+        self._decimation_range = None
 
         CompoundVisual.__init__(self, [])
 
@@ -112,6 +123,7 @@ class LineVisual(CompoundVisual):
                             connect=connect)
         self.antialias = antialias
         self.method = method
+        self.decimate = decimate
 
     @property
     def antialias(self):
@@ -147,6 +159,25 @@ class LineVisual(CompoundVisual):
         for k in self._changed:
             self._changed[k] = True
 
+    @property
+    def decimate(self):
+        """Whether to draw the min/max envelope of the line at screen
+        resolution"""
+        return self._decimate
+
+    @decimate.setter
+    def decimate(self, decimate):
+        self._decimate = bool(decimate)
+        self._update_pyramid()
+        self.update()
+
+    def _update_pyramid(self):
+        self._pyramid = None
+        self._decimation_range = None
+        if self._decimated is not None:
+            self._decimated = None
+            self._changed['pos'] = True
+
     def set_data(self, pos=None, color=None, width=None, connect=None):
         """Set the data used to draw this visual.
 
@@ -176,6 +207,7 @@ class LineVisual(CompoundVisual):
             self._bounds = None
             self._pos = pos
             self._changed['pos'] = True
+            self._update_pyramid()
 
         if color is not None:
             self._color = color
@@ -267,9 +299,57 @@ class LineVisual(CompoundVisual):
             else:
                 return (0, 0)
 
+    @property
+    def _render_pos(self):
+        """The vertices to draw, decimated if needed"""
+        return self._pos if self._decimated is None else self._decimated
+
+    def _get_pyramid(self):
+        """The pyramid of the line, built on first use, or None if the
+        vertices are not 2D or not sorted by x"""
+        if self._pyramid is None:
+            pos = np.asarray(self._pos)
+            if (pos.ndim == 2 and pos.shape[1] == 2 and
+                    not (np.diff(pos[:, 0]) < 0).any()):
+                self._pyramid = MinMaxPyramid(pos)
+            else:
+                self._pyramid = False
+        return self._pyramid or None
+
+    def _update_decimation(self, view):
+        """Compute the envelope of the visible part of the line, if it can
+        be decimated"""
+        color = self._color
+        decimate = (self._pos is not None and
+                    isinstance(self._connect, string_types) and
+                    self._connect == 'strip' and
+                    (isinstance(color, (string_types, Function)) or
+                     np.ndim(color) < 2 or len(color) == 1) and
+                    self._get_pyramid() is not None)
+        if not decimate:
+            if self._decimated is not None:
+                self._decimated = None
+                self._decimation_range = None
+                self._changed['pos'] = True
+            return
+
+        # Visible range of x and its width in framebuffer pixels
+        ndc = np.array([[-1, 0, 0, 1], [1, 0, 0, 1]], dtype=np.float64)
+        x = view.transforms.get_transform('render', 'visual').map(ndc)
+        x = x[:, 0] / x[:, 3]
+        px = view.transforms.get_transform('render', 'framebuffer').map(ndc)
+        key = (min(x), max(x), int(round(abs(px[1, 0] - px[0, 0]))))
+        if key == self._decimation_range:
+            return
+        self._decimation_range = key
+        self._decimated = self._pyramid.envelope(*key)
+        self._changed['pos'] = True
+
     def _prepare_draw(self, view):
         if self._width == 0:
             return False
+        if self._decimate:
+            self._update_decimation(view)
         CompoundVisual._prepare_draw(self, view)
 
 
@@ -312,7 +392,8 @@ class _GLLineVisual(Visual):
             if self._parent._pos is None:
                 return False
             # todo: does this result in unnecessary copies?
-            pos = np.ascontiguousarray(self._parent._pos.astype(np.float32))
+            pos = np.ascontiguousarray(
+                self._parent._render_pos.astype(np.float32))
             self._pos_vbo.set_data(pos)
             self._program.vert['position'] = self._pos_vbo
             if pos.shape[-1] == 2:
@@ -386,6 +467,9 @@ class _GLLineVisual(Visual):
         else:
             raise ValueError("Invalid line connect mode: %r" % self._connect)
 
+        for k in self._parent._changed:
+            self._parent._changed[k] = False
+
         prof('draw')
 
 
@@ -398,6 +482,11 @@ class _AggLineVisual(Visual):
                            ('alength', np.float32),
                            ('color', np.float32, (4,))])
 
+    _agg_texcoord = np.array([(-1, -1), (-1, +1), (+1, -1), (+1, +1)],
+                             dtype=np.float32)
+    # Number of segments baked at once
+    _agg_chunk = 4096
+
     VERTEX_SHADER = glsl.get('lines/agg.vert')
     FRAGMENT_SHADER = glsl.get('lines/agg.frag')
 
@@ -407,6 +496,8 @@ class _AggLineVisual(Visual):
 
         self._pos = None
         self._color = None
+        self._connect = None
+        self._V = None
 
         self._da = DashAtlas()
         dash_index, dash_period = self._da['solid']
@@ -434,29 +525,60 @@ class _AggLineVisual(Visual):
         vert['px_ndc_transform'] = px_ndc
 
     def _prepare_draw(self, view):
-        bake = False
-        if self._parent._changed['pos']:
-            if self._parent._pos is None:
-                return False
-            # todo: does this result in unnecessary copies?
-            self._pos = np.ascontiguousarray(
-                self._parent._pos.astype(np.float32))
-            bake = True
+        parent = self._parent
+        changed = parent._changed
+        if changed['connect']:
+            connect = parent._interpret_connect()
+            if isinstance(connect, string_types) and \
+                    connect not in ('strip', 'segments'):
+                raise ValueError("Invalid line connect mode: %r" % connect)
+            self._connect = connect
 
-        if self._parent._changed['color']:
-            color, cmap = self._parent._interpret_color()
+        if changed['color']:
+            color, cmap = parent._interpret_color()
             self._color = color
-            bake = True
 
-        if self._parent._changed['connect']:
-            if self._parent._connect not in [None, 'strip']:
-                raise NotImplementedError("Only 'strip' connection mode "
-                                          "allowed for agg-method lines.")
+        recolor = changed['color']
+        if changed['pos'] or changed['connect']:
+            if parent._pos is None:
+                return False
+            pos = np.ascontiguousarray(parent._render_pos, dtype=np.float32)
+            pos = pos.reshape(-1, pos.shape[-1])[:, :2]
+
+            # Only re-bake the tail of strips whose start did not change
+            start = 0
+            if (self._V is not None and not changed['connect'] and
+                    isinstance(self._connect, string_types) and
+                    self._connect == 'strip' and
+                    len(pos) >= len(self._pos) > 1):
+                m = len(self._pos)
+                diff = np.flatnonzero((pos[:m] != self._pos).any(axis=1))
+                start = diff[0] if len(diff) else m
+            self._pos = pos
 
-        if bake:
-            V, idxs = self._agg_bake(self._pos, self._color)
-            self._vbo.set_data(V)
-            self._index_buffer.set_data(idxs)
+            if start == 0:
+                size = None if self._V is None else self._V.size
+                self._V, idxs = self._agg_bake(pos, self._color,
+                                               connect=self._connect,
+                                               out=self._V)
+                if self._V.size != size:
+                    self._index_buffer.set_data(idxs)
+            elif start < len(pos):
+                self._V, idxs = self._agg_bake_tail(self._V, pos,
+                                                    self._color, start)
+                if idxs is not None:
+                    self._index_buffer.set_data(idxs)
+            recolor = recolor and start != 0
+            self._vbo.set_data(self._V)
+
+        if recolor and self._V is not None:
+            seg = self._segment_indices(len(self._pos), self._connect)
+            self._set_color(self._V, self._color, seg)
+            self._vbo.set_data(self._V)
+        if self._V is None:
+            return False
+        for k in changed:
+            changed[k] = False
 
         # self._program.prepare()
         self.shared_program.bind(self._vbo)
@@ -468,83 +590,185 @@ class _AggLineVisual(Visual):
             self.shared_program[n] = v
         self.shared_program['u_dash_atlas'] = self._dash_atlas
 
+    @staticmethod
+    def _segment_indices(n, connect=None, closed=False):
+        """Return the (start, end) vertex indices of each line segment"""
+        if connect is None or (isinstance(connect, string_types) and
+                               connect == 'strip'):
+            seg = np.empty((max(n - 1, 0) + int(closed), 2), dtype=np.intp)
+            seg[:n - 1, 0] = np.arange(n - 1)
+            seg[:n - 1, 1] = seg[:n - 1, 0] + 1
+            if closed:
+                seg[-1] = n - 1, 0
+            return seg
+        elif isinstance(connect, string_types) and connect == 'segments':
+            return np.arange(n - n % 2, dtype=np.intp).reshape(-1, 2)
+        return np.asarray(connect, dtype=np.intp).reshape(-1, 2)
+
     @classmethod
-    def _agg_bake(cls, vertices, color, closed=False):
+    def _agg_bake(cls, vertices, color, closed=False, connect=None,
+                  out=None):
         """
         Bake a list of 2D vertices for rendering them as thick line. Each line
         segment must have its own vertices because of antialias (this means no
         vertex sharing between two adjacent line segments).
-        """
 
-        n = len(vertices)
-        P = np.array(vertices).reshape(n, 2).astype(float)
-        idx = np.arange(n)  # used to eventually tile the color array
-
-        dx, dy = P[0] - P[-1]
-        d = np.sqrt(dx*dx+dy*dy)
-
-        # If closed, make sure first vertex = last vertex (+/- epsilon=1e-10)
-        if closed and d > 1e-10:
-            P = np.append(P, P[0]).reshape(n+1, 2)
-            idx = np.append(idx, idx[-1])
-            n += 1
-
-        V = np.zeros(len(P), dtype=cls._agg_vtype)
-        V['a_position'] = P
-
-        # Tangents & norms
-        T = P[1:] - P[:-1]
-
-        N = np.sqrt(T[:, 0]**2 + T[:, 1]**2)
-        # T /= N.reshape(len(T),1)
-        V['a_tangents'][+1:, :2] = T
-        V['a_tangents'][0, :2] = T[-1] if closed else T[0]
-        V['a_tangents'][:-1, 2:] = T
-        V['a_tangents'][-1, 2:] = T[0] if closed else T[-1]
-
-        # Angles
-        T1 = V['a_tangents'][:, :2]
-        T2 = V['a_tangents'][:, 2:]
-        A = np.arctan2(T1[:, 0]*T2[:, 1]-T1[:, 1]*T2[:, 0],
-                       T1[:, 0]*T2[:, 0]+T1[:, 1]*T2[:, 1])
-        V['a_angles'][:-1, 0] = A[:-1]
-        V['a_angles'][:-1, 1] = A[+1:]
-
-        # Segment
-        L = np.cumsum(N)
-        V['a_segment'][+1:, 0] = L
-        V['a_segment'][:-1, 1] = L
-        # V['a_lengths'][:,2] = L[-1]
-
-        # Step 1: A -- B -- C  =>  A -- B, B' -- C
-        V = np.repeat(V, 2, axis=0)[1:-1]
-        V['a_segment'][1:] = V['a_segment'][:-1]
-        V['a_angles'][1:] = V['a_angles'][:-1]
-        V['a_texcoord'][0::2] = -1
-        V['a_texcoord'][1::2] = +1
-        idx = np.repeat(idx, 2)[1:-1]
-
-        # Step 2: A -- B, B' -- C  -> A0/A1 -- B0/B1, B'0/B'1 -- C0/C1
-        V = np.repeat(V, 2, axis=0)
-        V['a_texcoord'][0::2, 1] = -1
-        V['a_texcoord'][1::2, 1] = +1
-        idx = np.repeat(idx, 2)
-
-        idxs = np.resize(np.array([0, 1, 2, 1, 2, 3], dtype=np.uint32),
-                         (n-1)*(2*3))
-        idxs += np.repeat(4*np.arange(n-1, dtype=np.uint32), 6)
-
-        # Length
-        V['alength'] = L[-1] * np.ones(len(V))
-
-        # Color
-        if color.ndim == 1:
-            color = np.tile(color, (len(V), 1))
-        elif color.ndim == 2 and len(color) == n:
-            color = color[idx]
+        Segments are given by *connect* (see LineVisual) and are joined
+        whenever a segment starts where the previous one ends, so that
+        several disjoint polylines can be baked at once. If given, *out* is
+        used to store the result when it has the right size.
+        """
+        P = np.asarray(vertices, dtype=np.float32).reshape(-1, 2)
+        n = len(P)
+        # A closed strip whose last vertex is the first one needs no
+        # closing segment
+        closing = False
+        if closed:
+            dx, dy = P[0] - P[-1]
+            closing = np.sqrt(dx * dx + dy * dy) > 1e-10
+        seg = cls._segment_indices(n, connect, closing)
+        if out is not None and out.size == 4 * len(seg):
+            V = out.reshape(-1, 4)
         else:
-            raise ValueError('Color length %s does not match number of '
-                             'vertices %s' % (len(color), n))
-        V['color'] = color
+            V = np.empty((len(seg), 4), dtype=cls._agg_vtype)
+        cls._bake_segments(V, P, seg, closed, color)
+        return V.reshape(-1), cls._agg_indices(len(seg))
+
+    @staticmethod
+    def _agg_indices(m):
+        """Indices of the two triangles of each of the m baked segments"""
+        idxs = np.empty((m, 6), dtype=np.uint32)
+        idxs[:] = 4 * np.arange(m, dtype=np.uint32)[:, np.newaxis]
+        idxs += np.array([0, 1, 2, 1, 2, 3], dtype=np.uint32)
+        return idxs.reshape(-1)
+
+    @classmethod
+    def _agg_bake_tail(cls, V, vertices, color, start):
+        """
+        Update vertices baked as an open strip by `_agg_bake` when only the
+        vertices from *start* on changed or have been appended. Returns the
+        updated array (which is *V* itself if the number of vertices did
+        not change) and the new indices (None if unchanged).
+        """
+        P = np.asarray(vertices, dtype=np.float32).reshape(-1, 2)
+        m = max(len(P) - 1, 0)
+        V = V.reshape(-1, 4)
+        idxs = None
+        if len(V) != m:
+            old, V = V, np.empty((m, 4), dtype=cls._agg_vtype)
+            k = min(len(old), m)
+            V[:k].view(np.float32)[...] = old[:k].view(np.float32)
+            idxs = cls._agg_indices(m)
+
+        # A vertex change affects the tangents and angles of the segments
+        # up to two segments before it. One more segment is baked to get
+        # the incoming tangent of the first one, and then discarded.
+        first = max(start - 2, 0)
+        ref = max(first - 1, 0)
+        seg = cls._segment_indices(len(P) - ref)
+        W = np.empty((len(seg), 4), dtype=cls._agg_vtype)
+        cls._bake_segments(W, P[ref:], seg, False,
+                           color if color.ndim == 1 else color[ref:])
+        F = W.view(np.float32).reshape(len(W), 4, -1)
+        o = W.dtype.fields['a_segment'][1] // 4
+        F[..., o:o + 2] += V['a_segment'][ref, 0, 0]
+        V[first:].view(np.float32)[...] = W[first - ref:].view(np.float32)
+
+        # The total length is the only attribute of the head that changes
+        F = V.view(np.float32).reshape(m, 4, -1)
+        o = V.dtype.fields['alength'][1] // 4
+        F[:, :, o] = V['a_segment'][-1, 0, 1] if m else 0.
+        return V.reshape(-1), idxs
 
-        return V, idxs
+    @classmethod
+    def _bake_segments(cls, V, P, seg, cyclic, color):
+        """
+        Fill the (M, 4) vertex array V with the attributes of the M segments
+        (start, end) given by seg. Vertices are written chunk by chunk, each
+        one from a (start, end) pair of records, so that the (large) output
+        array is written in a single pass.
+        """
+        m = len(seg)
+        if m == 0:
+            return
+        cls._check_color(color, seg)
+        s, e = seg[:, 0], seg[:, 1]
+        T = P[e] - P[s]
+        N = np.sqrt(T[:, 0] * T[:, 0] + T[:, 1] * T[:, 1])
+
+        # Tangents of the previous and next segments, if joined
+        joined = np.zeros(m, dtype=bool)
+        joined[1:] = s[1:] == e[:-1]
+        joined[0] = cyclic
+        prev = np.arange(m)
+        prev[joined] -= 1
+        nxt = np.arange(m)
+        nxt[np.roll(joined, -1)] += 1
+        nxt[nxt == m] = 0
+        Tp = T[prev]
+        Tn = T[nxt]
+
+        # Join angles at the start and end of each segment
+        a_start = np.arctan2(Tp[:, 0] * T[:, 1] - Tp[:, 1] * T[:, 0],
+                             Tp[:, 0] * T[:, 0] + Tp[:, 1] * T[:, 1])
+        a_end = np.arctan2(T[:, 0] * Tn[:, 1] - T[:, 1] * Tn[:, 0],
+                           T[:, 0] * Tn[:, 0] + T[:, 1] * Tn[:, 1])
+
+        # Curvilinear coordinates along each polyline
+        first = np.flatnonzero(~joined)
+        if len(first) == 0 or first[0] != 0:
+            first = np.concatenate([[0], first])
+        poly = np.repeat(np.arange(len(first)), np.diff(np.append(first, m)))
+        end = np.cumsum(N, dtype=np.float64)
+        end -= (end[first] - N[first])[poly]
+        total = end[np.append(first[1:], m) - 1][poly]
+
+        F = V.view(np.float32).reshape(m, 4, -1)
+        off = dict((k, v[1] // 4) for k, v in V.dtype.fields.items())
+        p, t, g, a, c = (off['a_position'], off['a_tangents'],
+                         off['a_segment'], off['a_angles'], off['color'])
+        for i in range(0, m, cls._agg_chunk):
+            j = slice(i, i + cls._agg_chunk)
+            # Start and end vertices are built in cache, then copied
+            R = np.empty((len(T[j]), 4, F.shape[-1]), dtype=np.float32)
+            R[:, :2, p:p + 2] = P[s[j], np.newaxis]
+            R[:, 2:, p:p + 2] = P[e[j], np.newaxis]
+            R[:, :2, t:t + 2] = Tp[j, np.newaxis]
+            R[:, :2, t + 2:t + 4] = T[j, np.newaxis]
+            R[:, 2:, t:t + 2] = T[j, np.newaxis]
+            R[:, 2:, t + 2:t + 4] = Tn[j, np.newaxis]
+            R[:, :, g] = (end[j] - N[j])[:, np.newaxis]
+            R[:, :, g + 1] = end[j, np.newaxis]
+            R[:, :, a] = a_start[j, np.newaxis]
+            R[:, :, a + 1] = a_end[j, np.newaxis]
+            R[:, :, off['alength']] = total[j, np.newaxis]
+            R[:, :, off['a_texcoord']:off['a_texcoord'] + 2] = \
+                cls._agg_texcoord
+            if color.ndim == 1:
+                R[:, :, c:c + 4] = color
+            else:
+                R[:, :2, c:c + 4] = color[s[j], np.newaxis]
+                R[:, 2:, c:c + 4] = color[e[j], np.newaxis]
+            F[j] = R
+
+    @classmethod
+    def _set_color(cls, V, color, seg):
+        """Set the color of the baked vertices V in place"""
+        cls._check_color(color, seg)
+        F = V.view(np.float32).reshape(len(seg), 4, -1)
+        c = V.dtype.fields['color'][1] // 4
+        for i in range(0, len(seg), cls._agg_chunk):
+            j = slice(i, i + cls._agg_chunk)
+            if color.ndim == 1:
+                F[j, :, c:c + 4] = color
+            else:
+                F[j, :2, c:c + 4] = color[seg[j, 0], np.newaxis]
+                F[j, 2:, c:c + 4] = color[seg[j, 1], np.newaxis]
+
+    @staticmethod
+    def _check_color(color, seg):
+        if color.ndim == 2 and (len(seg) == 0 or len(color) > seg.max()):
+            return
+        elif color.ndim != 1:
+            raise ValueError('Color length %s does not match number of '
+                             'vertices %s' % (len(color), seg.max() + 1))
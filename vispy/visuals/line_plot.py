@@ -36,6 +36,9 @@ class LinePlotVisual(CompoundVisual):
         Edge width of the marker.
     connect : str | array
         See LineVisual.
+    decimate : bool
+        If True, the line (but not the markers) is drawn as its min/max
+        envelope at screen resolution. See LineVisual.
     **kwargs : keyword arguments
         Argements to pass to the super class.
 
@@ -59,10 +62,11 @@ class LinePlotVisual(CompoundVisual):
 
     def __init__(self, data=None, color='k', symbol=None, line_kind='-',
                  width=1., marker_size=10., edge_color='k', face_color='w',
-                 edge_width=1., connect='strip'):
+                 edge_width=1., connect='strip', decimate=False):
         if line_kind != '-':
             raise ValueError('Only solid lines currently supported')
-        self._line = LineVisual(method='gl', antialias=False)
+        self._line = LineVisual(method='gl', antialias=False,
+                                decimate=decimate)
         self._markers = MarkersVisual()
         self._kwargs = {}
         CompoundVisual.__init__(self, [self._line, self._markers])
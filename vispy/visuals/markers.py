@@ -7,10 +7,14 @@
 Marker Visual and shader definitions.
 """
 
+from collections import OrderedDict
+
 import numpy as np
 
 from ..color import ColorArray
-from ..gloo import VertexBuffer, _check_valid
+from ..ext.six import string_types
+from ..gloo import TextureAtlas, VertexBuffer, _check_valid
+from ..util.ranges import _ranges
 from .shaders import Function, Variable
 from .visual import Visual
 
@@ -62,6 +66,16 @@ void main()
     float size = $v_size + 4.*(edgewidth + 1.5*v_antialias);
     // factor 6 for acute edge angles that need room as for star marker
 
+    // Image symbols are drawn as they are, tinted by the face color
+    vec4 texel = $sprite(gl_PointCoord, size);
+    if (texel.a >= 0.)
+    {
+        if (texel.a <= 0.)
+            discard;
+        gl_FragColor = texel * v_bg_color;
+        return;
+    }
+
     // The marker function needs to be linked with this shader
     float r = $marker(gl_PointCoord, size);
 
@@ -132,9 +146,9 @@ float disc(vec2 pointcoord, float size)
 
 
 arrow = """
-const float sqrt2 = sqrt(2.);
 float rect(vec2 pointcoord, float size)
 {
+    const float sqrt2 = sqrt(2.);
     float half_size = $v_size/2.;
     float ady = abs(pointcoord.y -.5)*size;
     float dx = (pointcoord.x -.5)*size;
@@ -157,9 +171,9 @@ float ring(vec2 pointcoord, float size)
 """
 
 clobber = """
-const float sqrt3 = sqrt(3.);
 float clobber(vec2 pointcoord, float size)
 {
+    const float sqrt3 = sqrt(3.);
     const float PI = 3.14159265358979323846264;
     const float t1 = -PI/2;
     float circle_radius = 0.32 * $v_size;
@@ -255,9 +269,9 @@ float cross(vec2 pointcoord, float size)
 
 
 tailed_arrow = """
-const float sqrt2 = sqrt(2.);
 float rect(vec2 pointcoord, float size)
 {
+    const float sqrt2 = sqrt(2.);
     float half_size = $v_size/2.;
     float ady = abs(pointcoord.y -.5)*size;
     float dx = (pointcoord.x -.5)*size;
@@ -481,21 +495,241 @@ _marker_dict = {
 }
 marker_types = tuple(sorted(list(_marker_dict.keys())))
 
+# The built-in symbols, in the order of their index in per-point symbols
+_builtin_symbols = ('disc', 'arrow', 'ring', 'clobber', 'square', 'diamond',
+                    'vbar', 'hbar', 'cross', 'tailed_arrow', 'x',
+                    'triangle_up', 'triangle_down', 'star')
+_builtin_index = dict((name, _builtin_symbols.index(canonical))
+                      for name, code in _marker_dict.items()
+                      for canonical in _builtin_symbols
+                      if _marker_dict[canonical] is code)
+
+no_sprite = """
+vec4 no_sprite(vec2 pointcoord, float size)
+{
+    return vec4(-1.);
+}
+"""
+
+# %s are replaced by the index of the first image and by the code setting
+# the region of the image in the atlas and its size relative to the marker
+sprite = """
+vec4 sprite(vec2 pointcoord, float size)
+{
+    float symbol = $symbol;
+    if (symbol < %s)
+        return vec4(-1.);
+    vec4 region;
+    vec2 aspect;
+%s
+    vec2 coord = (pointcoord - 0.5) * size / ($v_size * aspect) + 0.5;
+    if (any(lessThan(coord, vec2(0.))) || any(greaterThan(coord, vec2(1.))))
+        return vec4(0.);
+    return texture2D($atlas, region.xy + coord * region.zw);
+}
+"""
+
+
+# The attributes of the markers and their number of components, each has its
+# own buffer so that it can be updated alone
+_attributes = (('a_position', 3), ('a_fg_color', 4), ('a_bg_color', 4),
+               ('a_size', 1), ('a_edgewidth', 1))
+
+
+def _span(index, n):
+    """The range (start, stop) of the items selected by an index"""
+    if isinstance(index, slice):
+        items = range(*index.indices(n))
+        if not items:
+            return 0, 0
+        return min(items[0], items[-1]), max(items[0], items[-1]) + 1
+    index = np.asarray(index)
+    if index.dtype == bool:
+        index = np.flatnonzero(index)
+    if index.size == 0:
+        return 0, 0
+    index = np.where(index < 0, index + n, index)
+    return int(index.min()), int(index.max()) + 1
+
+
+def _inside_polygon(points, polygon):
+    """Whether points are inside a polygon (with the even-odd rule)
+
+    Parameters
+    ----------
+    points : array
+        The (N, 2) points.
+    polygon : array
+        The (M, 2) vertices of the polygon.
+    """
+    # each edge only flips the points at the height it spans
+    order = np.argsort(points[:, 1])
+    x, y = points[order].T
+    inside = np.zeros(len(points), bool)
+    for (x0, y0), (x1, y1) in zip(polygon.tolist(),
+                                  np.roll(polygon, -1, 0).tolist()):
+        start, stop = np.searchsorted(y, (min(y0, y1), max(y0, y1)))
+        if start < stop:
+            cross = x0 + (y[start:stop] - y0) * ((x1 - x0) / (y1 - y0))
+            inside[start:stop] ^= x[start:stop] < cross
+    result = np.empty(len(points), bool)
+    result[order] = inside
+    return result
+
+
+class _PointGrid(object):
+    """Uniform grid of 2D points, to find the points inside polygons
+
+    The cells that a polygon does not cross are selected or rejected as a
+    whole, so that only the points of the cells on its edges are tested.
+
+    Parameters
+    ----------
+    pos : array
+        The (N, 2) positions, NaN for the points that are never selected.
+    """
+
+    def __init__(self, pos):
+        self._n = len(pos)
+        ids = np.flatnonzero(np.isfinite(pos).all(axis=1))
+        pos = pos[ids]
+        if len(pos):
+            self._lo = pos.min(axis=0)
+            size = np.maximum(pos.max(axis=0) - self._lo, 1e-6)
+        else:
+            self._lo, size = np.zeros(2), np.ones(2)
+        # about 8 points per cell
+        n_cells = min(max(len(pos) // 8, 1), 2 ** 20)
+        nx = int(np.clip(np.sqrt(n_cells * size[0] / size[1]), 1, n_cells))
+        self._shape = np.array([nx, max(n_cells // nx, 1)])
+        self._cell = size / self._shape
+        cells = self._cells(pos)
+        cells = cells[:, 1] * self._shape[0] + cells[:, 0]
+        # radix sort on 16-bit digits, that NumPy sorts in linear time
+        order = np.argsort((cells & 0xffff).astype(np.uint16), kind='stable')
+        if np.prod(self._shape) > 2 ** 16:
+            order = order[np.argsort((cells[order] >> 16).astype(np.uint16),
+                                     kind='stable')]
+        self._ids = ids[order]
+        self._pos = pos[order]
+        self._counts = np.bincount(cells, minlength=np.prod(self._shape))
+        self._starts = np.cumsum(self._counts) - self._counts
+
+    def _cells(self, pos):
+        """The (x, y) cells of positions, clipped to the grid"""
+        cells = np.floor((pos - self._lo) / self._cell).astype(np.intp)
+        return np.clip(cells, 0, self._shape - 1)
+
+    def select(self, polygon):
+        """The sorted indices of the points inside a polygon"""
+        polygon = np.asarray(polygon, np.float64)
+        selected = np.zeros(self._n, bool)
+        top = self._lo + self._cell * self._shape
+        if (polygon.max(axis=0) < self._lo).any() or \
+                (polygon.min(axis=0) > top).any():
+            return np.flatnonzero(selected)
+        first, last = self._cells(np.array([polygon.min(axis=0),
+                                            polygon.max(axis=0)]))
+        shape = last - first + 1
+
+        # the cells crossed by the edges are within one cell of points
+        # along the edges spaced by less than half a cell (only the parts
+        # of the edges over the grid are sampled)
+        edges = np.roll(polygon, -1, 0) - polygon
+        start, stop = np.zeros(len(polygon)), np.ones(len(polygon))
+        for axis, lo, hi in zip(range(2), self._lo - self._cell,
+                                top + self._cell):
+            p, d = polygon[:, axis], edges[:, axis]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t_lo, t_hi = (lo - p) / d, (hi - p) / d
+            moving = d != 0
+            start = np.where(moving, np.maximum(start, np.minimum(t_lo, t_hi)),
+                             start)
+            stop = np.where(moving, np.minimum(stop, np.maximum(t_lo, t_hi)),
+                            stop)
+            stop[~moving & ((p < lo) | (p > hi))] = -1
+        length = np.abs(edges * (stop - start)[:, np.newaxis] / self._cell)
+        n_steps = np.ceil(2 * length.max(axis=1)).astype(np.intp) + 1
+        n_steps[start > stop] = 0
+        edge = np.repeat(np.arange(len(polygon)), n_steps)
+        step = np.arange(len(edge)) - np.repeat(np.cumsum(n_steps) - n_steps,
+                                                n_steps)
+        t = start[edge] + (stop - start)[edge] * (
+            step / np.maximum(n_steps - 1, 1)[edge])
+        samples = polygon[edge] + edges[edge] * t[:, np.newaxis]
+        samples = self._cells(samples) - first
+        crossed = np.zeros(shape[::-1] + 2, bool)
+        for dx in range(3):
+            for dy in range(3):
+                crossed[np.clip(samples[:, 1] + dy, 0, shape[1] + 1),
+                        np.clip(samples[:, 0] + dx, 0, shape[0] + 1)] = True
+        crossed = crossed[1:-1, 1:-1]
+
+        # the other cells are inside if their center is
+        cy, cx = np.nonzero(~crossed)
+        centers = (np.column_stack([cx, cy]) + first + 0.5) * self._cell
+        inside = _inside_polygon(centers + self._lo, polygon)
+        cells = (cy[inside] + first[1]) * self._shape[0] + cx[inside] + \
+            first[0]
+        selected[self._ids[_ranges(self._starts[cells],
+                                   self._counts[cells])]] = True
+
+        cy, cx = np.nonzero(crossed)
+        cells = (cy + first[1]) * self._shape[0] + cx + first[0]
+        candidates = _ranges(self._starts[cells], self._counts[cells])
+        inside = _inside_polygon(self._pos[candidates], polygon)
+        selected[self._ids[candidates[inside]]] = True
+        return np.flatnonzero(selected)
+
+
+def _dispatch(cases, indent='    '):
+    """GLSL code running the case of the index `symbol`, as a binary search
+
+    Parameters
+    ----------
+    cases : list
+        The (index, code) of the cases, sorted by index.
+    indent : str
+        The indentation of the code.
+    """
+    if len(cases) == 1:
+        return indent + cases[0][1]
+    mid = len(cases) // 2
+    return '\n'.join((indent + 'if (symbol < %.1f) {' % (cases[mid][0] - 0.5),
+                      _dispatch(cases[:mid], indent + '    '),
+                      indent + '} else {',
+                      _dispatch(cases[mid:], indent + '    '),
+                      indent + '}'))
+
 
 class MarkersVisual(Visual):
     """ Visual displaying marker symbols.
+
+    Each marker can have its own symbol, either a built-in shape or an image
+    added with `add_symbol`. The images are packed in a texture atlas, so
+    that markers with different symbols are drawn at once.
     """
     def __init__(self, **kwargs):
-        self._vbo = VertexBuffer()
+        self._vbos = dict((name, VertexBuffer()) for name, _ in _attributes)
+        self._symbol_vbo = VertexBuffer()
         self._v_size_var = Variable('varying float v_size')
+        self._v_symbol_var = Variable('varying float v_symbol')
         self._symbol = None
         self._marker_fun = None
+        self._sprite_fun = Function(no_sprite)
+        self._functions_key = None
+        self._images = OrderedDict()
+        self._images_version = 0
+        self._atlas = None
         self._data = None
+        self._canvas_tr = None
+        self._point_grid = None
         self.antialias = 1
         self.scaling = False
         Visual.__init__(self, vcode=vert, fcode=frag)
         self.shared_program.vert['v_size'] = self._v_size_var
         self.shared_program.frag['v_size'] = self._v_size_var
+        self.shared_program.frag['sprite'] = self._sprite_fun
         self.set_gl_state(depth_test=True, blend=True,
                           blend_func=('src_alpha', 'one_minus_src_alpha'))
         self._draw_mode = 'points'
@@ -512,8 +746,9 @@ class MarkersVisual(Visual):
         ----------
         pos : array
             The array of locations to display each symbol.
-        symbol : str
-            The style of symbol to draw (see Notes).
+        symbol : str | array
+            The style of symbol to draw (see Notes), or the symbol of each
+            marker, as names or as indices in `symbols`.
         size : float or array
             The symbol size in px.
         edge_width : float | None
@@ -532,7 +767,7 @@ class MarkersVisual(Visual):
         -----
         Allowed style strings are: disc, arrow, ring, clobber, square, diamond,
         vbar, hbar, cross, tailed_arrow, x, triangle_up, triangle_down,
-        and star.
+        and star, and the names of the images added with `add_symbol`.
         """
         if (edge_width is not None) + (edge_width_rel is not None) != 1:
             raise ValueError('exactly one of edge_width and edge_width_rel '
@@ -543,7 +778,10 @@ class MarkersVisual(Visual):
         else:
             if edge_width_rel < 0:
                 raise ValueError('edge_width_rel cannot be negative')
-        self.symbol = symbol
+        if pos is not None:
+            assert (isinstance(pos, np.ndarray) and
+                    pos.ndim == 2 and pos.shape[1] in (2, 3))
+        self._set_symbol(symbol, len(pos) if pos is not None else None)
         self.scaling = scaling
 
         edge_color = ColorArray(edge_color).rgba
@@ -555,44 +793,265 @@ class MarkersVisual(Visual):
             face_color = face_color[0]
 
         if pos is not None:
-            assert (isinstance(pos, np.ndarray) and
-                    pos.ndim == 2 and pos.shape[1] in (2, 3))
-
             n = len(pos)
-            data = np.zeros(n, dtype=[('a_position', np.float32, 3),
-                                      ('a_fg_color', np.float32, 4),
-                                      ('a_bg_color', np.float32, 4),
-                                      ('a_size', np.float32),
-                                      ('a_edgewidth', np.float32)])
-            data['a_fg_color'] = edge_color
-            data['a_bg_color'] = face_color
+            data = dict((name, np.zeros((n, n_comp) if n_comp > 1 else n,
+                                        np.float32))
+                        for name, n_comp in _attributes)
+            data['a_fg_color'][:] = edge_color
+            data['a_bg_color'][:] = face_color
             if edge_width is not None:
-                data['a_edgewidth'] = edge_width
+                data['a_edgewidth'][:] = edge_width
             else:
-                data['a_edgewidth'] = size*edge_width_rel
+                data['a_edgewidth'][:] = size*edge_width_rel
             data['a_position'][:, :pos.shape[1]] = pos
-            data['a_size'] = size
+            data['a_size'][:] = size
             self.shared_program['u_antialias'] = self.antialias  # XXX make prop
             self._data = data
+            self._positions_changed()
             if self._symbol is not None:
                 # If we have no symbol set, we skip drawing (_prepare_draw
                 # returns False). This causes the GLIR queue to not flush,
                 # and thus the GLIR queue fills with VBO DATA commands, resulting
                 # in a "memory leak". Thus only set the VertexBuffer data if we
                 # are actually going to draw.
-                self._vbo.set_data(data)
-                self.shared_program.bind(self._vbo)
+                self._upload()
+
+        self.update()
+
+    def set_pos(self, pos, index=None):
+        """Set the position of the markers
+
+        Parameters
+        ----------
+        pos : array
+            The (N, 2 | 3) positions.
+        index : slice | array | None
+            The markers to update (all if None). Only the range of the
+            buffer from the first to the last of them is uploaded.
+        """
+        pos = np.asarray(pos)
+        self._set_attribute('a_position', pos, index, pos.shape[-1])
+        self._positions_changed()
 
+    def _positions_changed(self):
+        self._bounds_changed()
+        self._point_grid = None
+
+    def select(self, polygon):
+        """Select the markers whose center is inside a region of the canvas
+
+        The positions of the markers in the canvas are indexed on the first
+        call, and again only when the markers move or the view changes, so
+        that selecting while dragging a box or a lasso is fast.
+
+        Parameters
+        ----------
+        polygon : array
+            The (M, 2) vertices of a polygon (e.g. a lasso), or the two
+            opposite corners of a box, in canvas coordinates (as the
+            positions of mouse events).
+
+        Returns
+        -------
+        indices : array
+            The sorted indices of the selected markers.
+        """
+        polygon = np.asarray(polygon, np.float64)
+        if polygon.ndim != 2 or polygon.shape[1] != 2 or len(polygon) < 2:
+            raise ValueError('polygon must be a (M, 2) array with M >= 2, got '
+                             'shape %s' % (polygon.shape,))
+        if len(polygon) == 2:
+            (x0, y0), (x1, y1) = polygon.tolist()
+            polygon = np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1]])
+        if self._data is None:
+            return np.zeros(0, np.intp)
+        tr = self.transforms.get_transform('visual', 'canvas')
+        if tr is not self._canvas_tr:
+            if self._canvas_tr is not None:
+                self._canvas_tr.changed.disconnect(self._reset_point_grid)
+            tr.changed.connect(self._reset_point_grid)
+            self._canvas_tr = tr
+            self._point_grid = None
+        if self._point_grid is None:
+            self._point_grid = _PointGrid(self._canvas_pos(tr))
+        return self._point_grid.select(polygon)
+
+    def _canvas_pos(self, tr):
+        """The positions of the markers in the canvas, NaN if behind the
+        camera"""
+        tr = tr.simplified
+        pos = self._data['a_position']
+        out = np.empty((len(pos), 2))
+        block = 2 ** 20
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for start in range(0, len(pos), block):
+                mapped = tr.map(pos[start:start + block])
+                w = mapped[:, 3:]
+                out[start:start + block] = np.where(w > 0, mapped[:, :2] / w,
+                                                    np.nan)
+        return out
+
+    def _reset_point_grid(self, event=None):
+        self._point_grid = None
+
+    def set_size(self, size, index=None):
+        """Set the size of the markers in px (see `set_pos`)"""
+        self._set_attribute('a_size', size, index)
+
+    def set_edge_width(self, edge_width, index=None):
+        """Set the width of the outline of the markers in px (see
+        `set_pos`)"""
+        self._set_attribute('a_edgewidth', edge_width, index)
+
+    def set_edge_color(self, color, index=None):
+        """Set the color of the outline of the markers (see `set_pos`)"""
+        self._set_attribute('a_fg_color', ColorArray(color).rgba, index)
+
+    def set_face_color(self, color, index=None):
+        """Set the color of the interior of the markers (see `set_pos`)"""
+        self._set_attribute('a_bg_color', ColorArray(color).rgba, index)
+
+    def _set_attribute(self, name, value, index, n_comp=None):
+        """Set an attribute of the markers (or its first n_comp components)
+        and upload the range of its buffer that changed"""
+        if self._data is None:
+            raise RuntimeError('set_data must be called first')
+        data = self._data[name]
+        if n_comp is not None:
+            data = data[:, :n_comp]
+        if index is None:
+            data[:] = value
+            start = stop = None
+        else:
+            data[index] = value
+            start, stop = _span(index, len(data))
+            if start == stop:
+                return
+        if self._symbol is not None:
+            self._upload([name], start, stop)
         self.update()
 
+    def _upload(self, names=None, start=None, stop=None):
+        """Upload attributes to their buffers, all of them by default, and
+        only from the start to the stop marker if given"""
+        for name in names or self._vbos:
+            vbo = self._vbos[name]
+            if start is None:
+                vbo.set_data(self._data[name])
+                self.shared_program[name] = vbo
+            else:
+                vbo.set_subdata(self._data[name][start:stop], offset=start,
+                                copy=True)
+
     @property
     def symbol(self):
+        """The symbol of the markers, or the index of the symbol of each
+        marker in `symbols`"""
         return self._symbol
 
     @symbol.setter
     def symbol(self, symbol):
-        if symbol == self._symbol:
-            return
+        self._set_symbol(symbol, None if self._data is None
+                         else len(self._data['a_position']))
+
+    @property
+    def symbols(self):
+        """The names of the symbols, in the order of their index"""
+        return _builtin_symbols + tuple(self._images)
+
+    def add_symbol(self, name, image):
+        """Add an image symbol
+
+        The image is drawn at the size of the markers (its larger side),
+        tinted by their face color, and without edge.
+
+        Parameters
+        ----------
+        name : str
+            The name of the symbol. The image of an existing symbol is
+            replaced, and keeps its index.
+        image : array
+            The (H, W) mask, drawn in the face color, or the (H, W, 2 | 3 | 4)
+            luminance-alpha, RGB or RGBA image, as ubyte or as float in
+            [0, 1].
+        """
+        if name in _marker_dict:
+            raise ValueError('%r is a built-in symbol' % (name,))
+        image = np.asarray(image)
+        if image.ndim == 2:
+            image = image[:, :, np.newaxis]
+        if image.ndim != 3 or image.shape[2] > 4 or 0 in image.shape:
+            raise ValueError('image must be a (H, W) or (H, W, 2 | 3 | 4) '
+                             'array, got shape %s' % (image.shape,))
+        if image.dtype.kind == 'f':
+            image = image * 255 + 0.5
+        image = np.clip(image, 0, 255).astype(np.ubyte)
+        height, width, n_channels = image.shape
+        # a transparent border avoids sampling the neighbors in the atlas
+        data = np.zeros((height + 2, width + 2, 4), np.ubyte)
+        inner = data[1:-1, 1:-1]
+        if n_channels <= 2:
+            inner[..., :3] = 255 if n_channels == 1 else image[..., :1]
+            inner[..., 3] = image[..., -1]
+        else:
+            inner[..., :n_channels] = image
+            if n_channels == 3:
+                inner[..., 3] = 255
+
+        if self._atlas is None:
+            self._atlas = TextureAtlas((256, 256), np.ubyte, 'rgba',
+                                       max_size=4096)
+        region = self._atlas.get_free_region(width + 2, height + 2)
+        if region is None:
+            raise ValueError('the image of %r does not fit in the atlas'
+                             % (name,))
+        x, y = region[:2]
+        self._atlas[y:y + height + 2, x:x + width + 2] = data
+        if name in self._images:
+            x0, y0, w0, h0 = self._images[name]
+            self._atlas.release_region((x0 - 1, y0 - 1, w0 + 2, h0 + 2))
+        self._images[name] = (x + 1, y + 1, width, height)
+        self._images_version += 1
+        self._update_functions()
+        self.update()
+
+    def _symbol_index(self, name):
+        """The index of a symbol in `symbols`"""
+        _check_valid('symbol', name, marker_types + tuple(self._images))
+        if name in _builtin_index:
+            return _builtin_index[name]
+        return len(_builtin_symbols) + list(self._images).index(name)
+
+    def _symbol_ids(self, symbol):
+        """The index of the symbol of each marker"""
+        symbol = np.asarray(symbol)
+        if symbol.ndim != 1:
+            raise ValueError('symbol must be a str or a 1D array, got shape '
+                             '%s' % (symbol.shape,))
+        if symbol.dtype.kind in 'iu':
+            ids = symbol.astype(np.intp)
+            if len(ids) and (ids.min() < 0 or ids.max() >= len(self.symbols)):
+                raise ValueError('symbol indices must be in [0, %d)'
+                                 % len(self.symbols))
+            return ids
+        names, ids = np.unique(symbol, return_inverse=True)
+        return np.array([self._symbol_index(name) for name in names.tolist()],
+                        np.intp)[ids]
+
+    def _set_symbol(self, symbol, n):
+        """Set the symbol of the markers, given their number n (or None)"""
+        if symbol is None or isinstance(symbol, string_types):
+            if isinstance(self._symbol, string_types) or self._symbol is None:
+                if symbol == self._symbol:
+                    return
+            if symbol is not None:
+                self._symbol_index(symbol)
+            ids = None
+        else:
+            ids = self._symbol_ids(symbol)
+            if n is not None and len(ids) != n:
+                raise ValueError('symbol must have one value per marker (%d), '
+                                 'got %d' % (n, len(ids)))
         if (symbol is not None and self._symbol is None and
                 self._data is not None):
             # Allow user to configure symbol after a set_data call with
@@ -601,17 +1060,96 @@ class MarkersVisual(Visual):
             # marker.symbol = None
             # without drawing. At this point the memory leaking ensues
             # but this case is unlikely/makes no sense.
-            self._vbo.set_data(self._data)
-            self.shared_program.bind(self._vbo)
-        self._symbol = symbol
+            self._upload()
+        if ids is None:
+            self._symbol = symbol
+        else:
+            self._symbol = ids
+            self._symbol_vbo.set_data(ids.astype(np.float32))
+        self._update_functions()
+        self.update()
+
+    def _update_functions(self):
+        """Set the shader functions drawing the symbols
+
+        A single built-in symbol has its own function. Otherwise, the
+        functions of the built-in symbols and the images in use are selected
+        from the index of the symbol.
+        """
+        symbol = self._symbol
+        if symbol is None or (isinstance(symbol, string_types) and
+                              symbol in _builtin_index):
+            key = symbol
+        elif isinstance(symbol, string_types):
+            key = ((self._symbol_index(symbol),), False, self._images_version)
+        else:
+            used = np.flatnonzero(np.bincount(symbol, minlength=1))
+            key = (tuple(used.tolist()), True, self._images_version)
+        if key == self._functions_key:
+            return
+        self._functions_key = key
+        vert = self.shared_program.vert
+        frag = self.shared_program.frag
+
         if symbol is None:
             self._marker_fun = None
-        else:
-            _check_valid('symbol', symbol, marker_types)
+            return
+        if isinstance(key, string_types):
+            vert[self._v_symbol_var] = None
             self._marker_fun = Function(_marker_dict[symbol])
             self._marker_fun['v_size'] = self._v_size_var
-            self.shared_program.frag['marker'] = self._marker_fun
-        self.update()
+            self._sprite_fun = Function(no_sprite)
+        else:
+            used, per_marker = key[:2]
+            if per_marker:
+                vert[self._v_symbol_var] = self._symbol_vbo
+                index = self._v_symbol_var
+            else:
+                vert[self._v_symbol_var] = None
+                index = '%d.' % used[0]
+            self._marker_fun = self._shape_function(
+                [i for i in used if i < len(_builtin_symbols)], index)
+            self._sprite_fun = self._image_function(
+                [i for i in used if i >= len(_builtin_symbols)], index)
+        frag['marker'] = self._marker_fun
+        frag['sprite'] = self._sprite_fun
+
+    def _shape_function(self, ids, index):
+        """The marker function of the built-in symbols of given indices"""
+        if not ids:
+            code = '    return 0.;'
+        else:
+            code = _dispatch([(i, 'return $shape_%d(pointcoord, size);' % i)
+                              for i in ids])
+        fun = Function('float marker(vec2 pointcoord, float size)\n{\n'
+                       '    float symbol = $symbol;\n%s\n}\n' % code)
+        fun['symbol'] = index
+        for i in ids:
+            shape = Function(_marker_dict[_builtin_symbols[i]])
+            shape['v_size'] = self._v_size_var
+            fun['shape_%d' % i] = shape
+        return fun
+
+    def _image_function(self, ids, index):
+        """The sprite function of the image symbols of given indices"""
+        if not ids:
+            return Function(no_sprite)
+        atlas_height, atlas_width = (float(n) for n in self._atlas.shape[:2])
+        names = self.symbols
+        cases = []
+        for i in ids:
+            x, y, width, height = self._images[names[i]]
+            side = float(max(width, height))
+            cases.append((i, 'region = vec4(%.8f, %.8f, %.8f, %.8f); '
+                             'aspect = vec2(%.8f, %.8f);'
+                          % (x / atlas_width, y / atlas_height,
+                             width / atlas_width, height / atlas_height,
+                             width / side, height / side)))
+        fun = Function(sprite % ('%.1f' % (ids[0] - 0.5), _dispatch(cases)))
+        fun['symbol'] = index
+        fun['v_size'] = self._v_size_var
+        fun['atlas'] = self._atlas
+        return fun
 
     def _prepare_transforms(self, view):
         xform = view.transforms.get_transform()
@@ -630,9 +1168,10 @@ class MarkersVisual(Visual):
             view.view_program['u_scale'] = 1
 
     def _compute_bounds(self, axis, view):
-        pos = self._data['a_position']
-        if pos is None:
+        # cached until the positions change
+        if self._data is None:
             return None
+        pos = self._data['a_position']
         if pos.shape[1] > axis:
             return (pos[:, axis].min(), pos[:, axis].max())
         else:
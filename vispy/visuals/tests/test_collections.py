@@ -1,5 +1,8 @@
 # *Very* basic collections tests
 
+import numpy as np
+from numpy.testing import assert_array_equal
+
 from vispy.visuals.collections import (PathCollection, PointCollection,
                                        PolygonCollection, SegmentCollection,
                                        TriangleCollection)
@@ -14,3 +17,52 @@ def test_init():
         for coll in (PathCollection, PointCollection, PolygonCollection,
                      SegmentCollection, TriangleCollection):
             coll()
+
+
+def test_path_lod():
+    """Test path collections level of detail
+    """
+    from vispy.visuals.collections.agg_path_collection import \
+        AggPathCollection
+    from vispy.visuals.collections.agg_fast_path_collection import \
+        AggFastPathCollection
+    from vispy.visuals.transforms import STTransform
+
+    pos = np.zeros((2000, 3))
+    pos[:, :2] = np.cumsum(np.random.RandomState(0).randn(2000, 2), axis=0)
+    for cls in (AggPathCollection, AggFastPathCollection):
+        transform = STTransform(scale=(1e-3, 1e-3))
+        paths = cls(lod=True, color='shared', transform=transform)
+        paths.append(pos, itemsize=1000, color=[(1, 0, 0, 1), (0, 1, 0, 1)])
+        assert len(paths) == 2
+        size = paths._vertices_list.size
+        paths._uniforms_list['color'][1] = 0, 0, 1, 1
+
+        # zoomed out: paths are simplified, uniforms are preserved
+        assert paths._lod.update(paths)
+        assert not paths._lod.update(paths)
+        assert len(paths) == 2
+        assert paths._vertices_list.size < size
+        assert_array_equal(paths._uniforms_list['color'][1], (0, 0, 1, 1))
+
+        # zoomed in: full resolution
+        transform.scale = (10, 10)
+        assert paths._lod.update(paths)
+        assert paths._lod.level == paths._lod.levels[0]
+        assert paths._vertices_list.size == size
+
+        # deleted items and modified attributes are kept
+        paths = cls(lod=True, color='local', transform=transform)
+        paths.append(pos, itemsize=1000, color=(1, 0, 0, 1))
+        assert paths._lod.update(paths)
+        del paths[0]
+        assert len(paths) == 1
+        paths._vertices_list['color'][:] = 0, 0, 1, 1
+        transform.scale = (1e-3, 1e-3)
+        assert paths._lod.update(paths)
+        assert len(paths) == 1
+        assert (paths._vertices_list['color'] == (0, 0, 1, 1)).all()
+        field, first = (('p1', 0) if cls is AggPathCollection else
+                        ('curr', 2))
+        assert_array_equal(paths._vertices_list[field][first],
+                           pos[1000].astype(np.float32))
@@ -18,5 +18,9 @@ def test_isosurface():
     # Change color (regression test for a bug that caused this to crash)
     iso.color = (1.0, 0.8, 0.9, 1.0)
 
+    # Partial updates leave the original array unchanged
+    iso.set_data(np.full((2, 2, 2), 7.), offset=(0, 0, 0))
+    assert vol[0, 0, 0] == 0
+
 
 run_tests_if_main()
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+import numpy as np
+from numpy.testing import assert_array_equal, assert_allclose
+
+from vispy.visuals.line import LineVisual
+from vispy.visuals.line.decimation import MinMaxPyramid
+from vispy.visuals.line.line import _AggLineVisual
+from vispy.visuals.transforms import STTransform
+from vispy.testing import assert_raises, run_tests_if_main
+
+
+def test_minmax_pyramid():
+    """Test min/max envelope of long lines"""
+    rng = np.random.RandomState(0)
+    n = 100001
+    pos = np.c_[np.arange(n), rng.randn(n)].astype(np.float32)
+    pos[12345, 1] = 50.
+    pos[54321, 1] = -50.
+    pyramid = MinMaxPyramid(pos)
+    assert len(pyramid) == n
+    for level, (ymin, ymax) in enumerate(pyramid._levels):
+        starts = np.arange(0, n, 2 ** (level + 1))
+        assert_array_equal(ymin, np.minimum.reduceat(pos[:, 1], starts))
+        assert_array_equal(ymax, np.maximum.reduceat(pos[:, 1], starts))
+
+    # peaks are preserved, at most two vertices per column (plus edges)
+    env = pyramid.envelope(0, n, 1000)
+    assert len(env) <= 2 * 1002
+    assert env[:, 1].max() == 50.
+    assert env[:, 1].min() == -50.
+    assert (np.diff(env[:, 0]) >= 0).all()
+
+    # few samples per column: samples are returned as is
+    env = pyramid.envelope(100, 200.5, 1000)
+    assert_array_equal(env, pos[99:202])
+
+    assert_raises(ValueError, MinMaxPyramid, pos[::-1])
+    assert_raises(ValueError, MinMaxPyramid, np.zeros((10, 3)))
+
+
+def test_line_decimation():
+    """Test LineVisual decimation at screen resolution"""
+    n = 100000
+    pos = np.c_[np.arange(n), np.random.RandomState(0).randn(n)]
+    line = LineVisual(pos, decimate=True)
+    transform = STTransform(scale=(800. / n, 10.))
+    line.transforms.visual_transform = transform
+    line.transforms.framebuffer_transform.transforms[0].set_mapping(
+        [(0, 0), (800, 600)], [(-1, -1), (1, 1)])
+    line._update_decimation(line)
+    assert line._render_pos.shape == (1600, 2)
+    assert line.pos is pos
+
+    # zoom in on a tenth of the line
+    transform.scale = (8000. / n, 10.)
+    line._update_decimation(line)
+    assert line._render_pos[:, 0].max() < n / 9.
+
+    # per-vertex colors cannot be decimated
+    line.set_data(color=np.ones((n, 4)))
+    line._update_decimation(line)
+    assert line._render_pos is pos
+
+    line.decimate = False
+    assert line._pyramid is None
+
+    # lines that cannot be decimated are drawn as they are
+    for kwargs in (dict(pos=pos[::-1]),
+                   dict(pos=np.c_[pos, np.zeros(n)]),
+                   dict(pos=pos, connect='segments')):
+        line = LineVisual(decimate=True, **kwargs)
+        line.transforms.visual_transform = transform
+        line._update_decimation(line)
+        assert line._render_pos is kwargs['pos']
+
+
+def _assert_baked_equal(V1, V2):
+    for name in V1.dtype.names:
+        assert_allclose(V1[name], V2[name], rtol=1e-4, atol=1e-3,
+                        err_msg=name)
+
+
+def test_agg_bake():
+    """Test baking of agg lines"""
+    rng = np.random.RandomState(0)
+    color = np.array([1., 0., 0., 1.])
+    P = rng.randn(20, 2).astype(np.float32)
+    V, idxs = _AggLineVisual._agg_bake(P, color)
+    assert V.shape == (4 * 19,)
+    assert idxs.shape == (6 * 19,)
+    assert_array_equal(V['a_position'][::4], P[:-1])
+    assert_array_equal(V['color'], np.tile(color, (len(V), 1)))
+    length = np.sqrt((np.diff(P, axis=0) ** 2).sum(axis=1)).sum()
+    assert_allclose(V['alength'], length, rtol=1e-5)
+
+    # closed lines get a closing segment
+    V, idxs = _AggLineVisual._agg_bake(P, color, closed=True)
+    assert V.shape == (4 * 20,)
+
+    # disjoint polylines are the same as separate bakes
+    connect = np.c_[np.arange(19), np.arange(1, 20)]
+    connect = np.delete(connect, 9, axis=0)
+    V, idxs = _AggLineVisual._agg_bake(P, color, connect=connect)
+    Va, _ = _AggLineVisual._agg_bake(P[:10], color)
+    Vb, _ = _AggLineVisual._agg_bake(P[10:], color)
+    _assert_baked_equal(V, np.concatenate([Va, Vb]))
+
+    # output reuse
+    V, _ = _AggLineVisual._agg_bake(P[:10], color)
+    V2, _ = _AggLineVisual._agg_bake(P[10:], color, out=V)
+    assert np.shares_memory(V2, V)
+    _assert_baked_equal(V, Vb)
+
+    # color update in place
+    colors = rng.rand(20, 4).astype(np.float32)
+    V, _ = _AggLineVisual._agg_bake(P, color)
+    seg = _AggLineVisual._segment_indices(len(P))
+    _AggLineVisual._set_color(V, colors, seg)
+    _assert_baked_equal(V, _AggLineVisual._agg_bake(P, colors)[0])
+    assert_raises(ValueError, _AggLineVisual._set_color, V, colors[:5], seg)
+
+
+def test_agg_bake_tail():
+    """Test partial re-baking of agg lines"""
+    rng = np.random.RandomState(0)
+    color = np.array([1., 0., 0., 1.])
+    P = rng.randn(100, 2).astype(np.float32)
+    V, _ = _AggLineVisual._agg_bake(P[:60], color)
+    for start in (0, 1, 2, 3, 30, 59, 60):
+        Q = P.copy()
+        Q[start:60] += 1
+        Vt, idxs = _AggLineVisual._agg_bake_tail(V.copy(), Q, color, start)
+        Vr, ref = _AggLineVisual._agg_bake(Q, color)
+        assert_array_equal(idxs, ref)
+        _assert_baked_equal(Vt, Vr)
+
+    # same size: updated in place, indices unchanged
+    Q = P[:60] * 2
+    Vt, idxs = _AggLineVisual._agg_bake_tail(V, Q, color, 50)
+    assert idxs is None
+    assert np.shares_memory(Vt, V)
+
+
+run_tests_if_main()
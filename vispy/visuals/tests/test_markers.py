@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 import numpy as np
+from numpy.testing import assert_array_equal, assert_allclose
 from vispy.scene.visuals import Markers
+from vispy.visuals.markers import MarkersVisual, _inside_polygon
+from vispy.visuals.transforms import STTransform
 from vispy.testing import (requires_application, TestingCanvas,
-                           run_tests_if_main)
+                           run_tests_if_main, assert_raises)
 from vispy.testing.image_tester import assert_image_approved
 
 
@@ -26,4 +29,114 @@ def test_markers():
         assert_image_approved(c.render(), "visuals/markers.png")
 
 
+def test_marker_symbols():
+    """Test per-marker symbols"""
+    pos = np.zeros((4, 2))
+    marker = Markers(pos=pos, symbol=['o', 'disc', 'star', '+'])
+    assert_array_equal(marker.symbol, [0, 0, 13, 8])
+    assert marker.symbols[8] == 'cross'
+    marker.symbol = 'x'
+    assert marker.symbol == 'x'
+    marker.symbol = [1, 2, 3, 4]
+    assert_array_equal(marker.symbol, [1, 2, 3, 4])
+    assert_raises(ValueError, setattr, marker, 'symbol', ['o', 'nope', 'o',
+                                                          'o'])
+    assert_raises(ValueError, setattr, marker, 'symbol', [0, 1, 2, 14])
+    assert_raises(ValueError, setattr, marker, 'symbol', ['o', 'o'])
+    assert_raises(ValueError, marker.set_data, pos[:3], symbol=[0, 1])
+
+    # image symbols follow the built-in ones, and keep their index
+    marker.add_symbol('icon', np.ones((8, 16, 3)))
+    marker.add_symbol('mask', np.zeros((4, 4), np.ubyte))
+    assert marker.symbols[14:] == ('icon', 'mask')
+    marker.symbol = ['mask', 'o', 'icon', 'icon']
+    assert_array_equal(marker.symbol, [15, 0, 14, 14])
+    marker.add_symbol('icon', np.ones((8, 8, 4)))
+    assert marker.symbols[14:] == ('icon', 'mask')
+    marker.symbol = 'mask'
+    assert_raises(ValueError, marker.add_symbol, 'o', np.ones((4, 4)))
+    assert_raises(ValueError, marker.add_symbol, 'bad', np.ones((4, 4, 5)))
+
+
+def test_marker_attributes():
+    """Test updating some attributes of some markers"""
+    pos = np.arange(20.).reshape(10, 2)
+    marker = Markers(pos=pos, size=5, face_color='red')
+    assert marker.bounds(0) == (0, 18)
+    marker.set_face_color('blue', index=[2, 5])
+    marker.set_size(np.arange(3), index=slice(7, 10))
+    marker.set_edge_width(0)
+    data = marker._data
+    assert_array_equal(data['a_bg_color'][[0, 2, 5], :3],
+                       [(1, 0, 0), (0, 0, 1), (0, 0, 1)])
+    assert_array_equal(data['a_size'], [5] * 7 + [0, 1, 2])
+    assert_array_equal(data['a_edgewidth'], 0)
+    # bounds are only computed again when the positions change
+    marker.set_pos([[-1, 30]], index=[4])
+    assert marker.bounds(0) == (-1, 18)
+    assert marker.bounds(1) == (1, 30)
+
+    # only the range of the buffer between the changed markers is uploaded
+    marker._vbos['a_bg_color']._glir.clear()
+    marker.set_face_color('green', index=np.array([False] * 3 + [True] * 2 +
+                                                  [False] * 5))
+    commands = marker._vbos['a_bg_color']._glir.clear()
+    assert [c[:3] for c in commands] == [('DATA', commands[0][1], 3 * 16)]
+    assert commands[0][3].nbytes == 2 * 16
+
+    assert_raises(RuntimeError, Markers().set_size, 1)
+
+
+def test_marker_select():
+    """Test selecting markers in a box or a polygon"""
+    pos = np.array([[0, 0], [10, 10], [20, 5], [np.nan, 1]], np.float32)
+    marker = MarkersVisual(pos=pos)
+    assert_array_equal(marker.select([[-1, -1], [11, 11]]), [0, 1])
+    # the positions are indexed again when the view changes
+    marker.transform = STTransform(scale=(2, 2), translate=(100, 0))
+    assert_array_equal(marker.select([[-1, -1], [11, 11]]), [])
+    assert_array_equal(marker.select([[99, -1], [121, 21]]), [0, 1])
+    marker.transform.translate = (0, 0)
+    assert_array_equal(marker.select([[-1, -1], [21, 21]]), [0, 1])
+    # or when the markers move
+    marker.set_pos([[30, 30]], index=[0])
+    assert_array_equal(marker.select([[0, 0], [100, 0], [0, 100]]), [1, 2])
+    assert_raises(ValueError, marker.select, [[0, 0]])
+    assert_array_equal(Markers().select([[0, 0], [1, 1]]), [])
+
+    # compare with testing all the points, for random (also
+    # self-intersecting) polygons
+    rng = np.random.RandomState(0)
+    pos = rng.rand(20000, 2) * 100
+    pos[:100] = 42
+    marker = Markers(pos=pos)
+    for n in (3, 10, 50):
+        polygon = rng.rand(n, 2) * 140 - 20
+        assert_array_equal(marker.select(polygon),
+                           np.flatnonzero(_inside_polygon(pos, polygon)))
+
+
+@requires_application()
+def test_markers_mixed_symbols():
+    """Test drawing built-in and image symbols at once"""
+    pos = np.array([[20, 20], [60, 20], [20, 60]], np.float32)
+    image = np.zeros((10, 20, 4), np.float32)
+    image[:, :, 0] = image[:, :, 3] = 1
+    with TestingCanvas(size=(80, 80), bgcolor='black') as c:
+        marker = Markers(parent=c.scene)
+        marker.add_symbol('red', image)
+        marker.set_data(pos, symbol=['s', 'red', 'o'], size=20,
+                        edge_width=0, face_color='white')
+        out = c.render()[..., :3] / 255.
+        assert_allclose(out[20, 20], 1)
+        assert_allclose(out[20, 60], (1, 0, 0), atol=0.02)
+        assert_allclose(out[60, 20], 1)
+        # the image keeps its aspect ratio, and is not drawn outside it
+        assert_allclose(out[20, 66], (1, 0, 0), atol=0.02)
+        assert_allclose(out[12, 60], 0)
+        # the square covers its corners, the disc does not
+        assert_allclose(out[11, 11], 1)
+        assert_allclose(out[51, 11], 0)
+
+
 run_tests_if_main()
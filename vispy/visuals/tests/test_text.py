@@ -1,12 +1,17 @@
 # -*- coding: utf-8 -*-
 
 import numpy as np
-from numpy.testing import assert_allclose
+from numpy.testing import assert_allclose, assert_array_equal
 
 from vispy.scene.visuals import Text
 from vispy.testing import (requires_application, TestingCanvas,
                            run_tests_if_main)
 from vispy.testing.image_tester import assert_image_approved
+from vispy.util import _TempDir
+from vispy.visuals.text._glyph_cache import GlyphCache, _get_glyph_cache
+from vispy.visuals.text.text import (TextureFont, FontManager, SDFRendererCPU,
+                                     _resample, _text_to_vbo,
+                                     _cull_overlapping)
 
 
 @requires_application()
@@ -82,4 +87,183 @@ def test_face_bold_italic():
         assert font1 is font4
 
 
+def test_glyph_cache():
+    """Test the persistent glyph cache"""
+    temp_dir = _TempDir()
+    key = dict(face='OpenSans', bold=False, italic=False, size=256)
+    sdf = np.arange(12, dtype=np.uint8).reshape(3, 4)
+    cache = GlyphCache(temp_dir)
+    assert cache.get_glyph(key, 'a') is None
+    cache.set_glyph(key, 'a', sdf, (1, 30), 40.5)
+    cache.set_kerning(key, 'a', 'v', -2.)
+    cache.set_kerning(key, 'v', 'a', -1.5)
+    cache.save()
+
+    # another process reads the glyphs back
+    cache = GlyphCache(temp_dir)
+    bitmap, offset, advance = cache.get_glyph(key, 'a')
+    assert_allclose(bitmap, sdf)
+    assert offset == (1, 30) and advance == 40.5
+    assert cache.get_kerning(key, 'a', 'v') == -2.
+    assert cache.get_kerning(key, 'v', 'a') == -1.5
+    assert cache.get_kerning(key, 'a', 'a') is None
+    assert cache.get_glyph(dict(key, bold=True), 'a') is None
+
+    # saves are merged
+    other = GlyphCache(temp_dir)
+    other.set_glyph(key, 'b', sdf[:2], (0, 0), 10)
+    other.save()
+    cache.set_glyph(key, 'c', sdf[:1], (0, 0), 10)
+    cache.save()
+    cache = GlyphCache(temp_dir)
+    for char in 'abc':
+        assert cache.get_glyph(key, char) is not None
+
+    assert _get_glyph_cache(False) is None
+    assert _get_glyph_cache(temp_dir) is _get_glyph_cache(temp_dir)
+
+
+def test_resample():
+    """Test the vectorized resampling of SDFs"""
+    data = np.random.RandomState(0).rand(7, 5)
+    for size in (1, 3, 5, 12):
+        x = (np.arange(size) + 0.5) / size
+        expect = np.array([np.interp(x, (np.arange(5) + 0.5) / 5, row)
+                           for row in data])
+        assert_allclose(_resample(data, size, 1), expect, rtol=0, atol=1e-15)
+        assert_allclose(_resample(data.T, size, 0), expect.T, rtol=0,
+                        atol=1e-15)
+
+
+def _fill_cache(font, chars):
+    """Store fake glyphs in the cache of a font"""
+    for i, char in enumerate(chars):
+        sdf = np.full((10 + 3 * i, 20 - i), i, np.uint8)
+        font._cache.set_glyph(font._cache_key, char, sdf, (i, 30), 40. + i)
+        for other in chars:
+            font._cache.set_kerning(font._cache_key, char, other, -i / 10.)
+
+
+def test_preload():
+    """Test loading many glyphs at once (from the glyph cache)"""
+    chars = 'abcdefgh'
+    font = TextureFont(dict(face='OpenSans', bold=False, italic=False),
+                       SDFRendererCPU(), GlyphCache(_TempDir()))
+    _fill_cache(font, chars)
+    font.preload(chars + 'aaa')
+    regions = []
+    for i, char in enumerate(chars):
+        glyph = font[char]
+        assert glyph['size'] == (20 - i, 10 + 3 * i)
+        assert glyph['offset'] == (i, 30)
+        assert glyph['kerning']['a'] == 0.
+        assert glyph['kerning']['h'] == -0.7
+        u0, v0, u1, v1 = glyph['texcoords']  # in texels
+        assert_allclose([u1 - u0, v1 - v0], glyph['size'])
+        regions.append((u0, v0, u1, v1))
+    # glyphs do not overlap
+    for i, a in enumerate(regions):
+        for b in regions[:i]:
+            assert (a[2] <= b[0] or b[2] <= a[0] or
+                    a[3] <= b[1] or b[3] <= a[1])
+    assert font._atlas.shape[2] == 1  # single channel
+
+
+def test_text_layout():
+    """Test the layout of many strings at once (without a context)"""
+    manager = FontManager(cache=_TempDir())
+    font = manager.get_font('OpenSans')
+    _fill_cache(font, 'abc hy')
+    text = ['ab', 'ca\nb', '', '\tc', 'b']
+    vertices = _text_to_vbo(text, font, 'left', 'baseline', 64)
+    assert len(vertices) == 4 * sum(len(t) for t in text)
+    quads = vertices['a_position'].reshape(-1, 4, 2)
+    # each string is laid out as if it was alone
+    for i, t in enumerate(text):
+        start = sum(len(t) for t in text[:i])
+        alone = _text_to_vbo(t, font, 'left', 'baseline', 64)
+        assert_allclose(quads[start:start + len(t)],
+                        alone['a_position'].reshape(-1, 4, 2), atol=1e-6)
+    # the line break moves "b" down, the tab moves "c" right
+    height = max(font[c]['size'][1] for c in 'hy') - 2 * font.slop
+    b = _text_to_vbo('ab', font, 'left', 'baseline', 64)['a_position']
+    assert_allclose(quads[4, :, 1], b[4:, 1] - 1.5 * height / 64)
+    space = font[' ']['advance'] / font.ratio
+    c0 = _text_to_vbo('c', font, 'left', 'baseline', 64)['a_position']
+    assert_allclose(quads[7, :, 0], c0[:, 0] + 4 * space / 64)
+
+
+@requires_application()
+def test_text_update():
+    """Test updating some of the strings of a Text"""
+    manager = FontManager(cache=_TempDir())
+    _fill_cache(manager.get_font('OpenSans'), 'abc hy')
+    text = ['ab', 'ca\nb', '', '\tc', 'b']
+    with TestingCanvas() as c:
+        t = Text(text, font_manager=manager, parent=c.scene)
+        c.render()
+        vbo = t._vertices
+        before = t._layout[3].copy()
+        # same lengths: the buffer is updated in place
+        t.text = text[:-1] + ['a']
+        c.render()
+        assert t._vertices is vbo
+        after = t._layout[3]
+        assert np.array_equal(after[:-1], before[:-1])
+        assert not np.array_equal(after[-1], before[-1])
+        # the buffers are rebuilt when the lengths change
+        t.text = text + ['abc']
+        c.render()
+        assert t._vertices is not vbo
+        assert t._vertices.size == 4 * len(t._layout[3]) == 4 * 12
+        assert np.array_equal(t._layout[3][:8], before[:8])
+
+
+def test_cull_overlapping():
+    """Test the greedy selection of boxes that do not overlap"""
+    boxes = [[0, 0, 10, 10], [5, 5, 15, 15], [10, 0, 20, 10],
+             [100, 100, 110, 101], [-1, -1, 30, 30]]
+    assert_array_equal(_cull_overlapping(boxes), [0, 2, 3])  # touching
+    assert_array_equal(_cull_overlapping(boxes, [0, 1, 0, 0, 0]), [1, 3])
+    assert_array_equal(_cull_overlapping(boxes, [0, 0, 0, 0, 1]), [3, 4])
+    assert_array_equal(_cull_overlapping(np.zeros((0, 4))), [])
+    # many boxes, compared with testing all the pairs
+    rng = np.random.RandomState(0)
+    corners = rng.rand(500, 2) * 300
+    boxes = np.concatenate((corners, corners + rng.rand(500, 2) * 20 + 5),
+                           axis=1)
+    priority = rng.randint(0, 3, 500)
+    selected = _cull_overlapping(boxes, priority)
+    a, b = boxes[selected, np.newaxis], boxes[np.newaxis, selected]
+    overlap = ((a[..., 0] < b[..., 2]) & (b[..., 0] < a[..., 2]) &
+               (a[..., 1] < b[..., 3]) & (b[..., 1] < a[..., 3]))
+    assert overlap.sum() == len(selected)  # only with themselves
+    for i in np.setdiff1d(np.arange(500), selected):
+        hidden_by = selected[(boxes[i, 0] < boxes[selected, 2]) &
+                             (boxes[selected, 0] < boxes[i, 2]) &
+                             (boxes[i, 1] < boxes[selected, 3]) &
+                             (boxes[selected, 1] < boxes[i, 3])]
+        assert (priority[hidden_by] >= priority[i]).any()
+
+
+@requires_application()
+def test_text_cull():
+    """Test culling the overlapping labels of a Text"""
+    manager = FontManager(cache=_TempDir())
+    _fill_cache(manager.get_font('OpenSans'), 'ab hy')
+    pos = [[50, 50], [52, 52], [150, 150], [1000, 1000]]
+    with TestingCanvas(size=(200, 200)) as c:
+        t = Text(['ab', 'ab', 'ba', 'a'], pos=pos, font_manager=manager,
+                 overlap='cull', priority=[1, 2, 0, 0], parent=c.scene)
+        c.render()
+        # the first label is hidden by the second one, the last is not in view
+        assert_array_equal(t._selection, [1, 2])
+        t.priority = None
+        c.render()
+        assert_array_equal(t._selection, [0, 2])
+        t.overlap = 'show'
+        c.render()
+        assert t._selection is None
+
+
 run_tests_if_main()
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) Vispy Development Team. All Rights Reserved.
+# Distributed under the (new) BSD License. See LICENSE.txt for more info.
+# -----------------------------------------------------------------------------
+"""
+Persistent cache of the signed distance fields of glyphs.
+
+Rendering a glyph at high resolution and computing its distance field is by
+far the most expensive step of text rendering. The low-resolution SDF of
+each glyph is stored on disk along with its metrics and the kerning of the
+pairs of characters met so far, so that the font atlases of later processes
+are filled without rendering any glyph.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from ...util.config import _get_vispy_app_dir
+
+_cache_version = 1
+_caches = {}
+
+
+def _get_glyph_cache(path):
+    """Get the cache of a directory (shared by all fonts)
+
+    Parameters
+    ----------
+    path : str | bool
+        The directory of the cache, True for the default one (in the vispy
+        application directory), or False (or an empty string) to disable the
+        cache.
+
+    Returns
+    -------
+    cache : instance of GlyphCache | None
+        The cache, or None if it is disabled.
+    """
+    if path is True:
+        app_dir = _get_vispy_app_dir()
+        if app_dir is None:
+            return None
+        path = os.path.join(app_dir, 'glyph_cache')
+    if not path:
+        return None
+    path = os.path.abspath(os.path.expanduser(path))
+    if path not in _caches:
+        _caches[path] = GlyphCache(path)
+    return _caches[path]
+
+
+class GlyphCache(object):
+    """Cache of low-resolution SDF glyphs in a directory
+
+    Each font (face, style and SDF parameters, given as a dict of JSON
+    values) is stored in its own .npz file. The files are read when a font
+    is first used, and written when `save` is called, which happens at exit.
+    Files are replaced atomically and merged with the glyphs saved by other
+    processes in the meantime. The cache is silently skipped if the
+    directory is not writable.
+
+    Parameters
+    ----------
+    path : str
+        The directory of the cache, created when needed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fonts = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        atexit.register(self.save)
+
+    def _fname(self, key):
+        key = json.dumps(key, sort_keys=True).encode('utf-8')
+        return os.path.join(self.path,
+                            'font-%s.npz' % hashlib.sha1(key).hexdigest())
+
+    def _font(self, key):
+        """The glyphs and kerning of a font, read from disk on first use"""
+        fname = self._fname(key)
+        if fname not in self._fonts:
+            self._fonts[fname] = self._read(fname, key) or \
+                dict(key=key, glyphs={}, kerning={})
+        return self._fonts[fname]
+
+    @staticmethod
+    def _meta(key):
+        return json.dumps(dict(version=_cache_version, font=key),
+                          sort_keys=True)
+
+    def _read(self, fname, key):
+        """Read a font file, None if it does not exist or is invalid"""
+        if not os.path.isfile(fname):
+            return None
+        try:
+            with np.load(fname) as f:
+                if str(f['meta']) != self._meta(key):
+                    return None
+                chars = f['chars'].tolist()
+                shapes = f['shapes'].tolist()
+                offsets = f['offsets'].tolist()
+                advances = f['advances'].tolist()
+                bounds = np.cumsum([0] + [h * w for h, w in shapes])
+                sdf = f['sdf']
+                glyphs = dict()
+                for i, c in enumerate(chars):
+                    bitmap = sdf[bounds[i]:bounds[i + 1]].reshape(shapes[i])
+                    glyphs[chr(c)] = (bitmap, tuple(offsets[i]), advances[i])
+                pairs = f['kerning_pairs'].tolist()
+                values = f['kerning'].tolist()
+                kerning = dict(((chr(a), chr(b)), v)
+                               for (a, b), v in zip(pairs, values))
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+        return dict(key=key, glyphs=glyphs, kerning=kerning)
+
+    def _write(self, fname, font):
+        glyphs = sorted(font['glyphs'].items())
+        kerning = sorted(font['kerning'].items())
+        arrays = dict(
+            meta=np.array(self._meta(font['key'])),
+            chars=np.array([ord(c) for c, _ in glyphs], np.int32),
+            shapes=np.array([g[0].shape for _, g in glyphs],
+                            np.int64).reshape(-1, 2),
+            offsets=np.array([g[1] for _, g in glyphs],
+                             np.float64).reshape(-1, 2),
+            advances=np.array([g[2] for _, g in glyphs], np.float64),
+            sdf=np.concatenate([g[0].ravel() for _, g in glyphs] +
+                               [np.zeros(0, np.uint8)]),
+            kerning_pairs=np.array([(ord(a), ord(b)) for (a, b), _ in kerning],
+                                   np.int32).reshape(-1, 2),
+            kerning=np.array([v for _, v in kerning], np.float64))
+        temp = '%s.%d.tmp' % (fname, os.getpid())
+        try:
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path)
+            with open(temp, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(temp, fname)
+        except (IOError, OSError):
+            if os.path.exists(temp):
+                os.remove(temp)
+            return False
+        return True
+
+    def get_glyph(self, key, char):
+        """Get a glyph of a font
+
+        Returns
+        -------
+        glyph : tuple | None
+            The (h, w) ubyte SDF, the offset (left, top) and the advance of
+            the glyph at the resolution it was rendered at, or None if the
+            glyph is not cached.
+        """
+        return self._font(key)['glyphs'].get(char)
+
+    def set_glyph(self, key, char, sdf, offset, advance):
+        """Store a glyph of a font (see `get_glyph`)"""
+        font = self._font(key)
+        font['glyphs'][char] = (np.array(sdf, np.uint8), tuple(offset),
+                                float(advance))
+        self._dirty.add(self._fname(key))
+
+    def get_kerning(self, key, left, right):
+        """Get the kerning of a pair of characters, None if unknown"""
+        return self._font(key)['kerning'].get((left, right))
+
+    def set_kerning(self, key, left, right, value):
+        """Store the kerning of a pair of characters"""
+        self._font(key)['kerning'][(left, right)] = float(value)
+        self._dirty.add(self._fname(key))
+
+    def save(self):
+        """Write the fonts that changed since they were read"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            for fname in sorted(dirty):
+                font = self._fonts[fname]
+                # keep what other processes saved in the meantime
+                saved = self._read(fname, font['key'])
+                if saved is not None:
+                    for name in ('glyphs', 'kerning'):
+                        saved[name].update(font[name])
+                        font[name] = saved[name]
+                self._write(fname, font)
@@ -20,11 +20,21 @@ cdef DTYPE_ct MAX_VAL = (1e6 + 1e6j)
 
 @cython.boundscheck(False)  # designed to stay within bounds
 @cython.wraparound(False)  # we don't use negative indexing
-def _calc_distance_field(np.ndarray[DTYPE_t, ndim=2] pixels,
+def _calc_distance_field(DTYPE_t[:, :] pixels,
                          int w, int h, DTYPE_t sp_f):
     # initialize grids
-    cdef np.ndarray[DTYPE_ct, ndim=2] g0 = np.zeros((h, w), dtype_c)
-    cdef np.ndarray[DTYPE_ct, ndim=2] g1 = np.zeros((h, w), dtype_c)
+    cdef DTYPE_ct[:, ::1] g0 = np.zeros((h, w), dtype_c)
+    cdef DTYPE_ct[:, ::1] g1 = np.zeros((h, w), dtype_c)
+    # the GIL is released so that glyphs can be processed on threads
+    with nogil:
+        _fill_distance_field(pixels, g0, g1, w, h, sp_f)
+
+
+@cython.boundscheck(False)  # designed to stay within bounds
+@cython.wraparound(False)  # we don't use negative indexing
+cdef void _fill_distance_field(DTYPE_t[:, :] pixels, DTYPE_ct[:, ::1] g0,
+                               DTYPE_ct[:, ::1] g1, int w, int h,
+                               DTYPE_t sp_f) nogil:
     cdef Py_ssize_t y, x
     for y in range(h):
         g0[y, 0] = MAX_VAL
@@ -60,7 +70,8 @@ def _calc_distance_field(np.ndarray[DTYPE_t, ndim=2] pixels,
 
 @cython.boundscheck(False)  # designed to stay within bounds
 @cython.wraparound(False)  # we don't use negative indexing
-cdef Py_ssize_t compare(DTYPE_ct *cell, DTYPE_ct xy, DTYPE_t *current):
+cdef Py_ssize_t compare(DTYPE_ct *cell, DTYPE_ct xy,
+                        DTYPE_t *current) nogil:
     cdef DTYPE_t val = dist(xy)
     if val < current[0]:
         cell[0] = xy
@@ -69,13 +80,13 @@ cdef Py_ssize_t compare(DTYPE_ct *cell, DTYPE_ct xy, DTYPE_t *current):
 
 @cython.boundscheck(False)  # designed to stay within bounds
 @cython.wraparound(False)  # we don't use negative indexing
-cdef DTYPE_t dist(DTYPE_ct val):
+cdef DTYPE_t dist(DTYPE_ct val) nogil:
     return val.real*val.real + val.imag*val.imag
 
 
 @cython.boundscheck(False)  # designed to stay within bounds
 @cython.wraparound(False)  # we don't use negative indexing
-cdef void _propagate(np.ndarray[DTYPE_ct, ndim=2] grid):
+cdef void _propagate(DTYPE_ct[:, ::1] grid) nogil:
     cdef Py_ssize_t height = grid.shape[0]
     cdef Py_ssize_t width = grid.shape[1]
     cdef Py_ssize_t y, x
@@ -11,6 +11,7 @@ import numpy as np
 
 from ...gloo import (Program, FrameBuffer, VertexBuffer, Texture2D,
                      set_viewport, set_state)
+from ...gloo.context import get_current_canvas
 
 vert_seed = """
 attribute vec2 a_position;
@@ -247,7 +248,7 @@ class SDFRendererGPU(object):
         for program in self.programs:
             program.bind(vertices)
 
-    def render_to_texture(self, data, texture, offset, size):
+    def render_to_texture(self, data, texture, offset, size, read=False):
         """Render a SDF to a texture at a given offset and size
 
         Parameters
@@ -260,8 +261,27 @@ class SDFRendererGPU(object):
             Offset (x, y) to render to inside the texture.
         size : tuple of int
             Size (w, h) to render inside the texture.
+        read : bool
+            If True, read the SDF back from the texture.
+
+        Returns
+        -------
+        sdf : array | None
+            The (h, w) ubyte SDF if `read` is True and pixels can be read
+            (not with a remote GLIR parser), else None.
         """
         assert isinstance(texture, Texture2D)
+        # The rendering is queued with the drawing commands of the canvas,
+        # its viewport (as last set by the canvas) is restored afterwards
+        context = get_current_canvas().context
+        viewport = context.get_viewport()
+        try:
+            return self._render_to_texture(data, texture, offset, size, read)
+        finally:
+            if viewport is not None:
+                context.set_viewport(*viewport)
+
+    def _render_to_texture(self, data, texture, offset, size, read):
         set_state(blend=False, depth_test=False)
 
         # calculate the negative half (within object)
@@ -282,6 +302,14 @@ class SDFRendererGPU(object):
         with self.fbo_to[-1]:
             set_viewport(tuple(offset) + tuple(size))
             self.program_insert.draw('triangle_strip')
+            if read:
+                try:
+                    pixels = self.fbo_to[-1].read(
+                        alpha=False, crop=tuple(offset) + tuple(size))
+                except RuntimeError:
+                    return None
+                # read_pixels flips the rows, texture rows are bottom-up
+                return pixels[::-1, :, 0].copy()
 
     def _render_edf(self, orig_tex):
         """Render an EDF to a texture"""
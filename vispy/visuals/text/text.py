@@ -11,16 +11,21 @@ from __future__ import division
 
 
 import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
+import os
 import sys
 
 from ._sdf_gpu import SDFRendererGPU
 from ._sdf_cpu import _calc_distance_field
+from ._glyph_cache import _get_glyph_cache
 from ...gloo import (TextureAtlas, IndexBuffer, VertexBuffer)
-from ...gloo import context
 from ...gloo.wrappers import _check_valid
 from ...ext.six import string_types
+from ...util import config
 from ...util.fonts import _load_glyph
+from ...util.ranges import _ranges
 from ..transforms import STTransform
 from ...color import ColorArray
 from ..visual import Visual
@@ -30,13 +35,16 @@ from ...io import load_spatial_filters
 class TextureFont(object):
     """Gather a set of glyphs relative to a given font name and size
 
-    This currently stores characters in a `TextureAtlas` object which uses
-    a 2D RGB texture to store unsigned 8-bit integer data. In the future this
-    could be changed to a ``GL_R8`` texture instead of RGB when OpenGL ES
-    3.0+ is standard. Since VisPy tries to stay compatible with OpenGL ES 2.0
-    we are using an ``RGB`` texture. Using a single channel texture should
-    improve performance by requiring less data to be sent to the GPU and to
-    remote backends (jupyter notebook).
+    This stores characters in a `TextureAtlas` object which uses a 2D
+    single-channel (``luminance``, available in OpenGL ES 2.0) texture to
+    store unsigned 8-bit integer data, which grows when it is full. The
+    GPU renderer draws directly into the atlas, which must then be an
+    ``RGB`` texture (luminance textures cannot be rendered to) of fixed
+    size.
+
+    The texture coordinates of the glyphs are in texels, so that they stay
+    valid when the atlas grows. They are normalized by the shape of the
+    atlas in the shader.
 
     Parameters
     ----------
@@ -44,10 +52,20 @@ class TextureFont(object):
         Dict with entries "face", "size", "bold", "italic".
     renderer : instance of SDFRenderer
         SDF renderer to use.
+    cache : instance of GlyphCache | None
+        Persistent cache of the SDF glyphs, used instead of rendering the
+        glyphs whenever possible.
 
     """
-    def __init__(self, font, renderer):
-        self._atlas = TextureAtlas(dtype=np.uint8)
+    # the atlas grows up to this size (a size supported by most devices)
+    _max_atlas_size = 4096
+
+    def __init__(self, font, renderer, cache=None):
+        if isinstance(renderer, SDFRendererGPU):
+            self._atlas = TextureAtlas(dtype=np.uint8)
+        else:
+            self._atlas = TextureAtlas(dtype=np.uint8, format='luminance',
+                                       max_size=self._max_atlas_size)
         self._atlas.wrapping = 'clamp_to_edge'
         self._kernel, _ = load_spatial_filters()
         self._renderer = renderer
@@ -63,6 +81,14 @@ class TextureFont(object):
         self._spread = 32
         assert self._spread % self.ratio == 0
         self._glyphs = {}
+        self._cache = cache
+        self._cache_key = dict(face=self._font['face'],
+                               bold=bool(self._font['bold']),
+                               italic=bool(self._font['italic']),
+                               size=self._font['size'],
+                               lowres_size=self._lowres_size,
+                               spread=self._spread,
+                               renderer=type(renderer).__name__)
 
     @property
     def ratio(self):
@@ -81,6 +107,103 @@ class TextureFont(object):
             self._load_char(char)
         return self._glyphs[char]
 
+    def preload(self, chars, n_threads=None):
+        """Load the glyphs of many characters at once
+
+        The glyphs are rasterized one after the other, but their SDFs are
+        computed on a pool of threads (with the CPU renderer) and they are
+        packed in a single region of the atlas, uploaded in one operation.
+
+        Parameters
+        ----------
+        chars : str | iterable of str
+            The characters to load. Characters already loaded are skipped.
+        n_threads : int | None
+            The number of threads computing the SDFs. Defaults to the
+            number of CPUs.
+        """
+        chars = [c for c in OrderedDict.fromkeys(chars)
+                 if c not in self._glyphs]
+        for char in chars:
+            if not (isinstance(char, string_types) and len(char) == 1):
+                raise TypeError('chars must be 1-character strings')
+        if not hasattr(self._renderer, 'render'):
+            # the GPU renderer renders directly into the atlas
+            for char in chars:
+                self._load_char(char)
+            return
+
+        sdfs = []
+        jobs = []
+        for char in chars:
+            cached = None
+            if self._cache is not None:
+                cached = self._cache.get_glyph(self._cache_key, char)
+            if cached is not None:
+                sdf, offset, advance = cached
+                self._add_cached_glyph(char, offset, advance)
+                sdfs.append(sdf)
+            else:
+                data, size = self._rasterize(char)
+                jobs.append((len(sdfs), data, size))
+                sdfs.append(None)
+
+        # compute the SDFs (the distance transform releases the GIL)
+        n_threads = min(n_threads or os.cpu_count() or 1, len(jobs))
+        if n_threads > 1:
+            with ThreadPoolExecutor(n_threads) as executor:
+                results = list(executor.map(
+                    lambda job: self._renderer.render(job[1], job[2]), jobs))
+        else:
+            results = [self._renderer.render(data, size)
+                       for _, data, size in jobs]
+        for (i, _, _), sdf in zip(jobs, results):
+            sdfs[i] = sdf
+            if self._cache is not None:
+                self._cache_glyph(chars[i], sdf)
+
+        # pack the glyphs in one block, or one by one if it does not fit
+        block = self._pack([sdf.shape for sdf in sdfs])
+        if block is None:
+            for char, sdf in zip(chars, sdfs):
+                self._store_sdf(char, sdf)
+            return
+        bx, by, bw, bh, positions = block
+        data = np.zeros((bh, bw, self._atlas.shape[2]), np.uint8)
+        for char, sdf, (x, y) in zip(chars, sdfs, positions):
+            h, w = sdf.shape
+            data[y:y + h, x:x + w] = sdf[..., np.newaxis]
+            self._set_texcoords(self._glyphs[char], bx + x, by + y, w, h)
+        self._atlas[by:by + bh, bx:bx + bw] = data
+
+    def _pack(self, shapes):
+        """Pack rectangles in shelves and allocate a region of the atlas
+
+        Returns the region (x, y, w, h) and the position of each rectangle
+        in it (with a 1-pixel border around rectangles), or None if the
+        region cannot be allocated.
+        """
+        if not shapes:
+            return None
+        heights = np.array([h for h, _ in shapes]) + 2
+        widths = np.array([w for _, w in shapes]) + 2
+        # aim at a square block, taller glyphs first
+        width = int(np.sqrt((heights * widths).sum()) * 1.1)
+        width = min(max(width, widths.max()), self._atlas.shape[1])
+        positions = [None] * len(shapes)
+        x = y = shelf = 0
+        for i in np.argsort(-heights, kind='mergesort'):
+            if x + widths[i] > width:
+                x, y, shelf = 0, y + shelf, 0
+            positions[i] = (x + 1, y + 1)
+            x += widths[i]
+            shelf = max(shelf, heights[i])
+        width = max(px + w for (px, _), w in zip(positions, widths)) - 1
+        region = self._atlas.get_free_region(int(width), int(y + shelf))
+        if region is None:
+            return None
+        return region + (positions,)
+
     def _load_char(self, char):
         """Build and store a glyph corresponding to an individual character
 
@@ -91,11 +214,30 @@ class TextureFont(object):
         """
         assert isinstance(char, string_types) and len(char) == 1
         assert char not in self._glyphs
+        cached = None
+        if self._cache is not None:
+            cached = self._cache.get_glyph(self._cache_key, char)
+        if cached is not None:
+            sdf, offset, advance = cached
+            self._add_cached_glyph(char, offset, advance)
+            self._store_sdf(char, sdf)
+            return
+
+        data, (width, height) = self._rasterize(char)
+        x, y, w, h = self._get_region(width, height)
+        sdf = self._renderer.render_to_texture(data, self._atlas, (x, y),
+                                               (w, h),
+                                               read=self._cache is not None)
+        self._set_texcoords(self._glyphs[char], x, y, w, h)
+        if self._cache is not None:
+            self._cache_glyph(char, sdf)
+
+    def _rasterize(self, char):
+        """Load a glyph from the font, return its padded bitmap and the
+        size (w, h) of its SDF"""
         # load new glyph data from font
         _load_glyph(self._font, char, self._glyphs)
-        # put new glyph into the texture
-        glyph = self._glyphs[char]
-        bitmap = glyph['bitmap']
+        bitmap = self._glyphs[char]['bitmap']
 
         # convert to padded array
         data = np.zeros((bitmap.shape[0] + 2*self._spread,
@@ -105,18 +247,64 @@ class TextureFont(object):
         # Store, while scaling down to proper size
         height = data.shape[0] // self.ratio
         width = data.shape[1] // self.ratio
+        return data, (width, height)
+
+    def _add_cached_glyph(self, char, offset, advance):
+        """Add a glyph from the cache, without rendering it"""
+        glyph = dict(char=char, offset=offset, advance=advance, kerning={})
+        self._glyphs[char] = glyph
+        missing = False
+        for other, other_glyph in self._glyphs.items():
+            left = self._cache.get_kerning(self._cache_key, other, char)
+            right = self._cache.get_kerning(self._cache_key, char, other)
+            if left is None or right is None:
+                missing = True
+                break
+            glyph['kerning'][other] = left
+            other_glyph['kerning'][char] = right
+        if missing:
+            # the font is needed for pairs of characters never met before
+            glyphs = dict((c, dict(advance=g['advance'], kerning={}))
+                          for c, g in self._glyphs.items() if c != char)
+            _load_glyph(self._font, char, glyphs)
+            for other, kerning in glyphs[char]['kerning'].items():
+                glyph['kerning'][other] = kerning
+                self._glyphs[other]['kerning'][char] = \
+                    glyphs[other]['kerning'][char]
+            self._cache_glyph(char, None)
+
+    def _store_sdf(self, char, sdf):
+        """Store the SDF of a glyph in its own region of the atlas"""
+        h, w = sdf.shape
+        x, y, w, h = self._get_region(w, h)
+        self._atlas[y:y + h, x:x + w] = np.repeat(sdf[..., np.newaxis],
+                                                  self._atlas.shape[2], axis=2)
+        self._set_texcoords(self._glyphs[char], x, y, w, h)
+
+    def _cache_glyph(self, char, sdf):
+        """Store the kerning of a character with all loaded ones, and its
+        SDF if not None"""
+        glyph = self._glyphs[char]
+        for other, other_glyph in self._glyphs.items():
+            self._cache.set_kerning(self._cache_key, other, char,
+                                    glyph['kerning'][other])
+            self._cache.set_kerning(self._cache_key, char, other,
+                                    other_glyph['kerning'][char])
+        if sdf is not None:
+            self._cache.set_glyph(self._cache_key, char, sdf,
+                                  glyph['offset'], glyph['advance'])
+
+    def _get_region(self, width, height):
+        """Allocate a region of the atlas, with a 1-pixel border"""
         region = self._atlas.get_free_region(width + 2, height + 2)
         if region is None:
             raise RuntimeError('Cannot store glyph')
         x, y, w, h = region
-        x, y, w, h = x + 1, y + 1, w - 2, h - 2
-
-        self._renderer.render_to_texture(data, self._atlas, (x, y), (w, h))
-        u0 = x / float(self._atlas.shape[1])
-        v0 = y / float(self._atlas.shape[0])
-        u1 = (x+w) / float(self._atlas.shape[1])
-        v1 = (y+h) / float(self._atlas.shape[0])
-        texcoords = (u0, v0, u1, v1)
+        return x + 1, y + 1, w - 2, h - 2
+
+    def _set_texcoords(self, glyph, x, y, w, h):
+        # in texels, the atlas may grow
+        texcoords = (x, y, x + w, y + h)
         glyph.update(dict(size=(w, h), texcoords=texcoords))
 
 
@@ -124,7 +312,7 @@ class FontManager(object):
     """Helper to create TextureFont instances and reuse them when possible"""
     # XXX: should store a font-manager on each context,
     # or let TextureFont use a TextureAtlas for each context
-    def __init__(self, method='cpu'):
+    def __init__(self, method='cpu', cache=None):
         self._fonts = {}
         if not isinstance(method, string_types) or \
                 method not in ('cpu', 'gpu'):
@@ -134,13 +322,18 @@ class FontManager(object):
             self._renderer = SDFRendererCPU()
         else:  # method == 'gpu':
             self._renderer = SDFRendererGPU()
+        # persistent glyph cache: a directory, True for the default one
+        if cache is None:
+            cache = config['glyph_cache']
+        self._cache = _get_glyph_cache(cache)
 
     def get_font(self, face, bold=False, italic=False):
         """Get a font described by face and size"""
         key = '%s-%s-%s' % (face, bold, italic)
         if key not in self._fonts:
             font = dict(face=face, bold=bold, italic=italic)
-            self._fonts[key] = TextureFont(font, self._renderer)
+            self._fonts[key] = TextureFont(font, self._renderer,
+                                           self._cache)
         return self._fonts[key]
 
 
@@ -148,32 +341,155 @@ class FontManager(object):
 # The visual
 
 
+# Escape sequences characters: {unicode: offset, ...}
+#   ord('\a') = 7
+#   ord('\b') = 8
+#   ord('\f') = 12
+#   ord('\n') = 10  => linebreak
+#   ord('\r') = 13
+#   ord('\t') = 9   => tab, set equal 4 whitespaces?
+#   ord('\v') = 11  => vertical tab, set equal 4 linebreaks?
+# If text coordinate offset > 0 -> it applies to y-direction (line breaks)
+# If text coordinate offset < 0 -> it applies to x-direction (whitespaces)
+_esc_seq = {7: 0, 8: 0, 9: -4, 10: 1, 11: 4, 12: 0, 13: 0}
+
+
+def _extend(values, n):
+    """Repeat the last value (along the first axis) to get n values, the
+    extra values are ignored"""
+    values = np.atleast_1d(values)
+    if len(values) < n:
+        values = np.repeat(values, [1] * (len(values) - 1) +
+                           [n - len(values) + 1], axis=0)
+    return values[:n]
+
+
+def _cull_overlapping(boxes, priority=None):
+    """Greedily select boxes that do not overlap
+
+    The boxes are considered by decreasing priority, and in order for equal
+    priorities. A box is selected if it does not overlap any box selected
+    before, which are looked up in a grid of cells of the size of a typical
+    box.
+
+    Parameters
+    ----------
+    boxes : array
+        Array of shape (N, 4) of the (xmin, ymin, xmax, ymax) of the boxes.
+        Boxes that only touch do not overlap.
+    priority : array | None
+        The priority of each box.
+
+    Returns
+    -------
+    selected : array
+        The sorted indices of the selected boxes.
+    """
+    boxes = np.asarray(boxes, np.float64).reshape(-1, 4)
+    if len(boxes) == 0:
+        return np.zeros(0, np.intp)
+    if priority is None:
+        order = np.arange(len(boxes))
+    else:
+        order = np.argsort(-np.asarray(priority, np.float64),
+                           kind='mergesort')
+    # boxes are stored in all the cells they cover
+    size = np.median(boxes[:, 2:] - boxes[:, :2], axis=0)
+    size = np.maximum(size, 1e-3 * max(np.ptp(boxes), 1e-12))
+    origin = np.tile(boxes[:, :2].min(axis=0), 2)
+    cells = np.floor((boxes - origin) / np.tile(size, 2)).astype(np.intp)
+    # the boxes overlapping cells of a finer grid (of up to 2 ** 16 cells)
+    # fully covered by selected boxes are rejected at once, by blocks of
+    # candidates
+    span = (boxes[:, 2:].max(axis=0) - origin[:2]) / size
+    factor = min(4., np.sqrt((1 << 16) / max(np.prod(span + 1), 1.)))
+    fine = (boxes - origin) / np.tile(size / factor, 2)
+    touched = np.concatenate((np.floor(fine[:, :2]), np.ceil(fine[:, 2:])),
+                             axis=1).astype(np.intp)
+    inner = np.concatenate((np.ceil(fine[:, :2]), np.floor(fine[:, 2:])),
+                           axis=1).astype(np.intp)
+    shape = touched[:, 3].max() + 1, touched[:, 2].max() + 1
+    covered = np.zeros(shape, np.intp) if factor >= 1 else None
+
+    grid = {}
+    selected = []
+    for start in range(0, len(order), 1024):
+        block = order[start:start + 1024]
+        if covered is not None and selected:
+            table = np.zeros((shape[0] + 1, shape[1] + 1), np.intp)
+            table[1:, 1:] = covered.cumsum(axis=0).cumsum(axis=1)
+            x0, y0, x1, y1 = touched[block].T
+            hits = table[y1, x1] - table[y0, x1] - table[y1, x0] + table[y0, x0]
+            block = block[hits == 0]
+        for i, box, (cx0, cy0, cx1, cy1), (ix0, iy0, ix1, iy1) in zip(
+                block.tolist(), boxes[block].tolist(), cells[block].tolist(),
+                inner[block].tolist()):
+            x0, y0, x1, y1 = box
+            keys = [(cx, cy) for cx in range(cx0, cx1 + 1)
+                    for cy in range(cy0, cy1 + 1)]
+            if any(x0 < b[2] and b[0] < x1 and y0 < b[3] and b[1] < y1
+                   for key in keys for b in grid.get(key, ())):
+                continue
+            selected.append(i)
+            for key in keys:
+                grid.setdefault(key, []).append(box)
+            if covered is not None:
+                covered[iy0:iy1, ix0:ix1] = 1
+    return np.sort(selected)
+
+
 def _text_to_vbo(text, font, anchor_x, anchor_y, lowres_size):
-    """Convert text characters to VBO"""
-    # Necessary to flush commands before requesting current viewport because
-    # There may be a set_viewport command waiting in the queue.
-    # TODO: would be nicer if each canvas just remembers and manages its own
-    # viewport, rather than relying on the context for this.
-    canvas = context.get_current_canvas()
-    canvas.context.flush_commands()
+    """Convert text characters to VBO
+
+    The layout of all the strings is computed at once with arrays of glyph
+    metrics (advance, offset, size, texture coordinates and the kerning of
+    the pairs of characters met).
 
+    Parameters
+    ----------
+    text : str | list of str
+        The strings to lay out, each one is anchored at the origin.
+    font : instance of TextureFont
+        The font.
+    anchor_x, anchor_y : str
+        The anchors of the strings.
+    lowres_size : int
+        The size of the font.
+
+    Returns
+    -------
+    vertices : array
+        The vertices of the strings, 4 per character, one after the other.
+        The vertices of the characters that are not drawn (line breaks and
+        other escape sequences) are degenerate.
+    """
+    if isinstance(text, string_types):
+        text = [text]
+    # Need to make sure we have unicode strings here (Py2.7 mis-interprets
+    # characters like "•" otherwise)
+    if sys.version[0] == '2':
+        text = [t.decode('utf-8') if isinstance(t, str) else t for t in text]
     text_vtype = np.dtype([('a_position', np.float32, 2),
                            ('a_texcoord', np.float32, 2)])
-    vertices = np.zeros(len(text) * 4, dtype=text_vtype)
-    prev = None
-    width = height = ascender = descender = 0
-    ratio, slop = 1. / font.ratio, font.slop
-    x_off = -slop
-    # Need to make sure we have a unicode string here (Py2.7 mis-interprets
-    # characters like "•" otherwise)
-    if sys.version[0] == '2' and isinstance(text, str):
-        text = text.decode('utf-8')
-    # Need to store the original viewport, because the font[char] will
-    # trigger SDF rendering, which changes our viewport
-    # todo: get rid of call to glGetParameter!
+    lengths = np.array([len(t) for t in text], np.intp)
+    n_char = int(lengths.sum())
+    # unique characters, without sorting (code points are < 0x110000)
+    char_ids = np.frombuffer(u''.join(text).encode('utf-32-le',
+                                                   'surrogatepass'), np.uint32)
+    used = np.bincount(char_ids) > 0
+    codes = np.flatnonzero(used)
+    char_ids = (np.cumsum(used) - 1)[char_ids]
+    chars = [chr(c) for c in codes.tolist()]
+    esc = np.array([_esc_seq.get(c, 0) for c in codes.tolist()], np.intp)
+    drawn = np.array([c not in _esc_seq for c in codes.tolist()], bool)
+
+    # Load the glyphs of all characters at once
+    font.preload('hy ' + ''.join(c for c, d in zip(chars, drawn) if d))
 
     # Also analyse chars with large ascender and descender, otherwise the
     # vertical alignment can be very inconsistent
+    ratio, slop = 1. / font.ratio, font.slop
+    height = ascender = descender = 0
     for char in 'hy':
         glyph = font[char]
         y0 = glyph['offset'][1] * ratio + slop
@@ -183,98 +499,108 @@ def _text_to_vbo(text, font, anchor_x, anchor_y, lowres_size):
         height = max(height, glyph['size'][1] - 2*slop)
 
     # Get/set the fonts whitespace length and line height (size of this ok?)
-    glyph = font[' ']
-    spacewidth = glyph['advance'] * ratio
+    spacewidth = font[' ']['advance'] * ratio
     lineheight = height * 1.5
 
-    # Added escape sequences characters: {unicode:offset,...}
-    #   ord('\a') = 7
-    #   ord('\b') = 8
-    #   ord('\f') = 12
-    #   ord('\n') = 10  => linebreak
-    #   ord('\r') = 13
-    #   ord('\t') = 9   => tab, set equal 4 whitespaces?
-    #   ord('\v') = 11  => vertical tab, set equal 4 linebreaks?
-    # If text coordinate offset > 0 -> it applies to x-direction
-    # If text coordinate offset < 0 -> it applies to y-direction
-    esc_seq = {7: 0, 8: 0, 9: -4, 10: 1, 11: 4, 12: 0, 13: 0}
-
-    # Keep track of y_offset to set lines at right position
-    y_offset = 0
-
-    # When a line break occur, record the vertices index value
-    vi_marker = 0
-    ii_offset = 0  # Offset since certain characters won't be drawn
-
-    # The running tracker of characters vertex index
-    vi = 0
-
-    orig_viewport = canvas.context.get_viewport()
-    for ii, char in enumerate(text):
-        if ord(char) in esc_seq:
-            if esc_seq[ord(char)] < 0:
-                # Add offset in x-direction
-                x_off += abs(esc_seq[ord(char)]) * spacewidth
-                width += abs(esc_seq[ord(char)]) * spacewidth
-            elif esc_seq[ord(char)] > 0:
-                # Add offset in y-direction and reset things in x-direction
-                dx = dy = 0
-                if anchor_x == 'right':
-                    dx = -width
-                elif anchor_x == 'center':
-                    dx = -width / 2.
-                vertices['a_position'][vi_marker:vi+4] += (dx, dy)
-                vi_marker = vi+4
-                ii_offset -= 1
-                # Reset variables that affects x-direction positioning
-                x_off = -slop
-                width = 0
-                # Add offset in y-direction
-                y_offset += esc_seq[ord(char)] * lineheight
-        else:
-            # For ordinary characters, normal procedure
-            glyph = font[char]
-            kerning = glyph['kerning'].get(prev, 0.) * ratio
-            x0 = x_off + glyph['offset'][0] * ratio + kerning
-            y0 = glyph['offset'][1] * ratio + slop - y_offset
-            x1 = x0 + glyph['size'][0]
-            y1 = y0 - glyph['size'][1]
-            u0, v0, u1, v1 = glyph['texcoords']
-            position = [[x0, y0], [x0, y1], [x1, y1], [x1, y0]]
-            texcoords = [[u0, v0], [u0, v1], [u1, v1], [u1, v0]]
-            vi = (ii + ii_offset) * 4
-            vertices['a_position'][vi:vi+4] = position
-            vertices['a_texcoord'][vi:vi+4] = texcoords
-            x_move = glyph['advance'] * ratio + kerning
-            x_off += x_move
-            ascender = max(ascender, y0 - slop)
-            descender = min(descender, y1 + slop)
-            width += x_move
-            height = max(height, glyph['size'][1] - 2*slop)
-            prev = char
-
-    if orig_viewport is not None:
-        canvas.context.set_viewport(*orig_viewport)
-
-    dx = dy = 0
+    # Metrics of the glyphs
+    advance = np.zeros(len(chars))
+    offset = np.zeros((len(chars), 2))
+    size = np.zeros((len(chars), 2))
+    texcoords = np.zeros((len(chars), 4))
+    for i in np.flatnonzero(drawn):
+        glyph = font[chars[i]]
+        advance[i] = glyph['advance']
+        offset[i] = glyph['offset']
+        size[i] = glyph['size']
+        texcoords[i] = glyph['texcoords']
+    if n_char == 0:
+        return np.zeros(0, text_vtype)
+
+    index = np.arange(n_char)
+    starts = np.cumsum(lengths) - lengths
+    string = np.repeat(np.arange(len(text)), lengths)
+    start = starts[string]
+    esc = esc[char_ids]
+    drawn = drawn[char_ids]
+    breaks = np.maximum(esc, 0)
+
+    # Kerning with the previous drawn character of the same string, looked
+    # up once for each pair of characters
+    prev = np.maximum.accumulate(np.where(drawn, index, -1))
+    prev = np.concatenate(([-1], prev[:-1]))
+    kerned = np.flatnonzero(drawn & (prev >= start))
+    kerning = np.zeros(n_char)
+    if len(kerned):
+        pairs = char_ids[prev[kerned]] * len(chars) + char_ids[kerned]
+        pairs, pair_ids = np.unique(pairs, return_inverse=True)
+        values = [font[chars[p % len(chars)]]['kerning'].get(
+            chars[p // len(chars)], 0.) for p in pairs.tolist()]
+        kerning[kerned] = np.array(values)[pair_ids] * ratio
+
+    # Horizontal position of the characters in their line; lines start at
+    # the beginning of the strings and after line breaks
+    x_move = np.where(drawn, advance[char_ids] * ratio + kerning, 0.)
+    x_move[esc < 0] = -esc[esc < 0] * spacewidth
+    new_line = index == start
+    new_line[1:] |= breaks[:-1] > 0
+    line_starts = np.flatnonzero(new_line)
+    line = np.cumsum(new_line) - 1
+    x_off = np.cumsum(x_move) - x_move
+    x_off -= x_off[line_starts][line] + slop
+    width = np.add.reduceat(x_move, line_starts)
+
+    # Vertical position: the number of lines skipped so far
+    y_off = np.cumsum(breaks) - breaks
+    y_off = (y_off - y_off[start]) * lineheight
+
+    # Line breaks are not drawn, the other characters have their own slot
+    n_breaks = np.cumsum(breaks > 0) - (breaks > 0)
+    slot = index - n_breaks + n_breaks[start]
+
+    ii = np.flatnonzero(drawn)
+    ids = char_ids[ii]
+    x0 = x_off[ii] + offset[ids, 0] * ratio + kerning[ii]
+    y0 = offset[ids, 1] * ratio + slop - y_off[ii]
+    x1 = x0 + size[ids, 0]
+    y1 = y0 - size[ids, 1]
+
+    ascenders = np.full(len(text), float(ascender))
+    descenders = np.full(len(text), float(descender))
+    if len(ii):
+        seg = np.flatnonzero(np.diff(string[ii], prepend=-1))
+        s = string[ii][seg]
+        ascenders[s] = np.maximum(ascender,
+                                  np.maximum.reduceat(y0 - slop, seg))
+        descenders[s] = np.minimum(descender,
+                                   np.minimum.reduceat(y1 + slop, seg))
+
+    dx = np.zeros(len(width))
+    dy = np.zeros(len(text))
     if anchor_y == 'top':
-        dy = -descender
+        dy = -descenders
     elif anchor_y in ('center', 'middle'):
-        dy = (-descender - ascender) / 2
+        dy = (-descenders - ascenders) / 2
     elif anchor_y == 'bottom':
-        dy = -ascender
+        dy = -ascenders
     if anchor_x == 'right':
         dx = -width
     elif anchor_x == 'center':
         dx = -width / 2.
-
-    # If any linebreaks occured in text, we only want to translate characters
-    # in the last line in text (those after the vi_marker)
-    vertices['a_position'][0:vi_marker] += (0, dy)
-    vertices['a_position'][vi_marker:] += (dx, dy)
-    vertices['a_position'] /= lowres_size
-
-    return vertices
+    x0 += dx[line[ii]]
+    x1 += dx[line[ii]]
+    y0 += dy[string[ii]]
+    y1 += dy[string[ii]]
+
+    # (x, y, u, v) of each vertex
+    vertices = np.zeros((n_char, 4, 4), np.float32)
+    quads = np.empty((len(ii), 4, 4), np.float32)
+    quads[:, :, 0] = np.transpose([x0, x0, x1, x1]) / lowres_size
+    quads[:, :, 1] = np.transpose([y0, y1, y1, y0]) / lowres_size
+    u0, v0, u1, v1 = texcoords[ids].T
+    quads[:, :, 2] = np.transpose([u0, u0, u1, u1])
+    quads[:, :, 3] = np.transpose([v0, v1, v1, v0])
+    vertices[slot[ii]] = quads
+    return vertices.view(text_vtype).ravel()
 
 
 class TextVisual(Visual):
@@ -315,13 +641,24 @@ class TextVisual(Visual):
         quality results.
     font_manager : object | None
         Font manager to use (can be shared if the GLContext is shared).
+    overlap : str
+        How labels (the strings of a list) overlapping on screen are
+        handled. With 'show' (default), all the labels are drawn. With
+        'cull', only a subset of labels that do not overlap is drawn: the
+        labels in view are selected greedily by decreasing `priority`. The
+        selection is updated when the labels move on screen (e.g. when the
+        camera changes), which bounds the number of characters drawn.
+    priority : array | None
+        The priority of each label with ``overlap='cull'``. By default, the
+        first labels have the highest priority.
     """
 
     VERTEX_SHADER = """
         attribute float a_rotation;  // rotation in rad
         attribute vec2 a_position; // in point units
-        attribute vec2 a_texcoord;
+        attribute vec2 a_texcoord;  // in texels of the font atlas
         attribute vec3 a_pos;  // anchor position
+        uniform vec2 u_font_atlas_shape;
         varying vec2 v_texcoord;
         varying vec4 v_color;
 
@@ -333,7 +670,7 @@ class TextVisual(Visual):
             vec4 pos = $transform(vec4(a_pos, 1.0)) +
                        $text_scale(rot * vec4(a_position, 0, 0));
             gl_Position = pos;
-            v_texcoord = a_texcoord;
+            v_texcoord = a_texcoord / u_font_atlas_shape;
             v_color = $color;
         }
         """
@@ -403,7 +740,8 @@ class TextVisual(Visual):
     def __init__(self, text=None, color='black', bold=False,
                  italic=False, face='OpenSans', font_size=12, pos=[0, 0, 0],
                  rotation=0., anchor_x='center', anchor_y='center',
-                 method='cpu', font_manager=None):
+                 method='cpu', font_manager=None, overlap='show',
+                 priority=None):
         Visual.__init__(self, vcode=self.VERTEX_SHADER,
                         fcode=self.FRAGMENT_SHADER)
         # Check input
@@ -411,16 +749,23 @@ class TextVisual(Visual):
         _check_valid('anchor_y', anchor_y, valid_keys)
         valid_keys = ('left', 'center', 'right')
         _check_valid('anchor_x', anchor_x, valid_keys)
+        _check_valid('overlap', overlap, ('show', 'cull'))
         # Init font handling stuff
         # _font_manager is a temporary solution to use global mananger
         self._font_manager = font_manager or FontManager(method=method)
         self._face = face
         self._bold = bold
         self._italic = italic
-        self._update_font()
         self._vertices = None
+        self._layout = None
+        self._extents = None
+        self._selection = None  # the labels drawn, None for all of them
+        self._cull_boxes = None
+        self._update_font()
         self._color_vbo = None
         self._anchors = (anchor_x, anchor_y)
+        self._overlap = overlap
+        self.priority = priority
         # Init text properties
         self.color = color
         self.text = text
@@ -445,9 +790,7 @@ class TextVisual(Visual):
         if text is None:
             text = []
         self._text = text
-        self._vertices = None
-        self._pos_changed = True  # need to update this as well
-        self._color_changed = True
+        self._text_changed = True
         self.update()
 
     @property
@@ -457,8 +800,33 @@ class TextVisual(Visual):
     @anchors.setter
     def anchors(self, a):
         self._anchors = a
-        self._vertices = None
-        self._pos_changed = True
+        self._layout = None
+        self._text_changed = True
+        self.update()
+
+    @property
+    def overlap(self):
+        """How overlapping labels are handled, 'show' or 'cull'"""
+        return self._overlap
+
+    @overlap.setter
+    def overlap(self, overlap):
+        _check_valid('overlap', overlap, ('show', 'cull'))
+        self._overlap = overlap
+        self._cull_boxes = None
+        self.update()
+
+    @property
+    def priority(self):
+        """The priority of the labels culled when they overlap"""
+        return self._priority
+
+    @priority.setter
+    def priority(self, priority):
+        if priority is not None:
+            priority = np.atleast_1d(np.asarray(priority, np.float64))
+        self._priority = priority
+        self._cull_boxes = None
         self.update()
 
     @property
@@ -520,21 +888,10 @@ class TextVisual(Visual):
         # attributes / uniforms are not available until program is built
         if len(self.text) == 0:
             return False
-        if self._vertices is None:
-            text = self.text
-            if isinstance(text, string_types):
-                text = [text]
-            n_char = sum(len(t) for t in text)
-            # we delay creating vertices because it requires a context,
-            # which may or may not exist when the object is initialized
-            self._vertices = np.concatenate([
-                _text_to_vbo(t, self._font, self._anchors[0], self._anchors[1],
-                             self._font._lowres_size) for t in text])
-            self._vertices = VertexBuffer(self._vertices)
-            idx = (np.array([0, 1, 2, 0, 2, 3], np.uint32) +
-                   np.arange(0, 4*n_char, 4, dtype=np.uint32)[:, np.newaxis])
-            self._index_buffer = IndexBuffer(idx.ravel())
-            self.shared_program.bind(self._vertices)
+        if self._text_changed:
+            # we delay the layout until the text is drawn, so that text
+            # changed several times between draws is only laid out once
+            self._update_vertices()
             # This is necessary to reset the GL drawing state after generating
             # SDF textures. A better way would be to enable the state to be
             # pushed/popped by the context.
@@ -553,17 +910,10 @@ class TextVisual(Visual):
             _rot = self._rotation
             if isinstance(_rot, (int, float)):
                 _rot = np.full((pos.shape[0],), self._rotation)
-            _rot = np.asarray(_rot)
-            if _rot.shape[0] < n_text:
-                _rep = [1] * (len(_rot) - 1) + [n_text - len(_rot) + 1]
-                _rot = np.repeat(_rot, _rep, axis=0)
-            _rot = np.repeat(_rot[:n_text], repeats, axis=0)
+            _rot = np.repeat(_extend(_rot, n_text), repeats, axis=0)
             self.shared_program['a_rotation'] = _rot.astype(np.float32)
             # Position
-            if pos.shape[0] < n_text:
-                _rep = [1] * (len(pos) - 1) + [n_text - len(pos) + 1]
-                pos = np.repeat(pos, _rep, axis=0)
-            pos = np.repeat(pos[:n_text], repeats, axis=0)
+            pos = np.repeat(_extend(pos, n_text), repeats, axis=0)
             assert pos.shape[0] == self._vertices.size == len(_rot)
             self.shared_program['a_pos'] = pos
             self._pos_changed = False
@@ -576,12 +926,8 @@ class TextVisual(Visual):
             else:
                 repeats = [4 * len(text)]
             n_text = len(repeats)
-            color = self.color.rgba
-            if color.shape[0] < n_text:
-                color = np.repeat(color,
-                                  [1]*(len(color)-1) + [n_text-len(color)+1],
-                                  axis=0)
-            color = np.repeat(color[:n_text], repeats, axis=0)
+            color = np.repeat(_extend(self.color.rgba, n_text), repeats,
+                              axis=0)
             assert color.shape[0] == self._vertices.size
             self._color_vbo = VertexBuffer(color)
             self.shared_program.vert['color'] = self._color_vbo
@@ -597,7 +943,139 @@ class TextVisual(Visual):
         self.shared_program['u_kernel'] = self._font._kernel
         self.shared_program['u_color'] = self._color.rgba
         self.shared_program['u_font_atlas'] = self._font._atlas
-        self.shared_program['u_font_atlas_shape'] = self._font._atlas.shape[:2]
+        # (width, height) of the atlas, which may have grown
+        self.shared_program['u_font_atlas_shape'] = \
+            self._font._atlas.shape[1::-1]
+        if self._overlap == 'cull':
+            self._cull(view, n_pix)
+            if len(self._selection) == 0:
+                return False
+        elif self._selection is not None:
+            self._set_selection(None)
+
+    def _update_vertices(self):
+        """Lay out the strings that changed since the last update
+
+        The layout of a string does not depend on the other strings. If the
+        strings keep their lengths, only the vertices of the strings that
+        changed are uploaded. Otherwise the buffers are rebuilt, and the
+        vertices of the other strings are copied from the previous layout.
+        """
+        text = self.text
+        if isinstance(text, string_types):
+            text = [text]
+        lengths = np.array([len(t) for t in text], np.intp)
+        offsets = np.cumsum(lengths) - lengths
+        old_text, old_lengths, old_offsets, old_data = self._layout or \
+            ([], None, None, None)
+        changed = np.array([i >= len(old_text) or t != old_text[i]
+                            for i, t in enumerate(text)], bool)
+        changed = np.flatnonzero(changed)
+        chars = _ranges(offsets[changed], lengths[changed])
+        vertices = _text_to_vbo([text[i] for i in changed], self._font,
+                                self._anchors[0], self._anchors[1],
+                                self._font._lowres_size).reshape(-1, 4)
+
+        if old_data is not None and np.array_equal(old_lengths, lengths):
+            # update the slices of the strings that changed in place
+            data = old_data
+            data[chars] = vertices
+            if len(chars):
+                first, last = chars[0], chars[-1] + 1
+                self._vertices.set_subdata(data[first:last].ravel(),
+                                           offset=4 * first)
+        else:
+            data = np.zeros((lengths.sum(), 4), vertices.dtype)
+            if old_data is not None:
+                kept = np.setdiff1d(np.arange(min(len(text), len(old_text))),
+                                    changed)
+                data[_ranges(offsets[kept], lengths[kept])] = \
+                    old_data[_ranges(old_offsets[kept], old_lengths[kept])]
+            data[chars] = vertices
+            self._vertices = VertexBuffer(data.ravel())
+            self._index_buffer = IndexBuffer()
+            self.shared_program.bind(self._vertices)
+            self._pos_changed = True  # need to update this as well
+            self._color_changed = True
+        self._layout = (list(text), lengths, offsets, data)
+        self._text_changed = False
+        if data is not old_data:
+            self._set_selection(None)
+        self._extents = None
+        self._cull_boxes = None
+
+    def _set_selection(self, selection):
+        """Draw the characters of some labels only (all if None)"""
+        _, lengths, offsets, _ = self._layout
+        if selection is None:
+            chars = np.arange(lengths.sum())
+        else:
+            chars = _ranges(offsets[selection], lengths[selection])
+        idx = (np.array([0, 1, 2, 0, 2, 3], np.uint32) +
+               4 * chars.astype(np.uint32)[:, np.newaxis])
+        if len(idx):
+            self._index_buffer.set_data(idx.ravel())
+        self._selection = selection
+
+    def _label_boxes(self, view, n_pix):
+        """Bounding boxes (xmin, ymin, xmax, ymax) of the labels in the
+        document coordinates"""
+        if self._extents is None:
+            # bounding boxes of the drawn quads of each label
+            _, lengths, offsets, data = self._layout
+            quads = data['a_position']
+            lo, hi = quads.min(axis=1), quads.max(axis=1)
+            degenerate = (hi <= lo).any(axis=1)
+            lo[degenerate], hi[degenerate] = np.inf, -np.inf
+            self._extents = np.tile([np.inf, np.inf, -np.inf, -np.inf],
+                                    (len(lengths), 1))
+            labels = np.flatnonzero(lengths)
+            if len(labels):
+                self._extents[labels, :2] = np.minimum.reduceat(
+                    lo, offsets[labels])
+                self._extents[labels, 2:] = np.maximum.reduceat(
+                    hi, offsets[labels])
+        n_text = len(self._extents)
+        tr = view.transforms.get_transform('visual', 'document')
+        anchors = tr.map(_extend(self.pos, n_text))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            anchors = np.where(anchors[:, 3:] > 0,
+                               anchors[:, :2] / anchors[:, 3:], np.nan)
+            # rotated and scaled as in the vertex shader, the y axis of the
+            # document points down
+            x = self._extents[:, [0, 2, 2, 0]]
+            y = self._extents[:, [1, 1, 3, 3]]
+            rot = _extend(self._rotation, n_text)[:, np.newaxis]
+            dx = (np.cos(rot) * x + np.sin(rot) * y) * n_pix
+            dy = (np.sin(rot) * x - np.cos(rot) * y) * n_pix
+            return np.concatenate((anchors + np.stack((dx.min(axis=1),
+                                                       dy.min(axis=1)), 1),
+                                   anchors + np.stack((dx.max(axis=1),
+                                                       dy.max(axis=1)), 1)),
+                                  axis=1)
+
+    def _cull(self, view, n_pix):
+        """Select the labels in view that do not overlap, when they moved on
+        screen"""
+        boxes = self._label_boxes(view, n_pix)
+        if self._selection is not None and self._cull_boxes is not None and \
+                np.array_equal(boxes, self._cull_boxes, equal_nan=True):
+            return
+        self._cull_boxes = boxes
+        tr = view.transforms.get_transform('render', 'document')
+        viewport = tr.map([[-1, -1], [1, 1]])
+        viewport = viewport[:, :2] / viewport[:, 3:]
+        lo, hi = viewport.min(axis=0), viewport.max(axis=0)
+        with np.errstate(invalid='ignore'):
+            visible = np.flatnonzero((boxes[:, 0] < hi[0]) &
+                                     (boxes[:, 2] > lo[0]) &
+                                     (boxes[:, 1] < hi[1]) &
+                                     (boxes[:, 3] > lo[1]))
+        priority = None
+        if self._priority is not None:
+            priority = _extend(self._priority, len(boxes))[visible]
+        self._set_selection(
+            visible[_cull_overlapping(boxes[visible], priority)])
 
     def _prepare_transforms(self, view):
         self._pos_changed = True
@@ -638,14 +1116,41 @@ class TextVisual(Visual):
 
     def _update_font(self):
         self._font = self._font_manager.get_font(self._face, self._bold, self._italic)
+        self._layout = None
+        self._text_changed = True
         self.update()
 
 
+def _resample(data, size, axis):
+    """Linearly resample an array along an axis at pixel centers
+
+    This is the same as calling np.interp for each row (or column), but in
+    one vectorized operation.
+    """
+    n = data.shape[axis]
+    xp = (np.arange(n) + 0.5) / float(n)
+    x = np.clip((np.arange(size) + 0.5) / float(size), xp[0], xp[-1])
+    j = np.clip(np.searchsorted(xp, x, 'right') - 1, 0, max(n - 2, 0))
+    j1 = np.minimum(j + 1, n - 1)
+    shape = [1, 1]
+    shape[axis] = size
+    f0 = np.take(data, j, axis)
+    slope = (np.take(data, j1, axis) - f0) / \
+        np.where(j1 > j, xp[j1] - xp[j], 1.).reshape(shape)
+    return slope * (x - xp[j]).reshape(shape) + f0
+
+
 class SDFRendererCPU(object):
     """Render SDFs using the CPU."""
     # This should probably live in _sdf_cpu.pyx, but doing so makes
     # debugging substantially more annoying
-    def render_to_texture(self, data, texture, offset, size):
+    def render(self, data, size):
+        """Compute the SDF of a glyph, downsampled to size (w, h)
+
+        Returns the (h, w) ubyte SDF. Only NumPy and the distance transform
+        (which releases the GIL) are used, so that glyphs can be processed
+        on threads.
+        """
         sdf = (data / 255).astype(np.float32)  # from ubyte -> float
         h, w = sdf.shape
         tex_w, tex_h = size
@@ -655,17 +1160,16 @@ class SDFRendererCPU(object):
         sdf = 2 * sdf - 1.
         sdf = np.sign(sdf) * np.abs(sdf) ** 0.75 / 2. + 0.5
         # Downsample using NumPy (because we can't guarantee SciPy)
-        xp = (np.arange(w) + 0.5) / float(w)
-        x = (np.arange(tex_w) + 0.5) / float(tex_w)
-        bitmap = np.array([np.interp(x, xp, ss) for ss in sdf])
-        xp = (np.arange(h) + 0.5) / float(h)
-        x = (np.arange(tex_h) + 0.5) / float(tex_h)
-        bitmap = np.array([np.interp(x, xp, ss) for ss in bitmap.T]).T
+        bitmap = _resample(sdf.astype(np.float64), tex_w, 1)
+        bitmap = _resample(bitmap, tex_h, 0)
         assert bitmap.shape[::-1] == size
         # convert to uint8
-        bitmap = (bitmap * 255).astype(np.uint8)
-        # convert single channel to RGB by repeating
-        bitmap = np.tile(bitmap[..., np.newaxis],
-                         (1, 1, 3))
+        return (bitmap * 255).astype(np.uint8)
+
+    def render_to_texture(self, data, texture, offset, size, read=False):
+        bitmap = self.render(data, size)
+        # repeat the single channel for RGB textures
         texture[offset[1]:offset[1] + size[1],
-                offset[0]:offset[0] + size[0], :] = bitmap
+                offset[0]:offset[0] + size[0], :] = \
+            np.repeat(bitmap[..., np.newaxis], texture.shape[2], axis=2)
+        return bitmap